@@ -29,6 +29,7 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         datasets_path,
         config=cfg.data.asdict(),
         point_clouds_paths=pc_paths,
+        cache_path=cfg.cache_path,
         verbose=True,
     )
 
@@ -0,0 +1,134 @@
+import tyro
+import sys
+import torch
+import os
+from pathlib import Path
+from typing import List
+from mvdatasets.mvdataset import MVDataset
+from mvdatasets.utils.printing import print_warning, print_info
+from mvdatasets.utils.memory import bytes_to_mb
+from mvdatasets import DataSplit
+from mvdatasets.configs.example_config import ExampleConfig
+from examples import get_dataset_test_preset, custom_exception_handler
+
+
+def get_process_memory(pid: int) -> dict:
+    """returns the rss, pss (shared pages divided by the number of processes
+    mapping them) and uss (pages private to the process) of a process in bytes
+    (linux only)"""
+    memory = {"rss": 0, "pss": 0, "uss": 0}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, *vals = line.split()
+            if key == "Rss:":
+                memory["rss"] += int(vals[0]) * 1024
+            elif key == "Pss:":
+                memory["pss"] += int(vals[0]) * 1024
+            elif key in ["Private_Clean:", "Private_Dirty:"]:
+                memory["uss"] += int(vals[0]) * 1024
+    return memory
+
+
+def run_epoch(
+    data_split: DataSplit,
+    num_workers: int,
+    multiprocessing_context: str,
+    batch_size: int,
+) -> dict:
+    """iterates over the split once and returns the memory of the main
+    process and of the workers, measured while workers are alive"""
+    data_loader = torch.utils.data.DataLoader(
+        data_split,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        shuffle=True,
+        multiprocessing_context=multiprocessing_context if num_workers > 0 else None,
+        # keep workers alive after the epoch
+        persistent_workers=num_workers > 0,
+    )
+    for _ in data_loader:
+        pass
+    memory = {"main": get_process_memory(os.getpid()), "workers": []}
+    if num_workers > 0:
+        for worker in data_loader._iterator._workers:
+            memory["workers"].append(get_process_memory(worker.pid))
+    del data_loader
+    return memory
+
+
+def main(cfg: ExampleConfig, pc_paths: List[Path]):
+
+    datasets_path = cfg.datasets_path
+    scene_name = cfg.scene_name
+    dataset_name = cfg.data.dataset_name
+
+    # dataset loading
+    mv_data = MVDataset(
+        dataset_name,
+        scene_name,
+        datasets_path,
+        config=cfg.data.asdict(),
+        point_clouds_paths=pc_paths,
+        cache_path=cfg.cache_path,
+        verbose=True,
+    )
+
+    batch_size = 4  # nr full frames per batch
+    max_num_workers = os.cpu_count() // 2
+    nr_workers_list = [0] + [2**i for i in range(8) if 2**i <= max_num_workers]
+    # workers unpickle the split instead of inheriting it
+    multiprocessing_context = "spawn"
+
+    for share_memory in [False, True]:
+
+        data_split = DataSplit(
+            cameras=mv_data.get_split("train"),
+            modalities=mv_data.get_split_modalities("train"),
+            index_pixels=False,
+        )
+        if share_memory:
+            data_split.share_memory()
+
+        print_info(
+            f"share_memory: {share_memory}, "
+            f"split data: {bytes_to_mb(data_split.get_memory_footprint()):.1f} MB"
+        )
+        for num_workers in nr_workers_list:
+            memory = run_epoch(
+                data_split, num_workers, multiprocessing_context, batch_size
+            )
+            workers_rss = sum(worker["rss"] for worker in memory["workers"])
+            workers_uss = sum(worker["uss"] for worker in memory["workers"])
+            total_pss = memory["main"]["pss"] + sum(
+                worker["pss"] for worker in memory["workers"]
+            )
+            print(
+                f"num_workers: {num_workers:3d}, "
+                f"main rss: {bytes_to_mb(memory['main']['rss']):8.1f} MB, "
+                f"workers rss: {bytes_to_mb(workers_rss):8.1f} MB, "
+                f"workers uss: {bytes_to_mb(workers_uss):8.1f} MB, "
+                f"total pss: {bytes_to_mb(total_pss):8.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+
+    # custom exception handler
+    sys.excepthook = custom_exception_handler
+
+    # parse arguments
+    args = tyro.cli(ExampleConfig)
+
+    # get test preset
+    test_preset = get_dataset_test_preset(args.data.dataset_name)
+    # scene name
+    if args.scene_name is None:
+        args.scene_name = test_preset["scene_name"]
+        print_warning(
+            f"scene_name is None, using preset test scene {args.scene_name} for dataset"
+        )
+    # additional point clouds paths (if any)
+    pc_paths = test_preset["pc_paths"]
+
+    # start the example program
+    main(args, pc_paths)
@@ -9,7 +9,7 @@ from typing import List
 from mvdatasets.mvdataset import MVDataset
 from mvdatasets.utils.printing import print_error, print_warning, print_success
 from mvdatasets import Profiler
-from mvdatasets import DataSplit
+from mvdatasets import DataSplit, RaysSplit
 from mvdatasets.configs.example_config import ExampleConfig
 from examples import get_dataset_test_preset, custom_exception_handler
 
@@ -29,6 +29,7 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         datasets_path,
         config=cfg.data.asdict(),
         point_clouds_paths=pc_paths,
+        cache_path=cfg.cache_path,
         verbose=True,
     )
 
@@ -64,6 +65,25 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         else:
             profiler = None
 
+        # initialize data split (with all frames) and data loader once
+        data_split = DataSplit(
+            cameras=mv_data.get_split("train"),
+            modalities=mv_data.get_split_modalities("train"),
+            index_pixels=False,  # index frames (!!!)
+        )
+
+        #
+        data_loader = torch.utils.data.DataLoader(
+            data_split,
+            batch_size=batch_size,
+            num_workers=num_workers,
+            shuffle=shuffle,
+            persistent_workers=persistent_workers,
+            pin_memory=pin_memory,
+            # batches are gathered at once by DataSplit.__getitems__
+            collate_fn=DataSplit.collate_fn,
+        )
+
         # Loop over epochs
         step = 0
         epochs_pbar = tqdm(range(nr_epochs), desc="epochs", ncols=100)
@@ -85,23 +105,9 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
 
                 nr_sequence_frames += 1
 
-                # initialize data loader
-                data_split = DataSplit(
-                    cameras=mv_data.get_split("train"),
-                    nr_sequence_frames=nr_sequence_frames,
-                    modalities=mv_data.get_split_modalities("train"),
-                    index_pixels=False,  # index frames (!!!)
-                )
-
-                #
-                data_loader = torch.utils.data.DataLoader(
-                    data_split,
-                    batch_size=batch_size,
-                    num_workers=num_workers,
-                    shuffle=shuffle,
-                    persistent_workers=persistent_workers,
-                    pin_memory=pin_memory,
-                )
+                # update time dimension of data split (no copy,
+                # persistent workers see the change)
+                data_split.set_active_frames(nr_sequence_frames)
 
             # Iterate over batches
             iter_pbar = tqdm(data_loader, desc="iter", ncols=100, disable=False)
@@ -134,7 +140,7 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         if profiler is not None:
             profiler.print_avg_times()
 
-    # index pixels (too slow) -------------------------------------------------
+    # index pixels ------------------------------------------------------------
 
     run_index_pixels = False
     if run_index_pixels:
@@ -145,17 +151,29 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         else:
             profiler = None
 
-        # initialize data loader
+        batch_size = 512  # nr of rays sampled per batch
+        print(f"batch_size: {batch_size}")
+
+        # test loop
+
+        # initialize data split (with all frames) and data loader once
         data_split = DataSplit(
             cameras=mv_data.get_split("train"),
             modalities=mv_data.get_split_modalities("train"),
-            index_pixels=True,
+            index_pixels=True,  # index pixels (!!!)
         )
 
-        batch_size = 512  # nr of rays sampled per batch
-        print(f"batch_size: {batch_size}")
-
-        # test loop
+        #
+        data_loader = torch.utils.data.DataLoader(
+            data_split,
+            batch_size=batch_size,
+            num_workers=num_workers,
+            shuffle=shuffle,
+            persistent_workers=persistent_workers,
+            pin_memory=pin_memory,
+            # batches are gathered at once by DataSplit.__getitems__
+            collate_fn=DataSplit.collate_fn,
+        )
 
         # Loop over epochs
         step = 0
@@ -178,23 +196,9 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
 
                 nr_sequence_frames += 1
 
-                # initialize data loader
-                data_split = DataSplit(
-                    cameras=mv_data.get_split("train"),
-                    nr_sequence_frames=nr_sequence_frames,
-                    modalities=mv_data.get_split_modalities("train"),
-                    index_pixels=True,  # index pixels (!!!)
-                )
-
-                #
-                data_loader = torch.utils.data.DataLoader(
-                    data_split,
-                    batch_size=batch_size,
-                    num_workers=num_workers,
-                    shuffle=shuffle,
-                    persistent_workers=persistent_workers,
-                    pin_memory=pin_memory,
-                )
+                # update time dimension of data split (no copy,
+                # persistent workers see the change)
+                data_split.set_active_frames(nr_sequence_frames)
 
             # Iterate over batches
             iter_pbar = tqdm(data_loader, desc="iter", ncols=100, disable=False)
@@ -227,6 +231,74 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         if profiler is not None:
             profiler.print_avg_times()
 
+    # rays batches ------------------------------------------------------------
+
+    run_rays_batches = False
+    if run_rays_batches:
+
+        if benchmark:
+            # Set profiler
+            profiler = Profiler()  # nb: might slow down the code
+        else:
+            profiler = None
+
+        batch_size = 512  # nr of rays sampled per batch
+        print(f"batch_size: {batch_size}")
+
+        data_split = DataSplit(
+            cameras=mv_data.get_split("train"),
+            modalities=mv_data.get_split_modalities("train"),
+        )
+
+        # rays are generated in workers, batches are pinned
+        rays_split = RaysSplit(data_split, batch_size=batch_size, jitter_pixels=True)
+        data_loader = rays_split.get_data_loader(
+            num_workers=num_workers,
+            pin_memory=pin_memory,
+            persistent_workers=persistent_workers,
+        )
+
+        # Loop over epochs
+        step = 0
+        epochs_pbar = tqdm(range(nr_epochs), desc="epochs", ncols=100)
+        for epoch_nr in epochs_pbar:
+
+            if profiler is not None:
+                profiler.start("epoch")
+
+            # Iterate over batches
+            iter_pbar = tqdm(data_loader, desc="iter", ncols=100, disable=False)
+            for iter_nr, batch in enumerate(iter_pbar):
+
+                if profiler is not None:
+                    profiler.start("iter")
+
+                # Move batch to device
+                rays_o = batch["rays_o"].to(device, non_blocking=True)
+                rays_d = batch["rays_d"].to(device, non_blocking=True)
+                vals = {
+                    k: v.to(device, non_blocking=True) for k, v in batch["vals"].items()
+                }
+
+                if not benchmark:
+                    print(
+                        f"{epoch_nr}, {iter_nr}, rays_o: {rays_o.shape}, rays_d: {rays_d.shape}"
+                    )
+
+                # Increment step
+                step += 1
+
+                if profiler is not None:
+                    profiler.end("iter")
+
+            if profiler is not None:
+                profiler.end("epoch")
+
+        print_success(f"Done after {step} steps")
+
+        if profiler is not None:
+            profiler.print_avg_times()
+
 
 if __name__ == "__main__":
 
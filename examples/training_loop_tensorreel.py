@@ -7,7 +7,8 @@ from tqdm import tqdm
 from typing import List
 from mvdatasets.visualization.matplotlib import plot_current_batch
 from mvdatasets.mvdataset import MVDataset
-from mvdatasets.tensorreel import TensorReel
+from mvdatasets.tensorreel import TensorReel, TensorReelPrefetcher
+from mvdatasets.utils.samplers import MaskSampler
 from mvdatasets.utils.profiler import Profiler
 from mvdatasets.geometry.primitives.bounding_box import BoundingBox
 from mvdatasets.configs.example_config import ExampleConfig
@@ -30,6 +31,7 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         datasets_path,
         config=cfg.data.asdict(),
         point_clouds_paths=pc_paths,
+        cache_path=cfg.cache_path,
         verbose=True,
     )
 
@@ -69,6 +71,24 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
 
     # -------------------------------------------------------------------------
 
+    # sample half of the rays on the foreground, if masks are available
+    sampler = None
+    if "masks" in tensorreel.data and cameras_idx is None and frames_idx is None:
+        sampler = MaskSampler(tensorreel.data["masks"], foreground_fraction=0.5)
+        print(sampler)
+
+    # sample the next batches in a background thread, while training
+    prefetcher = TensorReelPrefetcher(
+        tensorreel,
+        nr_prefetched=2,
+        batch_size=batch_size,
+        cameras_idx=cameras_idx,
+        frames_idx=frames_idx,
+        jitter_pixels=True,
+        nr_rays_per_pixel=1,
+        sampler=sampler,
+    )
+
     pbar = tqdm(range(nr_iterations), desc="ray casting", ncols=100)
     azimuth_deg = 20
     azimuth_deg_delta = 1
@@ -77,14 +97,8 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
         if profiler is not None:
             profiler.start("get_next_rays_batch")
 
-        # get rays and gt values
-        batch = tensorreel.get_next_rays_batch(
-            batch_size=batch_size,
-            cameras_idx=cameras_idx,
-            frames_idx=frames_idx,
-            jitter_pixels=True,
-            nr_rays_per_pixel=1,
-        )
+        # get rays and gt values (valid until the next batch is requested)
+        batch = prefetcher.get_next_rays_batch()
 
         if profiler is not None:
             profiler.end("get_next_rays_batch")
@@ -136,6 +150,8 @@ def main(cfg: ExampleConfig, pc_paths: List[Path]):
             # update azimuth
             azimuth_deg += azimuth_deg_delta
 
+    prefetcher.close()
+
     if profiler is not None:
         profiler.print_avg_times()
 
@@ -11,3 +11,4 @@ from mvdatasets.mvdataset import MVDataset
 from mvdatasets.tensorreel import TensorReel
 from mvdatasets.utils.profiler import Profiler
 from mvdatasets.datasplit import DataSplit
+from mvdatasets.rayssplit import RaysSplit
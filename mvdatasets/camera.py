@@ -13,6 +13,7 @@ from mvdatasets.geometry.common import (
     get_mask_points_in_image_range,
 )
 from mvdatasets.utils.printing import print_error, print_warning
+from mvdatasets.io.modality_storage import empty_like_storage, LazyFrames
 from mvdatasets.utils.raycasting import (
     get_pixels,
     get_points_2d_screen_from_pixels,
@@ -22,6 +23,31 @@ from mvdatasets.utils.raycasting import (
 )
 
 
+def _resize_frames(
+    frames: Union[np.ndarray, LazyFrames], scale: float
+) -> Union[np.ndarray, LazyFrames]:
+    """resizes (T, H, W, C) frames by scale with area interpolation,
+    keeping the storage backend (RAM, memory-mapped file or lazy)"""
+
+    # lazy frames are resized when decoded
+    if isinstance(frames, LazyFrames):
+        return frames.resized(scale)
+
+    new_frames = None
+    for i, frame in enumerate(frames):
+        new_frame = cv.resize(
+            frame, (0, 0), fx=scale, fy=scale, interpolation=cv.INTER_AREA
+        )
+        if new_frame.ndim == 2:
+            new_frame = new_frame[:, :, None]
+        if new_frames is None:
+            new_frames = empty_like_storage(
+                frames, (frames.shape[0],) + new_frame.shape, new_frame.dtype
+            )
+        new_frames[i] = new_frame
+    return new_frames
+
+
 class Camera:
     """Camera class to manage intrinsics, pose, and various image data.
     As of now, all given data MUST have the same temporal and spatial dimensions.
@@ -47,6 +73,7 @@ class Camera:
         far: float = 10000.0,
         temporal_dim: int = 1,
         subsample_factor: int = 1,
+        nr_mip_levels: int = 1,
         verbose: bool = False,
     ):
         """
@@ -69,6 +96,7 @@ class Camera:
             width (int, optional): Image width, required if no images are provided.
             height (int, optional): Image height, required if no images are provided.
             subsample_factor (int, optional): Subsampling factor for images. Defaults to 1.
+            nr_mip_levels (int, optional): Number of mip pyramid levels (see build_mip_pyramid). Defaults to 1.
 
         Raises:
             ValueError: If both images and width/height are missing.
@@ -139,10 +167,17 @@ class Camera:
             local_transform.astype(np.float32) if local_transform is not None else None
         )
 
+        # mip pyramid levels (excluding full resolution)
+        self.mip_pyramid = []
+
         # Subsample data if needed
         if subsample_factor > 1:
             self.resize(subsample_factor)
 
+        # (optional) build mip pyramid
+        if nr_mip_levels > 1:
+            self.build_mip_pyramid(nr_mip_levels)
+
         if verbose:
             print(self.__str__())
 
@@ -496,6 +531,9 @@ class Camera:
         # scale intrinsics accordingly
         self._scale_intrinsics(s_width, s_height)
         self.height, self.width = new_height, new_width
+        # rebuild mip pyramid from the new full resolution
+        if len(self.mip_pyramid) > 0:
+            self.build_mip_pyramid(self.get_nr_mip_levels())
         if verbose:
             print(
                 f"camera image plane resized from {old_height}, {old_width} to {self.height}, {self.width}"
@@ -512,16 +550,67 @@ class Camera:
             # skip
             return
 
-        # subsample frames
-        new_frames = []
-        for frame in self.data[modality_name]:
-            new_frame = cv.resize(
-                frame, (0, 0), fx=scale, fy=scale, interpolation=cv.INTER_AREA
+        self.data[modality_name] = _resize_frames(self.data[modality_name], scale)
+
+    def build_mip_pyramid(self, nr_levels: int) -> None:
+        """builds a mip pyramid of all modalities, each level halves the
+        resolution of the previous one (level 0 is the full resolution)
+        Args:
+            nr_levels (int): number of levels, including the full resolution
+        """
+        if nr_levels < 1:
+            raise ValueError("nr_levels must be >= 1")
+        self.mip_pyramid = []
+        prev_level = self.get_mip_level(0)
+        for level_idx in range(1, nr_levels):
+            height = round(prev_level["height"] * 0.5)
+            width = round(prev_level["width"] * 0.5)
+            if height < 1 or width < 1:
+                raise ValueError(
+                    f"mip level {level_idx} of camera {self.camera_label} is empty"
+                )
+            # intrinsics scaled by the actual (rounded) resolution change
+            intrinsics = prev_level["intrinsics"].copy()
+            intrinsics[0, :] *= width / prev_level["width"]
+            intrinsics[1, :] *= height / prev_level["height"]
+            data = {}
+            for key, val in prev_level["data"].items():
+                data[key] = _resize_frames(val, 0.5) if val is not None else None
+            level = {
+                "width": width,
+                "height": height,
+                "intrinsics": intrinsics,
+                "intrinsics_inv": np.linalg.inv(intrinsics),
+                "data": data,
+            }
+            self.mip_pyramid.append(level)
+            prev_level = level
+
+    def get_nr_mip_levels(self) -> int:
+        """return number of mip pyramid levels (1 if no pyramid was built)"""
+        return len(self.mip_pyramid) + 1
+
+    def get_mip_level(self, level: int = 0) -> dict:
+        """returns a mip pyramid level
+        Args:
+            level (int, optional): mip level, 0 is the full resolution. Defaults to 0.
+        Returns:
+            dict: "width" (int), "height" (int), "intrinsics" (3, 3),
+                "intrinsics_inv" (3, 3) and "data" (dict of (T, H, W, C) modalities)
+        """
+        if level < 0 or level >= self.get_nr_mip_levels():
+            raise ValueError(
+                f"mip level {level} out of range [0, {self.get_nr_mip_levels()})"
             )
-            if new_frame.ndim == 2:
-                new_frame = new_frame[:, :, None]
-            new_frames.append(new_frame)
-        self.data[modality_name] = np.stack(new_frames)
+        if level > 0:
+            return self.mip_pyramid[level - 1]
+        return {
+            "width": self.width,
+            "height": self.height,
+            "intrinsics": self.intrinsics,
+            "intrinsics_inv": self.intrinsics_inv,
+            "data": self.data,
+        }
 
     def get_pixels(self, device: str = "cpu") -> torch.Tensor:
         """returns all pixels in the image plane
@@ -38,6 +38,18 @@ class DatasetConfig(PrintableConfig):
     """Initial sphere radius multiplier (<= 1.0), (for SDF initialization)"""
     pose_only: bool = False
     """Load only poses (no images)"""
+    nr_workers: Optional[int] = None
+    """Number of parallel image decoding workers, if None, uses all available cores"""
+    memmap_path: Optional[Path] = None
+    """Directory where loaders write modalities as memory-mapped files, if None, modalities are kept in RAM"""
+    shared_memory: bool = False
+    """Decode modalities kept in RAM to shared memory, so that DataLoader workers do not hold a copy each"""
+    lazy_loading: bool = False
+    """Decode frames on first access instead of at load time"""
+    lazy_cache_gb: float = 2.0
+    """Size (GB) of the LRU cache of lazily decoded frames"""
+    nr_mip_levels: int = 1
+    """Number of per-camera mip pyramid levels (1 = full resolution only), each level halves the resolution"""
 
     def __post__init__(self):
         #
@@ -70,3 +82,20 @@ class DatasetConfig(PrintableConfig):
         # pose_only
         if type(self.pose_only) is not bool:
             raise ValueError("pose_only must be a boolean")
+        # nr_workers
+        if self.nr_workers is not None and (
+            type(self.nr_workers) is not int or self.nr_workers < 1
+        ):
+            raise ValueError("nr_workers must be an integer >= 1 or None")
+        # shared_memory
+        if type(self.shared_memory) is not bool:
+            raise ValueError("shared_memory must be a boolean")
+        # lazy_loading
+        if type(self.lazy_loading) is not bool:
+            raise ValueError("lazy_loading must be a boolean")
+        # lazy_cache_gb
+        if self.lazy_cache_gb <= 0:
+            raise ValueError("lazy_cache_gb must be > 0")
+        # nr_mip_levels
+        if type(self.nr_mip_levels) is not int or self.nr_mip_levels < 1:
+            raise ValueError("nr_mip_levels must be an integer >= 1")
@@ -1,5 +1,6 @@
 from collections import OrderedDict
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Optional
 import tyro
 from dataclasses import dataclass
 from mvdatasets.configs.dataset_config import DatasetConfig
@@ -188,6 +189,8 @@ class VISORConfig(DatasetConfig):
     """Load semantic mask images"""
     frame_rate: float = 10.0
     """Frame rate of the sequence"""
+    masks_cache_path: Optional[Path] = None
+    """Directory where rasterised masks (and frames data) are cached, if None, annotations are parsed and rasterised at every load"""
 
     def __post__init__(self):
         # Check configuration values
@@ -365,6 +368,10 @@ class Flow3DConfig(DatasetConfig):
     """Load depth images"""
     load_2d_tracks: bool = True
     """Load 2D tracks"""
+    nr_tracks_2d_samples: int = 1000
+    """Number of 2D tracks sampled (evenly across query frames)"""
+    tracks_2d_cache_path: Optional[Path] = None
+    """Directory where 2D tracks are packed (one file per query frame), if None, sampled tracks are read from the per frames pair files at every load"""
     load_3d_tracks: bool = True
     """Load 3D tracks"""
     frame_rate: float = 30.0
@@ -382,6 +389,9 @@ class Flow3DConfig(DatasetConfig):
         # load_2d_tracks
         if type(self.load_2d_tracks) is not bool:
             raise ValueError("load_2d_tracks must be a boolean")
+        # nr_tracks_2d_samples
+        if type(self.nr_tracks_2d_samples) is not int or self.nr_tracks_2d_samples < 1:
+            raise ValueError("nr_tracks_2d_samples must be an integer >= 1")
         # load_3d_tracks
         if type(self.load_3d_tracks) is not bool:
             raise ValueError("load_3d_tracks must be a boolean")
@@ -24,6 +24,8 @@ class ExampleConfig(PrintableConfig):
     """Relative or absolute path to the root datasets directory"""
     output_path: Path = Path("outputs")
     """Relative or absolute path to the output directory to save splots, videos, etc..."""
+    cache_path: Optional[Path] = None
+    """Relative or absolute path to the preprocessed scenes cache directory, if None, no caching"""
 
     with_viewer: bool = False
     """Show viewers to visualize the examples"""
@@ -1,12 +1,35 @@
 import torch
 import numpy as np
 from typing import List
+from collections.abc import Sequence
 from mvdatasets.utils.printing import print_warning, print_success
 from mvdatasets.utils.memory import bytes_to_gb
+from mvdatasets.io.modality_storage import stack_like_storage, is_lazy, is_memmap
+from mvdatasets.io.shared_memory import to_shared_memory, pack_array, unpack_array
 from mvdatasets import Camera
 from mvdatasets.utils.raycasting import get_pixels
 
 
+def _to_float_tensor(array: np.ndarray) -> torch.Tensor:
+    return torch.from_numpy(np.ascontiguousarray(array, dtype=np.float32))
+
+
+class SamplesBatch(Sequence):
+    """batch of samples gathered at once (see DataSplit.get_batch), that can
+    also be read sample by sample (e.g. by torch default_collate)"""
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data["cameras_idxs"])
+
+    def __getitem__(self, idx: int) -> dict:
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        return {key: val[idx] for key, val in self.data.items()}
+
+
 class DataSplit:
 
     def __init__(
@@ -16,83 +39,221 @@ class DataSplit:
         modalities: List[str] = ["rgbs", "masks"],
         index_pixels: bool = False,
         contiguous: bool = False,
+        return_pixels: bool = True,
     ):
         """Class to store a split of dataset cameras.
 
         Args:
             cameras (List[Camera]): list of Camera objects.
-            nr_sequence_frames (int, optional): Defaults to -1, means all temporal frames are used.
+            nr_sequence_frames (int, optional): number of indexed frames per camera (see set_active_frames). Defaults to -1, means all temporal frames are used.
             modalities (List[str], optional): Defaults to ["rgbs", "masks"].
             index_pixels (bool, optional): If True, indexes images pixels directly. If False, indexes whole images. Defaults to False.
+            contiguous (bool, optional): If True, modalities are copied to contiguous arrays if needed. Defaults to False.
+            return_pixels (bool, optional): If False, the pixels grid is not returned when indexing whole images. Defaults to True.
+
+        Cameras data that are equally spaced views of a same buffer (e.g. the split
+        buffers allocated by loaders) are stacked without copying, so the split
+        modalities share memory with the cameras.
         """
         self.nr_cameras = len(cameras)
         # assumption: all cameras have the same dimensions (T)
-        temporal_dim = cameras[0].get_temporal_dim()
+        self.nr_frames = cameras[0].get_temporal_dim()
 
         if nr_sequence_frames == -1:
-            self.temporal_dim = temporal_dim
-        else:
-            # assert temporal_dim >= nr_sequence_frames
-            if nr_sequence_frames > temporal_dim:
-                print_warning(
-                    f"nr_sequence_frames: {nr_sequence_frames} > temporal_dim: {temporal_dim}, capping to {temporal_dim}"
-                )
-                nr_sequence_frames = temporal_dim
-            self.temporal_dim = nr_sequence_frames
-
-        self.width = cameras[0].get_width()
-        self.height = cameras[0].get_height()
+            nr_sequence_frames = self.nr_frames
+        elif nr_sequence_frames > self.nr_frames:
+            print_warning(
+                f"nr_sequence_frames: {nr_sequence_frames} > temporal_dim: {self.nr_frames}, capping to {self.nr_frames}"
+            )
+            nr_sequence_frames = self.nr_frames
+
+        # (start, nr) window of indexed frames, all frames are stored;
+        # in shared memory, so that DataLoader workers (also persistent ones)
+        # see the changes made by set_active_frames
+        self._active_frames = torch.zeros(2, dtype=torch.long).share_memory_()
+        self.set_active_frames(nr_sequence_frames)
+
         self.index_pixels = index_pixels
+        self.return_pixels = return_pixels
 
-        data = {}
-        intrinsics_all = []
-        intrinsics_inv_all = []
         c2w_all = []
         w2c_all = []
         timestamps_all = []
 
         for camera in cameras:
+            c2w_all.append(camera.get_pose())
+            w2c_all.append(camera.get_pose_inv())
+            timestamps_all.append(camera.get_timestamps())  # (T,)
+
+        # converted once, samples get views (or gathers) of these
+        self.c2w_all = _to_float_tensor(np.stack(c2w_all))  # (N, 4, 4)
+        self.w2c_all = _to_float_tensor(np.stack(w2c_all))  # (N, 4, 4)
+        self.timestamps_all = _to_float_tensor(np.stack(timestamps_all))  # (N, T)
+
+        # assumption: all cameras have the same number of mip levels
+        self.nr_mip_levels = min(camera.get_nr_mip_levels() for camera in cameras)
+        self.mip_levels = [
+            self._stack_mip_level(cameras, level, modalities, contiguous)
+            for level in range(self.nr_mip_levels)
+        ]
+        self.set_mip_level(0)
+
+        print_success(self)
+
+    def _stack_mip_level(
+        self,
+        cameras: List[Camera],
+        level: int,
+        modalities: List[str],
+        contiguous: bool,
+    ) -> dict:
+        """stacks the data of all cameras at a mip level"""
+        data = {}
+        intrinsics_all = []
+        intrinsics_inv_all = []
+
+        for camera in cameras:
+            mip_level = camera.get_mip_level(level)
 
             # get camera data
-            for key, val in camera.data.items():
+            for key, val in mip_level["data"].items():
                 # populate data dict
                 if key in modalities:
                     if key not in data:
                         data[key] = []
                     if val is not None:
                         # val is (T, H, W, C)
-                        # keep only the first temporal_dim frames
-                        val_ = val[: self.temporal_dim]
-                        # val_ is (T_s, H, W, C)
-                        data[key].append(val_)
+                        data[key].append(val)
                     else:
                         raise ValueError(
                             f"camera {camera.camera_label} has no {key} data"
                         )
 
-            intrinsics_all.append(camera.get_intrinsics())
-            intrinsics_inv_all.append(camera.get_intrinsics_inv())
-            c2w_all.append(camera.get_pose())
-            w2c_all.append(camera.get_pose_inv())
-            # get timestamps (up to temporal_dim)
-            timestamps = camera.get_timestamps()  # (T,)
-            timestamps = timestamps[: self.temporal_dim]  # (T_s,)
-            timestamps_all.append(timestamps)
-
-        self.intrinsics_all = np.stack(intrinsics_all)  # (N, 3, 3)
-        self.intrinsics_inv_all = np.stack(intrinsics_inv_all)  # (N, 3, 3)
-        self.c2w_all = np.stack(c2w_all)  # (N, 4, 4)
-        self.w2c_all = np.stack(w2c_all)  # (N, 4, 4)
-        self.timestamps_all = np.stack(timestamps_all)  # (N, T)
+            intrinsics_all.append(mip_level["intrinsics"])
+            intrinsics_inv_all.append(mip_level["intrinsics_inv"])
 
         # concat data
         for key, val in data.items():
-            data[key] = np.stack(val)  # (N, T, H, W, C)
-            if contiguous:
+            # views of a split buffer are not copied,
+            # memory-mapped modalities stay memory-mapped,
+            # lazy modalities are decoded on access
+            data[key] = stack_like_storage(val)  # (N, T, H, W, C)
+            if contiguous and not is_lazy(data[key]):
                 data[key] = np.ascontiguousarray(data[key])
-        self.data = data
 
-        print_success(self)
+        return {
+            # assumption: all cameras have the same dimensions (H, W)
+            "width": mip_level["width"],
+            "height": mip_level["height"],
+            "intrinsics_all": _to_float_tensor(np.stack(intrinsics_all)),  # (N, 3, 3)
+            "intrinsics_inv_all": _to_float_tensor(
+                np.stack(intrinsics_inv_all)
+            ),  # (N, 3, 3)
+            "data": data,
+        }
+
+    def set_mip_level(self, level: int) -> None:
+        """selects the mip level indexed by the split, workers of a
+        DataLoader only see the change if it is set before they are created
+
+        Args:
+            level (int): mip level, 0 is the full resolution.
+        """
+        if level < 0 or level >= self.nr_mip_levels:
+            raise ValueError(
+                f"mip level {level} out of range [0, {self.nr_mip_levels})"
+            )
+        mip_level = self.mip_levels[level]
+        self.mip_level = level
+        self.width = mip_level["width"]
+        self.height = mip_level["height"]
+        self.intrinsics_all = mip_level["intrinsics_all"]
+        self.intrinsics_inv_all = mip_level["intrinsics_inv_all"]
+        self.data = mip_level["data"]
+        # pixels grid of the mip level, built on first use
+        self._pixels = None
+
+    def get_pixels(self) -> torch.Tensor:
+        """returns the pixels grid of the selected mip level, built once and
+        shared by all samples indexing whole images (not to be modified in place)
+
+        Returns:
+            torch.Tensor: (H, W, 2) long, see utils.raycasting.get_pixels
+        """
+        if self._pixels is None:
+            self._pixels = get_pixels(width=self.width, height=self.height).long()
+        return self._pixels
+
+    @property
+    def temporal_dim(self) -> int:
+        """number of indexed frames per camera (see set_active_frames)"""
+        return int(self._active_frames[1])
+
+    @property
+    def frames_start(self) -> int:
+        """index of the first indexed frame (see set_active_frames)"""
+        return int(self._active_frames[0])
+
+    def set_active_frames(self, nr_frames: int, start: int = 0) -> None:
+        """selects the window of frames indexed by the split, without copying
+        data; changes are seen by the workers of a DataLoader (also persistent
+        ones), samplers see the new length from the next epoch
+
+        Args:
+            nr_frames (int): number of indexed frames per camera.
+            start (int, optional): index of the first indexed frame. Defaults to 0.
+        """
+        if nr_frames < 1 or start < 0 or start + nr_frames > self.nr_frames:
+            raise ValueError(
+                f"frames window [{start}, {start + nr_frames}) out of range [0, {self.nr_frames})"
+            )
+        self._active_frames[0] = start
+        self._active_frames[1] = nr_frames
+
+    def share_memory(self) -> "DataSplit":
+        """moves modalities kept in RAM to shared memory (modalities already in
+        shared memory, memory-mapped or lazy are left as they are).
+
+        When the split is sent to DataLoader workers (e.g. with the "spawn" or
+        "forkserver" start methods), modalities in shared memory are attached by
+        handle and memory-mapped ones are re-mapped from their files, so workers
+        map the same pages instead of unpickling a copy of the data each.
+        Modalities are copied to shared memory, unless loaded there directly
+        (see DatasetConfig.shared_memory).
+
+        Returns:
+            DataSplit: self
+        """
+        for mip_level in self.mip_levels:
+            data = mip_level["data"]
+            for key, val in data.items():
+                if not is_lazy(val) and not is_memmap(val):
+                    data[key] = to_shared_memory(val)
+        return self
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # selected mip level data is restored by set_mip_level
+        del state["data"]
+        state["_pixels"] = None
+        state["mip_levels"] = [
+            {
+                **mip_level,
+                "data": {
+                    key: pack_array(val) for key, val in mip_level["data"].items()
+                },
+            }
+            for mip_level in self.mip_levels
+        ]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        for mip_level in self.mip_levels:
+            data = mip_level["data"]
+            for key, val in data.items():
+                data[key] = unpack_array(val)
+        self.set_mip_level(self.mip_level)
 
     def __len__(self):
         # returns the number of cameras frames in the split
@@ -101,11 +262,104 @@ class DataSplit:
         else:
             return self.nr_cameras * self.temporal_dim
 
+    def _unravel_index(self, idx):
+        """converts flat indices (int or np.ndarray) to cameras, frames
+        and pixels (None if indexing frames) indices"""
+        frames_start, temporal_dim = self._active_frames.tolist()
+        if self.index_pixels:
+            # index indexes all pixels of cameras frames in the split [0, N_cam * T * W * H]
+            cam_idx = idx // (temporal_dim * self.width * self.height)
+            frame_idx = (idx // (self.width * self.height)) % temporal_dim
+            pixel_idx = idx % (self.width * self.height)
+        else:
+            # index indexes all cameras frames in the split [0, N_cam * T]
+            # get camera id by dividing by the temporal dimension
+            cam_idx = idx // temporal_dim
+            frame_idx = idx % temporal_dim
+            pixel_idx = None
+        # frames indices in the window of active frames
+        frame_idx = frame_idx + frames_start
+        return cam_idx, frame_idx, pixel_idx
+
+    def get_batch(self, idxs) -> dict:
+        """Indexing the split with a batch of indices, all modalities are
+        gathered at once.
+
+        Args:
+            idxs (list, np.ndarray or torch.Tensor): (B,) samples indices
+
+        Returns:
+            dict: same as __getitem__, with a leading batch dimension
+        """
+        if isinstance(idxs, torch.Tensor):
+            idxs = idxs.cpu().numpy()
+        idxs = np.asarray(idxs, dtype=np.int64)
+        cam_idx, frame_idx, pixel_idx = self._unravel_index(idxs)
+
+        data = {
+            "cameras_idxs": torch.from_numpy(cam_idx),  # (B,)
+            "frames_idxs": torch.from_numpy(frame_idx),  # (B,)
+            "intrinsics": self.intrinsics_all[cam_idx],  # (B, 3, 3)
+            "intrinsics_inv": self.intrinsics_inv_all[cam_idx],  # (B, 3, 3)
+            "c2w": self.c2w_all[cam_idx],  # (B, 4, 4)
+            "w2c": self.w2c_all[cam_idx],  # (B, 4, 4)
+            "timestamps": self.timestamps_all[cam_idx, frame_idx],  # (B,)
+        }
+
+        if self.index_pixels:
+            i = pixel_idx % self.width  # x coordinate (width)
+            j = pixel_idx // self.width  # y coordinate (height)
+            for k, v in self.data.items():
+                # keep dtype consistent with the one in Camera.data
+                data[k] = torch.from_numpy(
+                    np.asarray(v[cam_idx, frame_idx, j, i])
+                )  # (B, C)
+            data["pixels"] = torch.from_numpy(np.stack([i, j], axis=-1))  # (B, 2)
+        else:
+            for k, v in self.data.items():
+                # keep dtype consistent with the one in Camera.data
+                data[k] = torch.from_numpy(
+                    np.asarray(v[cam_idx, frame_idx])
+                )  # (B, H, W, C)
+            if self.return_pixels:
+                pixels = self.get_pixels()
+                data["pixels"] = pixels.expand(len(idxs), *pixels.shape)  # (B, H, W, 2)
+        return data
+
+    def __getitems__(self, idxs) -> "SamplesBatch":
+        """Batched indexing used by DataLoader instead of __getitem__
+        (see get_batch), with collate_fn=DataSplit.collate_fn the batch
+        is returned as is, else it is collated sample by sample.
+
+        Args:
+            idxs (list): (B,) samples indices
+
+        Returns:
+            SamplesBatch: batch
+        """
+        return SamplesBatch(self.get_batch(idxs))
+
+    @staticmethod
+    def collate_fn(batch):
+        """DataLoader collate function, batches returned by __getitems__ are
+        already collated, lists of samples are collated with default_collate
+
+        Args:
+            batch (SamplesBatch or list): batch
+
+        Returns:
+            dict: collated batch
+        """
+        if isinstance(batch, SamplesBatch):
+            return batch.data
+        return torch.utils.data.default_collate(batch)
+
     def __getitem__(self, idx) -> Camera:
-        """Indexing the split.
+        """Indexing the split, cameras tensors and the pixels grid are
+        views of tensors shared by all samples (not to be modified in place).
 
         Args:
-            idx (int): sample index
+            idx (int): sample index, a list of indices is indexed with get_batch
 
         Returns:
             cameras_idxs (torch.Tensor, long): (1,)
@@ -115,35 +369,25 @@ class DataSplit:
             c2w (torch.Tensor, float32): (4, 4)
             w2c (torch.Tensor, float32): (4, 4)
             timestamps (torch.Tensor, float32): (1,)
-            pixels (torch.Tensor, long): (H, W, 2) or (2,) [0, W-1], [0, H-1]
+            pixels (torch.Tensor, long): (H, W, 2) (if return_pixels) or (2,) [0, W-1], [0, H-1]
             rgbs (torch.Tensor, uint8): (H, W, C) or (C,)
             ...
         """
-        if self.index_pixels:
-            # index indexes all pixels of cameras frames in the split [0, N_cam * T * W * H]
-            cam_idx = idx // (self.temporal_dim * self.width * self.height)
-            frame_idx = (idx // (self.width * self.height)) % self.temporal_dim
-            pixel_idx = idx % (self.width * self.height)
-        else:
-            # index indexes all cameras frames in the split [0, N_cam * T]
-            # get camera id by dividing by the temporal dimension
-            cam_idx = idx // self.temporal_dim
-            frame_idx = idx % self.temporal_dim
+        if isinstance(idx, (list, tuple, np.ndarray, torch.Tensor)):
+            # batch of indices (e.g. from a BatchSampler used as sampler)
+            return self.get_batch(idx)
+
+        cam_idx, frame_idx, pixel_idx = self._unravel_index(idx)
 
         data = {
             "cameras_idxs": torch.tensor(cam_idx, dtype=torch.long),  # (1,)
             "frames_idxs": torch.tensor(frame_idx, dtype=torch.long),  # (1,)
-            "intrinsics": torch.from_numpy(
-                self.intrinsics_all[cam_idx]
-            ).float(),  # (3, 3)
-            "intrinsics_inv": torch.from_numpy(
-                self.intrinsics_inv_all[cam_idx]
-            ).float(),  # (3, 3)
-            "c2w": torch.from_numpy(self.c2w_all[cam_idx]).float(),  # (4, 4)
-            "w2c": torch.from_numpy(self.w2c_all[cam_idx]).float(),  # (4, 4)
-            "timestamps": torch.tensor(
-                self.timestamps_all[cam_idx, frame_idx]
-            ).float(),  # (1,)
+            # views of the per-camera tensors, no allocation
+            "intrinsics": self.intrinsics_all[cam_idx],  # (3, 3)
+            "intrinsics_inv": self.intrinsics_inv_all[cam_idx],  # (3, 3)
+            "c2w": self.c2w_all[cam_idx],  # (4, 4)
+            "w2c": self.w2c_all[cam_idx],  # (4, 4)
+            "timestamps": self.timestamps_all[cam_idx, frame_idx],  # (1,)
         }
 
         if self.index_pixels:
@@ -157,15 +401,12 @@ class DataSplit:
             for k, v in self.data.items():
                 # keep dtype consistent with the one in Camera.data
                 data[k] = torch.from_numpy(v[cam_idx, frame_idx])  # (H, W, C)
-            data["pixels"] = get_pixels(
-                width=self.width, height=self.height
-            )  # (H, W, 2)
-            # convert pixels to long
-            data["pixels"] = data["pixels"].long()
+            if self.return_pixels:
+                data["pixels"] = self.get_pixels()  # (H, W, 2)
         return data
 
     def __str__(self) -> str:
-        return f"DataSplit with {len(self)} indexable items (nr_cameras: {self.nr_cameras}, temporal_dim: {self.temporal_dim}, width: {self.width}, height: {self.height}), totalling {bytes_to_gb(self.get_memory_footprint())} GB."
+        return f"DataSplit with {len(self)} indexable items (nr_cameras: {self.nr_cameras}, temporal_dim: {self.temporal_dim}, width: {self.width}, height: {self.height}, nr_mip_levels: {self.nr_mip_levels}), totalling {bytes_to_gb(self.get_memory_footprint())} GB."
 
     def get_memory_footprint(self) -> int:
         """
@@ -176,10 +417,11 @@ class DataSplit:
         """
         # returns the memory footprint of the split in bytes
         memory_footprint = 0
-        for key, val in self.data.items():
-            memory_footprint += val.nbytes
-        memory_footprint += self.intrinsics_all.nbytes
-        memory_footprint += self.intrinsics_inv_all.nbytes
+        for mip_level in self.mip_levels:
+            for key, val in mip_level["data"].items():
+                memory_footprint += val.nbytes
+            memory_footprint += mip_level["intrinsics_all"].nbytes
+            memory_footprint += mip_level["intrinsics_inv_all"].nbytes
         memory_footprint += self.c2w_all.nbytes
         memory_footprint += self.w2c_all.nbytes
         memory_footprint += self.timestamps_all.nbytes
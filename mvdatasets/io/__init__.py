@@ -1 +1,2 @@
 from mvdatasets.io.yaml_utils import load_yaml, save_yaml
+from mvdatasets.io.decoding import load_image, decode_images
@@ -0,0 +1,350 @@
+import os
+import struct
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from mvdatasets.geometry.quaternions import quats_to_rots
+
+# COLMAP camera models: model_id -> (model_name, number of params)
+CAMERA_MODELS = {
+    0: ("SIMPLE_PINHOLE", 3),
+    1: ("PINHOLE", 4),
+    2: ("SIMPLE_RADIAL", 4),
+    3: ("RADIAL", 5),
+    4: ("OPENCV", 8),
+    5: ("OPENCV_FISHEYE", 8),
+    6: ("FULL_OPENCV", 12),
+    7: ("FOV", 5),
+    8: ("SIMPLE_RADIAL_FISHEYE", 4),
+    9: ("RADIAL_FISHEYE", 5),
+    10: ("THIN_PRISM_FISHEYE", 12),
+}
+
+# points3D.bin record header (followed by track_length (image_id, point2D_idx))
+POINT3D_HEADER_DTYPE = np.dtype(
+    [
+        ("id", "<u8"),
+        ("xyz", "<f8", (3,)),
+        ("rgb", "u1", (3,)),
+        ("error", "<f8"),
+        ("track_length", "<u8"),
+    ]
+)
+POINT3D_TRACK_DTYPE = np.dtype([("image_id", "<i4"), ("point2D_idx", "<i4")])
+
+# images.bin record header (followed by name, null terminated, and points2D)
+IMAGE_HEADER_DTYPE = np.dtype(
+    [
+        ("id", "<i4"),
+        ("qvec", "<f8", (4,)),
+        ("tvec", "<f8", (3,)),
+        ("camera_id", "<i4"),
+    ]
+)
+# (x, y, point3D_id) per 2D point
+IMAGE_POINT2D_NBYTES = 24
+
+
+def read_cameras_binary(file_path: Union[str, Path]) -> Dict[int, dict]:
+    """reads COLMAP cameras.bin
+
+    Args:
+        file_path (str or Path): cameras.bin file path
+
+    Returns:
+        dict: camera_id -> {"model": str, "width": int, "height": int, "params": np.ndarray}
+    """
+    with open(file_path, "rb") as f:
+        buf = f.read()
+    (nr_cameras,) = struct.unpack_from("<Q", buf, 0)
+    offset = 8
+    cameras = {}
+    for _ in range(nr_cameras):
+        camera_id, model_id, width, height = struct.unpack_from("<iiQQ", buf, offset)
+        offset += 24
+        model_name, nr_params = CAMERA_MODELS[model_id]
+        params = np.frombuffer(buf, dtype="<f8", count=nr_params, offset=offset)
+        offset += 8 * nr_params
+        cameras[camera_id] = {
+            "model": model_name,
+            "width": width,
+            "height": height,
+            "params": params.copy(),
+        }
+    return cameras
+
+
+def read_cameras_text(file_path: Union[str, Path]) -> Dict[int, dict]:
+    """reads COLMAP cameras.txt (see read_cameras_binary)"""
+    cameras = {}
+    with open(file_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) == 0 or line.startswith("#"):
+                continue
+            elems = line.split()
+            cameras[int(elems[0])] = {
+                "model": elems[1],
+                "width": int(elems[2]),
+                "height": int(elems[3]),
+                "params": np.array(elems[4:], dtype=np.float64),
+            }
+    return cameras
+
+
+def read_images_binary(file_path: Union[str, Path]) -> dict:
+    """reads COLMAP images.bin, skipping 2D points
+
+    Args:
+        file_path (str or Path): images.bin file path
+
+    Returns:
+        dict: {
+            "ids": (N,) images ids,
+            "camera_ids": (N,) cameras ids,
+            "names": list of N images names,
+            "qvecs": (N, 4) world-to-camera rotations (w, x, y, z),
+            "tvecs": (N, 3) world-to-camera translations
+        }
+    """
+    with open(file_path, "rb") as f:
+        buf = f.read()
+    (nr_images,) = struct.unpack_from("<Q", buf, 0)
+    offset = 8
+    headers = np.empty(nr_images, dtype=IMAGE_HEADER_DTYPE)
+    names = []
+    for i in range(nr_images):
+        headers[i] = np.frombuffer(
+            buf, dtype=IMAGE_HEADER_DTYPE, count=1, offset=offset
+        )
+        offset += IMAGE_HEADER_DTYPE.itemsize
+        name_end = buf.index(b"\x00", offset)
+        names.append(buf[offset:name_end].decode("utf-8"))
+        offset = name_end + 1
+        (nr_points2d,) = struct.unpack_from("<Q", buf, offset)
+        offset += 8 + nr_points2d * IMAGE_POINT2D_NBYTES
+    return {
+        "ids": headers["id"].astype(np.int64),
+        "camera_ids": headers["camera_id"].astype(np.int64),
+        "names": names,
+        "qvecs": headers["qvec"],
+        "tvecs": headers["tvec"],
+    }
+
+
+def read_images_text(file_path: Union[str, Path]) -> dict:
+    """reads COLMAP images.txt, skipping 2D points (see read_images_binary)"""
+    with open(file_path, "r") as f:
+        lines = [line for line in f.read().splitlines() if not line.startswith("#")]
+    headers = []
+    idx = 0
+    while idx < len(lines):
+        if len(lines[idx].strip()) == 0:
+            idx += 1
+            continue
+        headers.append(lines[idx].split())
+        # skip 2D points line
+        idx += 2
+    qvecs = np.array([elems[1:5] for elems in headers], dtype=np.float64)
+    tvecs = np.array([elems[5:8] for elems in headers], dtype=np.float64)
+    return {
+        "ids": np.array([int(elems[0]) for elems in headers], dtype=np.int64),
+        "camera_ids": np.array([int(elems[8]) for elems in headers], dtype=np.int64),
+        "names": [" ".join(elems[9:]) for elems in headers],
+        "qvecs": qvecs.reshape(-1, 4),
+        "tvecs": tvecs.reshape(-1, 3),
+    }
+
+
+def read_points3d_binary(
+    file_path: Union[str, Path], load_tracks: bool = False
+) -> dict:
+    """reads COLMAP points3D.bin, records are located with a single scan over
+    the tracks lengths and parsed all at once
+
+    Args:
+        file_path (str or Path): points3D.bin file path
+        load_tracks (bool, optional): if True, also returns the points tracks.
+            Defaults to False.
+
+    Returns:
+        dict: {
+            "ids": (N,) points ids,
+            "xyz": (N, 3) points positions,
+            "rgb": (N, 3) points colors, uint8,
+            "errors": (N,) reprojection errors,
+            "tracks_lengths": (N,) (only if load_tracks),
+            "tracks": (sum(tracks_lengths), 2) (image_id, point2D_idx) (only if load_tracks)
+        }
+    """
+    with open(file_path, "rb") as f:
+        buf = f.read()
+    (nr_points,) = struct.unpack_from("<Q", buf, 0)
+
+    # find records offsets
+    header_nbytes = POINT3D_HEADER_DTYPE.itemsize
+    track_length_offset = POINT3D_HEADER_DTYPE.fields["track_length"][1]
+    track_nbytes = POINT3D_TRACK_DTYPE.itemsize
+    offsets = np.empty(nr_points, dtype=np.int64)
+    offset = 8
+    unpack_from = struct.Struct("<Q").unpack_from
+    for i in range(nr_points):
+        offsets[i] = offset
+        offset += (
+            header_nbytes
+            + track_nbytes * unpack_from(buf, offset + track_length_offset)[0]
+        )
+
+    # gather records headers
+    buf_np = np.frombuffer(buf, dtype=np.uint8)
+    headers = buf_np[offsets[:, None] + np.arange(header_nbytes)]
+    headers = headers.view(POINT3D_HEADER_DTYPE)[:, 0]
+
+    points = {
+        "ids": headers["id"].astype(np.int64),
+        "xyz": headers["xyz"],
+        "rgb": headers["rgb"],
+        "errors": headers["error"],
+    }
+
+    if load_tracks:
+        tracks_lengths = headers["track_length"].astype(np.int64)
+        # byte offset of each track element
+        tracks_starts = np.repeat(offsets + header_nbytes, tracks_lengths)
+        elems_idxs = np.arange(len(tracks_starts)) - np.repeat(
+            np.cumsum(tracks_lengths) - tracks_lengths, tracks_lengths
+        )
+        tracks_offsets = tracks_starts + track_nbytes * elems_idxs
+        tracks = buf_np[tracks_offsets[:, None] + np.arange(track_nbytes)]
+        tracks = tracks.view("<i4")  # (M, 2)
+        points["tracks_lengths"] = tracks_lengths
+        points["tracks"] = tracks
+
+    return points
+
+
+def read_points3d_text(file_path: Union[str, Path], load_tracks: bool = False) -> dict:
+    """reads COLMAP points3D.txt (see read_points3d_binary)"""
+    headers = []
+    tracks = []
+    tracks_lengths = []
+    with open(file_path, "r") as f:
+        for line in f:
+            if len(line.strip()) == 0 or line.startswith("#"):
+                continue
+            elems = line.split()
+            headers.append(elems[:8])
+            if load_tracks:
+                track = np.array(elems[8:], dtype=np.int32).reshape(-1, 2)
+                tracks.append(track)
+                tracks_lengths.append(len(track))
+    headers = np.array(headers, dtype=np.float64).reshape(-1, 8)
+    points = {
+        "ids": headers[:, 0].astype(np.int64),
+        "xyz": headers[:, 1:4],
+        "rgb": headers[:, 4:7].astype(np.uint8),
+        "errors": headers[:, 7],
+    }
+    if load_tracks:
+        points["tracks_lengths"] = np.array(tracks_lengths, dtype=np.int64)
+        points["tracks"] = (
+            np.concatenate(tracks)
+            if len(tracks) > 0
+            else np.empty((0, 2), dtype=np.int32)
+        )
+    return points
+
+
+def read_model(
+    colmap_dir: Union[str, Path], load_points: bool = True, load_tracks: bool = False
+) -> Tuple[Dict[int, dict], dict, Optional[dict]]:
+    """reads a COLMAP model (binary if cameras.bin exists, else text)
+
+    Args:
+        colmap_dir (str or Path): folder containing the COLMAP model
+        load_points (bool, optional): if False, points3D are not read. Defaults to True.
+        load_tracks (bool, optional): if True, points tracks are read. Defaults to False.
+
+    Returns:
+        dict: cameras (see read_cameras_binary)
+        dict: images (see read_images_binary)
+        dict: points3D (see read_points3d_binary), None if not load_points
+    """
+    if os.path.exists(os.path.join(colmap_dir, "cameras.bin")):
+        ext = ".bin"
+        read_cameras, read_images, read_points3d = (
+            read_cameras_binary,
+            read_images_binary,
+            read_points3d_binary,
+        )
+    elif os.path.exists(os.path.join(colmap_dir, "cameras.txt")):
+        ext = ".txt"
+        read_cameras, read_images, read_points3d = (
+            read_cameras_text,
+            read_images_text,
+            read_points3d_text,
+        )
+    else:
+        raise ValueError(f"no COLMAP model found in {colmap_dir}")
+
+    cameras = read_cameras(os.path.join(colmap_dir, "cameras" + ext))
+    images = read_images(os.path.join(colmap_dir, "images" + ext))
+    points = None
+    if load_points:
+        points = read_points3d(
+            os.path.join(colmap_dir, "points3D" + ext), load_tracks=load_tracks
+        )
+    return cameras, images, points
+
+
+def get_w2c_mats(images: dict) -> np.ndarray:
+    """returns images world-to-camera matrices
+
+    Args:
+        images (dict): images (see read_images_binary)
+
+    Returns:
+        np.ndarray: (N, 4, 4) world-to-camera matrices
+    """
+    w2c_mats = np.tile(np.eye(4), (len(images["names"]), 1, 1))
+    if len(images["names"]) > 0:
+        w2c_mats[:, :3, :3] = quats_to_rots(images["qvecs"])
+        w2c_mats[:, :3, 3] = images["tvecs"]
+    return w2c_mats
+
+
+def get_camera_params(camera: dict) -> Tuple[np.ndarray, np.ndarray, str]:
+    """returns camera intrinsics and distortion parameters
+
+    Args:
+        camera (dict): camera (see read_cameras_binary)
+
+    Returns:
+        np.ndarray: (3, 3) intrinsics
+        np.ndarray: (0,) or (4,) distortion parameters
+        str: camera type ("perspective" or "fisheye")
+    """
+    model, p = camera["model"], camera["params"]
+    if model in ["SIMPLE_PINHOLE", "SIMPLE_RADIAL", "RADIAL"]:
+        fx, fy, cx, cy = p[0], p[0], p[1], p[2]
+    elif model in ["PINHOLE", "OPENCV", "OPENCV_FISHEYE"]:
+        fx, fy, cx, cy = p[0], p[1], p[2], p[3]
+    else:
+        raise ValueError(
+            f"Only perspective and fisheye cameras are supported, got {model}"
+        )
+    intrinsics = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]], dtype=np.float32)
+
+    camtype = "perspective"
+    if model in ["SIMPLE_PINHOLE", "PINHOLE"]:
+        params = np.empty(0, dtype=np.float32)
+    elif model == "SIMPLE_RADIAL":
+        params = np.array([p[3], 0.0, 0.0, 0.0], dtype=np.float32)
+    elif model == "RADIAL":
+        params = np.array([p[3], p[4], 0.0, 0.0], dtype=np.float32)
+    elif model == "OPENCV":
+        params = np.array(p[4:8], dtype=np.float32)
+    else:
+        params = np.array(p[4:8], dtype=np.float32)
+        camtype = "fisheye"
+    return intrinsics, params, camtype
@@ -0,0 +1,311 @@
+import os
+import threading
+import cv2 as cv
+import numpy as np
+from PIL import Image
+from tqdm import tqdm
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from mvdatasets.utils.images import image_to_numpy, alpha_composite_uint8, alpha_to_mask
+from mvdatasets.utils.loader_utils import get_subsampled_resolution
+from mvdatasets.io.modality_storage import ModalityBuffer, LazyFrames
+
+# decode pools shared by all loaders, one per number of workers (created on first use)
+_decode_pools = {}
+_decode_pools_lock = threading.Lock()
+
+
+def get_nr_workers(nr_workers: Optional[int] = None) -> int:
+    """returns the number of decoding workers to use
+
+    Args:
+        nr_workers (int, optional): if None or <= 0, uses all available cores.
+
+    Returns:
+        int: number of workers
+    """
+    if nr_workers is None or nr_workers <= 0:
+        return os.cpu_count() or 1
+    return nr_workers
+
+
+def get_decode_pool(nr_workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """returns the decoding thread pool shared by all loaders requesting the
+    same number of workers, pools are never shut down while in use (a loader
+    asking for a different number of workers gets its own pool).
+
+    PIL and numpy release the GIL while decoding and copying pixel data,
+    so a thread pool scales with the number of cores without paying
+    for inter-process transfers of the decoded frames.
+
+    Args:
+        nr_workers (int, optional): number of workers. Defaults to None (all cores).
+
+    Returns:
+        ThreadPoolExecutor: shared pool
+    """
+    nr_workers = get_nr_workers(nr_workers)
+    with _decode_pools_lock:
+        pool = _decode_pools.get(nr_workers)
+        if pool is None:
+            pool = _decode_pools[nr_workers] = ThreadPoolExecutor(
+                max_workers=nr_workers, thread_name_prefix="mvdatasets_decode"
+            )
+    return pool
+
+
+def shutdown_decode_pool() -> None:
+    """shuts down the shared decoding pools (if any), waiting for pending tasks,
+    and closes the video readers opened by their workers"""
+    # local import to avoid circular dependency
+    from mvdatasets.utils.video_utils import release_video_readers
+
+    with _decode_pools_lock:
+        pools = list(_decode_pools.values())
+        _decode_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+    release_video_readers()
+
+
+def resize_image(img_np: np.ndarray, width: int, height: int) -> np.ndarray:
+    """resizes an image to (width, height) with area interpolation
+    (same filter as Camera.resize), keeping the channel dimension
+
+    Args:
+        img_np (np.ndarray): (H, W, C) image
+        width (int): target width
+        height (int): target height
+
+    Returns:
+        np.ndarray: (height, width, C) image
+    """
+    if img_np.shape[:2] == (height, width):
+        return img_np
+    resized = cv.resize(img_np, (width, height), interpolation=cv.INTER_AREA)
+    if resized.ndim == 2:
+        resized = resized[..., None]
+    return resized
+
+
+def load_image(
+    image_path: Union[str, Path],
+    channels: Optional[str] = None,
+    subsample_factor: int = 1,
+) -> np.ndarray:
+    """decodes an image file to a uint8 numpy array
+
+    Args:
+        image_path (str or Path): image file path
+        channels (str, optional): PIL mode to convert to (e.g. "RGB", "L"),
+            if None, the image is kept in its stored mode. Defaults to None.
+        subsample_factor (int, optional): if > 1, the image is decoded at reduced
+            size (JPEG images are downscaled by the decoder) and resized to the
+            subsampled resolution (see get_subsampled_resolution). Defaults to 1.
+
+    Returns:
+        np.ndarray: (H, W, C) uint8 image
+    """
+    with Image.open(image_path) as img_pil:
+        width, height = get_subsampled_resolution(*img_pil.size, subsample_factor)
+        if subsample_factor > 1:
+            # DCT domain downscaling to the smallest size >= target (JPEG only)
+            img_pil.draft(None, (width, height))
+        if channels is not None and img_pil.mode != channels:
+            img_pil = img_pil.convert(channels)
+        img_np = image_to_numpy(img_pil, use_uint8=True)
+    # grayscale images get a channel dimension
+    if img_np.ndim == 2:
+        img_np = img_np[..., None]
+    return resize_image(img_np, width, height)
+
+
+def decode_images(
+    images_paths: List[Union[str, Path]],
+    decode_fn: Optional[Callable[[Union[str, Path]], np.ndarray]] = None,
+    nr_workers: Optional[int] = None,
+    desc: Optional[str] = None,
+    out_path: Optional[Union[str, Path]] = None,
+    shared: bool = False,
+) -> np.ndarray:
+    """decodes a list of image files in parallel using the shared decoding pool,
+    each worker writes its frames directly into the preallocated output
+
+    Args:
+        images_paths (list): ordered list of image file paths
+        decode_fn (callable, optional): function decoding a single file to a
+            (H, W, C) array. Defaults to None (load_image).
+        nr_workers (int, optional): number of workers. Defaults to None (all cores).
+        desc (str, optional): progress bar description, if None, no progress bar.
+        out_path (str or Path, optional): if given, frames are written to this
+            .npy file and returned memory-mapped. Defaults to None (RAM).
+        shared (bool, optional): if True and out_path is None, frames are written
+            to shared memory (see empty_shared). Defaults to False.
+
+    Returns:
+        np.ndarray: (N, H, W, C) decoded images, in the same order as images_paths
+    """
+    if len(images_paths) == 0:
+        raise ValueError("no images to decode")
+
+    if decode_fn is None:
+        decode_fn = load_image
+
+    # first frame gives the output shape
+    out = ModalityBuffer(len(images_paths), out_path=out_path, shared=shared)
+    out[0] = decode_fn(images_paths[0])
+
+    def _decode_into(i: int) -> None:
+        frame = decode_fn(images_paths[i])
+        if frame.shape != out.frame_shape:
+            raise ValueError(
+                f"{images_paths[i]} decoded with shape {frame.shape}, "
+                f"expected {out.frame_shape}"
+            )
+        out[i] = frame
+
+    pool = get_decode_pool(nr_workers)
+    # consume results to wait for all frames (and raise errors)
+    list(
+        tqdm(
+            pool.map(_decode_into, range(1, len(images_paths))),
+            initial=1,
+            total=len(images_paths),
+            desc=desc,
+            ncols=100,
+            disable=desc is None,
+        )
+    )
+
+    return out.finalize()
+
+
+def decode_rgba_images(
+    images_paths: List[Union[str, Path]],
+    white_bg: bool,
+    use_binary_mask: bool = False,
+    load_masks: bool = True,
+    subsample_factor: int = 1,
+    nr_workers: Optional[int] = None,
+    desc: Optional[str] = None,
+    rgbs_out_path: Optional[Union[str, Path]] = None,
+    masks_out_path: Optional[Union[str, Path]] = None,
+    shared: bool = False,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """decodes a list of RGBA image files in parallel using the shared decoding pool,
+    each worker composites its frames on background (see alpha_composite_uint8)
+    and extracts their masks (see alpha_to_mask) at full resolution, then writes
+    them to separate preallocated outputs (resized to the subsampled resolution)
+
+    Args:
+        images_paths (list): ordered list of RGBA image file paths
+        white_bg (bool): composite onto a white background
+        use_binary_mask (bool, optional): threshold alpha. Defaults to False.
+        load_masks (bool, optional): if False, only RGB images are decoded.
+            Defaults to True.
+        subsample_factor (int, optional): Defaults to 1.
+        nr_workers (int, optional): number of workers. Defaults to None (all cores).
+        desc (str, optional): progress bar description, if None, no progress bar.
+        rgbs_out_path (str or Path, optional): if given, RGB images are written to
+            this .npy file and returned memory-mapped. Defaults to None (RAM).
+        masks_out_path (str or Path, optional): same for masks. Defaults to None.
+        shared (bool, optional): if True, outputs not memory-mapped are written
+            to shared memory (see empty_shared). Defaults to False.
+
+    Returns:
+        np.ndarray: (N, H, W, 3) RGB images, uint8
+        np.ndarray: (N, H, W, 1) masks, uint8, None if not load_masks
+    """
+    if len(images_paths) == 0:
+        raise ValueError("no images to decode")
+
+    # first frame header gives the output shape
+    with Image.open(images_paths[0]) as img_pil:
+        resolution = img_pil.size
+    width, height = get_subsampled_resolution(*resolution, subsample_factor)
+    rgbs = ModalityBuffer(
+        len(images_paths),
+        out_path=rgbs_out_path,
+        frame_shape=(height, width, 3),
+        dtype=np.uint8,
+        shared=shared,
+    )
+    masks = None
+    if load_masks:
+        masks = ModalityBuffer(
+            len(images_paths),
+            out_path=masks_out_path,
+            frame_shape=(height, width, 1),
+            dtype=np.uint8,
+            shared=shared,
+        )
+
+    def _decode_into(i: int) -> None:
+        rgba = load_image(images_paths[i], channels="RGBA")
+        if (rgba.shape[1], rgba.shape[0]) != resolution:
+            raise ValueError(
+                f"{images_paths[i]} resolution differs from {images_paths[0]}"
+            )
+        if (width, height) == resolution:
+            # composite directly into the outputs
+            alpha_composite_uint8(rgba, white_bg=white_bg, out=rgbs.frame_view(i))
+            if masks is not None:
+                alpha_to_mask(rgba, binary=use_binary_mask, out=masks.frame_view(i))
+            return
+        rgb = alpha_composite_uint8(rgba, white_bg=white_bg)
+        rgbs[i] = resize_image(rgb, width, height)
+        if masks is not None:
+            mask = alpha_to_mask(rgba, binary=use_binary_mask)
+            masks[i] = resize_image(mask, width, height)
+
+    pool = get_decode_pool(nr_workers)
+    # consume results to wait for all frames (and raise errors)
+    list(
+        tqdm(
+            pool.map(_decode_into, range(len(images_paths))),
+            total=len(images_paths),
+            desc=desc,
+            ncols=100,
+            disable=desc is None,
+        )
+    )
+
+    return rgbs.finalize(), None if masks is None else masks.finalize()
+
+
+def load_frames(
+    images_paths: List[Union[str, Path]],
+    config: dict,
+    decode_fn: Optional[Callable[[Union[str, Path]], np.ndarray]] = None,
+    desc: Optional[str] = None,
+    out_path: Optional[Union[str, Path]] = None,
+) -> Union[np.ndarray, LazyFrames]:
+    """decodes a list of image files (see decode_images), or defers decoding
+    to the first access of each frame if config["lazy_loading"] (see LazyFrames)
+
+    Args:
+        images_paths (list): ordered list of image file paths
+        config (dict): dataset configuration
+        decode_fn (callable, optional): function decoding a single file to a
+            (H, W, C) array, must be picklable for lazy loading with multi-process
+            data loading. Defaults to None (load_image).
+        desc (str, optional): progress bar description, if None, no progress bar.
+        out_path (str or Path, optional): if given, frames are written to this
+            .npy file and returned memory-mapped. Defaults to None (RAM).
+
+    Returns:
+        np.ndarray or LazyFrames: (N, H, W, C) images
+    """
+    if decode_fn is None:
+        decode_fn = load_image
+    if config["lazy_loading"]:
+        return LazyFrames(images_paths, decode_fn=decode_fn)
+    return decode_images(
+        images_paths,
+        decode_fn=decode_fn,
+        nr_workers=config["nr_workers"],
+        desc=desc,
+        out_path=out_path,
+        shared=config["shared_memory"],
+    )
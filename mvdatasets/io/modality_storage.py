@@ -0,0 +1,638 @@
+import os
+import torch
+import tempfile
+import threading
+import cv2 as cv
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Tuple, Union
+from mvdatasets.utils.memory import gb_to_bytes
+from mvdatasets.io.shared_memory import _get_root_array, empty_shared
+
+# default size of the frames cache shared by all lazy modalities
+DEFAULT_FRAMES_CACHE_BYTES = gb_to_bytes(2.0)
+
+
+def get_memmap_file_path(
+    config: dict, scene_name: str, *keys: Union[str, int]
+) -> Optional[Path]:
+    """returns the file where a loader writes a memory-mapped modality,
+    files are grouped in a folder per config (e.g. subsample_factor), so that
+    datasets of the same scene loaded with different configs do not overwrite
+    each other's files.
+
+    Args:
+        config (dict): dataset configuration
+        scene_name (str): scene name
+        keys (str or int): file name parts (e.g. split, camera id, modality name)
+
+    Returns:
+        Path: memmap file path, None if modalities are kept in RAM
+    """
+    if config["memmap_path"] is None:
+        return None
+    # avoid circular import
+    from mvdatasets.io.scene_cache import get_scene_cache_key
+
+    dataset_name = config["dataset_name"]
+    config_key = get_scene_cache_key(dataset_name, scene_name, config, dataset_name)
+    file_name = "_".join(str(key) for key in keys) + ".npy"
+    return (
+        Path(config["memmap_path"]) / dataset_name / scene_name / config_key / file_name
+    )
+
+
+def open_memmap(
+    file_path: Union[str, Path], shape: Tuple[int, ...], dtype: np.dtype
+) -> np.memmap:
+    """creates a .npy file and maps it to memory for writing,
+    an existing file is unlinked first (not truncated), so that arrays
+    still mapping it are not affected
+
+    Args:
+        file_path (str or Path): .npy file path
+        shape (tuple): array shape
+        dtype (np.dtype): array dtype
+
+    Returns:
+        np.memmap: writable memory-mapped array
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    if file_path.exists():
+        file_path.unlink()
+    return np.lib.format.open_memmap(file_path, mode="w+", dtype=dtype, shape=shape)
+
+
+def load_memmap(file_path: Union[str, Path]) -> np.memmap:
+    """maps a .npy file to memory, pages are read from disk on first access
+    and shared with all processes mapping the same file
+
+    Args:
+        file_path (str or Path): .npy file path
+
+    Returns:
+        np.memmap: copy-on-write memory-mapped array
+    """
+    return np.load(file_path, mmap_mode="c")
+
+
+def is_memmap(array: Optional[np.ndarray]) -> bool:
+    """checks if array is backed by a memory-mapped file"""
+    return isinstance(array, np.memmap) and array.filename is not None
+
+
+def empty_like_storage(
+    array: np.ndarray, shape: Tuple[int, ...], dtype: Optional[np.dtype] = None
+) -> np.ndarray:
+    """allocates an uninitialized array with the same storage backend as array,
+    if array is memory-mapped, the new array is backed by an unlinked file
+    in the same folder (so that it does not take up RAM), else it is in RAM.
+
+    Args:
+        array (np.ndarray): reference array
+        shape (tuple): new array shape
+        dtype (np.dtype, optional): new array dtype. Defaults to array.dtype.
+
+    Returns:
+        np.ndarray: new array
+    """
+    if dtype is None:
+        dtype = array.dtype
+    if not is_memmap(array):
+        return np.empty(shape, dtype=dtype)
+    fd, file_path = tempfile.mkstemp(suffix=".npy", dir=os.path.dirname(array.filename))
+    os.close(fd)
+    out = open_memmap(file_path, shape, dtype)
+    # the mapping stays valid after the file is unlinked
+    os.remove(file_path)
+    return out
+
+
+def get_stacked_view(arrays: List[np.ndarray]) -> Optional[np.ndarray]:
+    """stacks arrays along a new first axis without copying, if they are
+    equally spaced views of the same buffer (e.g. the per-camera slices of
+    a split buffer allocated by a loader)
+
+    Args:
+        arrays (list): list of arrays with the same shape
+
+    Returns:
+        np.ndarray: view of the buffer (memory-mapped if the buffer is),
+            None if arrays can not be stacked without copying
+    """
+    first = arrays[0]
+    if not isinstance(first, np.ndarray) or not first.flags.c_contiguous:
+        return None
+    if first.nbytes == 0:
+        return None
+    root = _get_root_array(first)
+    addresses = []
+    for array in arrays:
+        if (
+            not isinstance(array, np.ndarray)
+            or array.shape != first.shape
+            or array.dtype != first.dtype
+            or array.strides != first.strides
+            or _get_root_array(array) is not root
+        ):
+            return None
+        addresses.append(array.__array_interface__["data"][0])
+    steps = np.diff(addresses)
+    step = int(steps[0]) if len(steps) > 0 else first.nbytes
+    # arrays must not overlap
+    if step < first.nbytes or np.any(steps != step):
+        return None
+    return np.lib.stride_tricks.as_strided(
+        first,
+        shape=(len(arrays),) + first.shape,
+        strides=(step,) + first.strides,
+        subok=True,
+    )
+
+
+def stack_like_storage(arrays: List[np.ndarray]) -> np.ndarray:
+    """stacks arrays along a new first axis, keeping the storage backend
+    of the first array (see empty_like_storage), LazyFrames are stacked
+    in a LazyFramesStack, views of a same buffer are stacked without
+    copying (see get_stacked_view)
+
+    Args:
+        arrays (list): list of arrays with the same shape
+
+    Returns:
+        np.ndarray: stacked arrays
+    """
+    if isinstance(arrays[0], LazyFrames):
+        return LazyFramesStack(arrays)
+    stacked = get_stacked_view(arrays)
+    if stacked is not None:
+        return stacked
+    if not is_memmap(arrays[0]):
+        return np.stack(arrays)
+    out = empty_like_storage(arrays[0], (len(arrays),) + arrays[0].shape)
+    for i, array in enumerate(arrays):
+        out[i] = array
+    return out
+
+
+class ModalityBuffer:
+    """(N, ...) modality array written in place one frame at a time.
+
+    The array is allocated (in RAM, shared memory, or memory-mapped if out_path is given)
+    on the first write, once the frame shape and dtype are known, so loaders
+    never hold a list of decoded frames and their stacked copy at the same time.
+    Frames can be written concurrently (e.g. by decoding workers).
+    """
+
+    def __init__(
+        self,
+        nr_frames: int,
+        out_path: Optional[Union[str, Path]] = None,
+        frame_shape: Optional[Tuple[int, ...]] = None,
+        dtype: Optional[np.dtype] = None,
+        shared: bool = False,
+    ):
+        """
+        Args:
+            nr_frames (int): number of frames (N).
+            out_path (str or Path, optional): if given, frames are written to a
+                temporary file, moved to this .npy file on finalize and returned
+                memory-mapped. Defaults to None (RAM).
+            shared (bool, optional): if True and out_path is None, the buffer
+                is allocated in shared memory (see empty_shared). Defaults to False.
+            frame_shape (tuple, optional): shape of a frame, if None, it is given
+                by the first written frame.
+            dtype (np.dtype, optional): frames dtype, if None, it is given
+                by the first written frame.
+        """
+        if nr_frames <= 0:
+            raise ValueError("ModalityBuffer needs at least one frame")
+        self.nr_frames = nr_frames
+        self.out_path = out_path
+        self._tmp_path = None
+        self.shared = shared
+        self.frame_shape = None
+        self.dtype = None
+        self._out = None
+        self._written = np.zeros(nr_frames, dtype=bool)
+        self._lock = threading.Lock()
+        if frame_shape is not None and dtype is not None:
+            self._allocate(tuple(frame_shape), np.dtype(dtype))
+
+    @property
+    def shape(self) -> Optional[Tuple[int, ...]]:
+        """(N, ...) shape of the buffer, None if not allocated yet"""
+        if self.frame_shape is None:
+            return None
+        return (self.nr_frames,) + self.frame_shape
+
+    @property
+    def nr_written(self) -> int:
+        """number of frames written so far"""
+        return int(self._written.sum())
+
+    def __len__(self) -> int:
+        return self.nr_frames
+
+    def _allocate(self, frame_shape: Tuple[int, ...], dtype: np.dtype) -> None:
+        with self._lock:
+            # another writer may have allocated the buffer meanwhile
+            if self._out is not None:
+                return
+            shape = (self.nr_frames,) + frame_shape
+            if self.out_path is not None:
+                # write to a temporary file first, so that a partial file is never
+                # read and a file mapped by another dataset is never truncated
+                out_dir = Path(self.out_path).parent
+                out_dir.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(suffix=".tmp.npy", dir=out_dir)
+                os.close(fd)
+                self._tmp_path = Path(tmp_path)
+                out = open_memmap(self._tmp_path, shape, dtype)
+            elif self.shared:
+                out = empty_shared(shape, dtype)
+            else:
+                out = np.empty(shape, dtype=dtype)
+            self.frame_shape, self.dtype = frame_shape, dtype
+            self._out = out
+
+    def _check_not_finalized(self) -> None:
+        # frame shape is only known once allocated
+        if self.frame_shape is not None:
+            raise ValueError("ModalityBuffer already finalized")
+
+    def frame_view(self, frame_idx: int) -> np.ndarray:
+        """returns the writable view of a frame (buffer must be allocated),
+        the frame is marked as written
+
+        Args:
+            frame_idx (int): frame index
+
+        Returns:
+            np.ndarray: frame view
+        """
+        if self._out is None:
+            self._check_not_finalized()
+            raise ValueError("ModalityBuffer frame shape and dtype are unknown")
+        self._written[frame_idx] = True
+        return self._out[frame_idx]
+
+    def write(self, frame_idx: int, frame: np.ndarray) -> None:
+        """copies a frame in the buffer (allocated on first write)
+
+        Args:
+            frame_idx (int): frame index
+            frame (np.ndarray): frame, with the same shape as the other frames
+        """
+        if self._out is None:
+            self._check_not_finalized()
+            self._allocate(frame.shape, frame.dtype)
+        if frame.shape != self.frame_shape:
+            raise ValueError(
+                f"frame {frame_idx} has shape {frame.shape}, expected {self.frame_shape}"
+            )
+        self._out[frame_idx] = frame
+        self._written[frame_idx] = True
+
+    def __setitem__(self, frame_idx: int, frame: np.ndarray) -> None:
+        self.write(frame_idx, frame)
+
+    def finalize(self, fill_value: Optional[float] = None) -> np.ndarray:
+        """returns the filled buffer, the buffer can not be written afterwards
+
+        Args:
+            fill_value (float, optional): value of frames never written, if None,
+                all frames must have been written. Defaults to None.
+
+        Returns:
+            np.ndarray: (N, ...) array, memory-mapped if out_path was given
+        """
+        if self._out is None:
+            self._check_not_finalized()
+            raise ValueError("no frame written to ModalityBuffer")
+        if not self._written.all():
+            if fill_value is None:
+                missing = np.flatnonzero(~self._written).tolist()
+                raise ValueError(f"frames {missing} not written to ModalityBuffer")
+            self._out[~self._written] = fill_value
+        out, self._out = self._out, None
+        if self.out_path is None:
+            return out
+        out.flush()
+        del out
+        os.replace(self._tmp_path, self.out_path)
+        self._tmp_path = None
+        return load_memmap(self.out_path)
+
+
+class FramesCache:
+    """thread-safe LRU cache of decoded frames, bounded in bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """bytes currently held by the cache"""
+        return self._nbytes
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """returns a cached frame (None if not cached) and marks it as recently used"""
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+            return frame
+
+    def put(self, key: Hashable, frame: np.ndarray) -> None:
+        """caches a frame, evicting the least recently used ones if needed"""
+        if frame.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._frames:
+                return
+            self._frames[key] = frame
+            self._nbytes += frame.nbytes
+            self._evict()
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        """changes the cache size, evicting frames if needed"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self._nbytes = 0
+
+    def _evict(self) -> None:
+        while self._nbytes > self.max_bytes:
+            _, frame = self._frames.popitem(last=False)
+            self._nbytes -= frame.nbytes
+
+
+# frames cache shared by all lazy modalities (created on first use)
+_frames_cache = None
+
+
+def get_frames_cache() -> FramesCache:
+    """returns the frames cache shared by all lazy modalities"""
+    global _frames_cache
+    if _frames_cache is None:
+        _frames_cache = FramesCache(max_bytes=DEFAULT_FRAMES_CACHE_BYTES)
+    return _frames_cache
+
+
+def _to_numpy_index(index):
+    if isinstance(index, torch.Tensor):
+        return index.cpu().numpy()
+    return np.asarray(index)
+
+
+class LazyFrames:
+    """(T, H, W, C) sequence of frames decoded on first access.
+
+    Frames are decoded from their sources with decode_fn, resized
+    (if needed) and kept in a LRU frames cache. Indexing with an integer
+    returns a decoded frame, with a slice returns a LazyFrames over the
+    selected frames, with (frames_idx, i, j) arrays gathers values
+    decoding each selected frame once.
+    """
+
+    def __init__(
+        self,
+        sources: List,
+        decode_fn: Callable[..., np.ndarray],
+        frame_shape: Optional[Tuple[int, int, int]] = None,
+        dtype: Optional[np.dtype] = None,
+        scales: Tuple[float, ...] = (),
+        cache: Optional[FramesCache] = None,
+    ):
+        """
+        Args:
+            sources (list): per-frame sources (e.g. file paths) passed to decode_fn.
+            decode_fn (callable): decodes a source to a (H, W, C) array,
+                should be picklable (e.g. module level function or partial) to
+                be used with multi-process data loading.
+            frame_shape (tuple, optional): (H, W, C) shape of decoded (and resized)
+                frames, if None, it is inferred decoding the first frame.
+            dtype (np.dtype, optional): dtype of decoded frames, if None, it is
+                inferred decoding the first frame.
+            scales (tuple, optional): resize scales applied in order after decoding.
+            cache (FramesCache, optional): frames cache, if None, uses the shared one.
+        """
+        if len(sources) == 0:
+            raise ValueError("LazyFrames needs at least one source")
+        self.sources = list(sources)
+        self.decode_fn = decode_fn
+        self.scales = tuple(scales)
+        self.cache = cache
+        if frame_shape is None or dtype is None:
+            frame = self.get_frame(0)
+            frame_shape, dtype = frame.shape, frame.dtype
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (len(self.sources),) + self.frame_shape
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def nbytes(self) -> int:
+        """bytes of all frames once decoded"""
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def _get_cache(self) -> FramesCache:
+        return self.cache if self.cache is not None else get_frames_cache()
+
+    def _decode(self, source) -> np.ndarray:
+        frame = self.decode_fn(source)
+        for scale in self.scales:
+            frame = cv.resize(
+                frame, (0, 0), fx=scale, fy=scale, interpolation=cv.INTER_AREA
+            )
+            if frame.ndim == 2:
+                frame = frame[:, :, None]
+        return frame
+
+    def get_frame(self, frame_idx: int) -> np.ndarray:
+        """returns a decoded frame (from cache if available)
+
+        Args:
+            frame_idx (int): frame index
+
+        Returns:
+            np.ndarray: (H, W, C) frame
+        """
+        source = self.sources[frame_idx]
+        key = (self.decode_fn, source, self.scales)
+        cache = self._get_cache()
+        frame = cache.get(key)
+        if frame is None:
+            frame = self._decode(source)
+            cache.put(key, frame)
+        return frame
+
+    def resized(self, scale: float) -> "LazyFrames":
+        """returns a LazyFrames whose frames are resized by scale after decoding"""
+        height, width, channels = self.frame_shape
+        frame_shape = (round(height * scale), round(width * scale), channels)
+        return LazyFrames(
+            self.sources,
+            self.decode_fn,
+            frame_shape=frame_shape,
+            dtype=self.dtype,
+            scales=self.scales + (scale,),
+            cache=self.cache,
+        )
+
+    def _with_sources(self, sources: List) -> "LazyFrames":
+        return LazyFrames(
+            sources,
+            self.decode_fn,
+            frame_shape=self.frame_shape,
+            dtype=self.dtype,
+            scales=self.scales,
+            cache=self.cache,
+        )
+
+    def _gather(self, frames_idx: np.ndarray, pixels_idx: tuple) -> np.ndarray:
+        """gathers values at (frames_idx, *pixels_idx), decoding each frame once"""
+        frames_idx = _to_numpy_index(frames_idx)
+        pixels_idx = tuple(_to_numpy_index(idx) for idx in pixels_idx)
+        out = None
+        for frame_idx in np.unique(frames_idx):
+            selected = frames_idx == frame_idx
+            frame = self.get_frame(int(frame_idx))
+            if len(pixels_idx) == 0:
+                # whole frame, repeated for each selection
+                vals = frame[None]
+            else:
+                vals = frame[tuple(idx[selected] for idx in pixels_idx)]
+            if out is None:
+                out = np.empty(frames_idx.shape + vals.shape[1:], dtype=vals.dtype)
+            out[selected] = vals
+        return out
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self.get_frame(int(key))
+        if isinstance(key, slice):
+            return self._with_sources(self.sources[key])
+        if isinstance(key, tuple) and len(key) > 0:
+            first, rest = key[0], key[1:]
+            if isinstance(first, (int, np.integer)):
+                return self.get_frame(int(first))[rest]
+            if isinstance(first, (np.ndarray, torch.Tensor, list)):
+                return self._gather(first, rest)
+        if isinstance(key, (np.ndarray, torch.Tensor, list)):
+            return self._gather(key, ())
+        # anything else (e.g. None, Ellipsis, slices with pixels indices)
+        return np.asarray(self)[key]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.get_frame(i)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        out = np.empty(self.shape, dtype=self.dtype)
+        for i in range(len(self)):
+            out[i] = self.get_frame(i)
+        if dtype is not None:
+            out = out.astype(dtype)
+        return out
+
+    def __repr__(self) -> str:
+        return f"LazyFrames(shape={self.shape}, dtype={self.dtype})"
+
+
+class LazyFramesStack:
+    """(N, T, H, W, C) stack of LazyFrames (e.g. the frames of all cameras in a split)"""
+
+    def __init__(self, frames: List[LazyFrames]):
+        if len(frames) == 0:
+            raise ValueError("LazyFramesStack needs at least one LazyFrames")
+        for frames_ in frames:
+            if frames_.shape != frames[0].shape:
+                raise ValueError("all stacked LazyFrames must have the same shape")
+        self.frames = list(frames)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return (len(self.frames),) + self.frames[0].shape
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.frames[0].dtype
+
+    @property
+    def nbytes(self) -> int:
+        """bytes of all frames once decoded"""
+        return sum(frames.nbytes for frames in self.frames)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self.frames[int(key)]
+        if isinstance(key, tuple) and len(key) > 0:
+            first, rest = key[0], key[1:]
+            if isinstance(first, (int, np.integer)):
+                if len(rest) == 0:
+                    return self.frames[int(first)]
+                return self.frames[int(first)][rest]
+            if isinstance(first, (np.ndarray, torch.Tensor, list)) and len(rest) > 0:
+                # gather values at (cameras_idx, frames_idx, *pixels_idx)
+                cameras_idx = _to_numpy_index(first)
+                others_idx = tuple(_to_numpy_index(idx) for idx in rest)
+                out = None
+                for camera_idx in np.unique(cameras_idx):
+                    selected = cameras_idx == camera_idx
+                    vals = self.frames[int(camera_idx)][
+                        tuple(idx[selected] for idx in others_idx)
+                    ]
+                    if out is None:
+                        out = np.empty(
+                            cameras_idx.shape + vals.shape[1:], dtype=vals.dtype
+                        )
+                    out[selected] = vals
+                return out
+        # anything else materializes the stack
+        return np.asarray(self)[key]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        out = np.empty(self.shape, dtype=self.dtype)
+        for i, frames in enumerate(self.frames):
+            out[i] = np.asarray(frames)
+        if dtype is not None:
+            out = out.astype(dtype)
+        return out
+
+    def __repr__(self) -> str:
+        return f"LazyFramesStack(shape={self.shape}, dtype={self.dtype})"
+
+
+def is_lazy(array) -> bool:
+    """checks if array is decoded on first access"""
+    return isinstance(array, (LazyFrames, LazyFramesStack))
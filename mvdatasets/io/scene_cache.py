@@ -0,0 +1,584 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import List, Optional
+from mvdatasets.camera import Camera
+from mvdatasets.io.modality_storage import is_lazy
+from mvdatasets.geometry.primitives.point_cloud import PointCloud
+from mvdatasets.utils.printing import print_info, print_log, print_warning
+
+# bump when the cache layout or the output of any loader changes
+SCENE_CACHE_VERSION = 1
+
+# config keys that do not affect the loaded scene
+CONFIG_KEYS_NOT_HASHED = [
+    "nr_workers",
+    "memmap_path",
+    "shared_memory",
+    "lazy_loading",
+    "lazy_cache_gb",
+    "nr_mip_levels",
+    "masks_cache_path",
+    "tracks_2d_cache_path",
+]
+
+_META_FILE_NAME = "meta.json"
+
+
+def _to_serializable(value):
+    """converts numpy values (and nested containers) to json serializable values"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(k): _to_serializable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_serializable(v) for v in value]
+    return value
+
+
+def _is_serializable(value) -> bool:
+    try:
+        json.dumps(_to_serializable(value))
+    except TypeError:
+        return False
+    return True
+
+
+def get_scene_cache_key(
+    dataset_name: str, scene_name: str, config: dict, loader: str
+) -> str:
+    """returns the cache key of a scene loaded with a given config
+
+    Args:
+        dataset_name (str): dataset name
+        scene_name (str): scene name
+        config (dict): dataset configuration
+        loader (str): loader name
+
+    Returns:
+        str: cache key
+    """
+    payload = {
+        "dataset_name": dataset_name,
+        "scene_name": scene_name,
+        "loader": loader,
+        "version": SCENE_CACHE_VERSION,
+        "config": {k: v for k, v in config.items() if k not in CONFIG_KEYS_NOT_HASHED},
+    }
+    payload = json.dumps(_to_serializable(payload), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _get_visor_source_paths(dataset_path: Path, scene_name: str) -> List[Path]:
+    """VISOR scenes are read from files shared by the whole dataset folder"""
+    sparse_annotations_path = dataset_path / "GroundTruth-SparseAnnotations"
+    paths = [
+        dataset_path / "frame_mapping.json",
+        dataset_path / "JSON_DATA" / f"{scene_name}.json",
+        sparse_annotations_path / "annotations" / "train" / f"{scene_name}.json",
+    ]
+    # frames of all videos of a participant share a folder
+    frames_path = (
+        sparse_annotations_path / "rgb_frames" / "train" / scene_name.split("_")[0]
+    )
+    if frames_path.exists():
+        paths += sorted(
+            path
+            for path in frames_path.iterdir()
+            if path.name.startswith(f"{scene_name}_")
+        )
+    return paths
+
+
+# loaders reading source files outside of the scene folder
+_LOADERS_SOURCE_PATHS = {
+    "visor": _get_visor_source_paths,
+}
+
+
+def get_scene_source_paths(
+    dataset_path: Path, scene_name: str, loader: str
+) -> List[Path]:
+    """returns the files and folders a loader reads a scene from
+
+    Args:
+        dataset_path (Path): dataset folder
+        scene_name (str): scene name
+        loader (str): loader name
+
+    Returns:
+        list: existing source paths (files or folders)
+    """
+    dataset_path = Path(dataset_path)
+    paths = [dataset_path / scene_name]
+    if loader in _LOADERS_SOURCE_PATHS:
+        paths += _LOADERS_SOURCE_PATHS[loader](dataset_path, scene_name)
+    paths = [path for path in paths if path.exists()]
+    if len(paths) == 0:
+        raise ValueError(
+            f"no source files found for scene {scene_name} in {dataset_path}"
+        )
+    return paths
+
+
+def get_scene_fingerprint(dataset_path: Path, source_paths: List[Path]) -> str:
+    """returns a fingerprint of the source files (paths, mtimes and sizes)
+
+    Args:
+        dataset_path (Path): dataset folder, paths are hashed relative to it
+        source_paths (list): source files or folders (walked recursively)
+
+    Returns:
+        str: fingerprint
+    """
+    hasher = hashlib.sha1()
+
+    def _update(file_path):
+        stat = os.stat(file_path)
+        rel_path = os.path.relpath(file_path, dataset_path)
+        hasher.update(f"{rel_path}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+
+    for source_path in source_paths:
+        if not os.path.isdir(source_path):
+            _update(source_path)
+            continue
+        for root, dirs, files in os.walk(source_path):
+            dirs.sort()
+            for file_name in sorted(files):
+                _update(os.path.join(root, file_name))
+    return hasher.hexdigest()
+
+
+def get_scene_cache_dir(
+    cache_path: Path, dataset_name: str, scene_name: str, config: dict, loader: str
+) -> Path:
+    """returns the cache folder of a scene loaded with a given config"""
+    key = get_scene_cache_key(dataset_name, scene_name, config, loader)
+    return Path(cache_path) / dataset_name / scene_name / key
+
+
+def _camera_to_meta(camera: Camera) -> dict:
+    return {
+        "camera_label": camera.camera_label,
+        "intrinsics": camera.intrinsics,
+        "intrinsics_inv": camera.intrinsics_inv,
+        "pose": camera.pose,
+        "global_transform": camera.global_transform,
+        "local_transform": camera.local_transform,
+        "timestamps": camera.timestamps,
+        "width": camera.width,
+        "height": camera.height,
+        "temporal_dim": camera.temporal_dim,
+        "near": camera.near,
+        "far": camera.far,
+    }
+
+
+def _camera_from_meta(camera_meta: dict, modalities: dict) -> Camera:
+    global_transform = camera_meta["global_transform"]
+    local_transform = camera_meta["local_transform"]
+    camera = Camera(
+        intrinsics=np.array(camera_meta["intrinsics"], dtype=np.float32),
+        pose=np.array(camera_meta["pose"], dtype=np.float32),
+        global_transform=(
+            np.array(global_transform, dtype=np.float32)
+            if global_transform is not None
+            else None
+        ),
+        local_transform=(
+            np.array(local_transform, dtype=np.float32)
+            if local_transform is not None
+            else None
+        ),
+        timestamps=np.array(camera_meta["timestamps"], dtype=np.float32),
+        camera_label=camera_meta["camera_label"],
+        width=camera_meta["width"],
+        height=camera_meta["height"],
+        temporal_dim=camera_meta["temporal_dim"],
+        near=camera_meta["near"],
+        far=camera_meta["far"],
+        **modalities,
+    )
+    camera.intrinsics_inv = np.array(camera_meta["intrinsics_inv"])
+    return camera
+
+
+def _save_modalities(cameras: list, split: str, cache_dir: Path) -> dict:
+    """saves the modalities of all cameras of a split,
+    cameras sharing shape and dtype are stored in a single (N, T, H, W, C) file.
+    """
+    modalities_meta = {}
+    for modality_name in cameras[0].data.keys():
+        frames = [camera.data[modality_name] for camera in cameras]
+        if all(frame is None for frame in frames):
+            continue
+        stackable = all(
+            frame is not None
+            and frame.shape == frames[0].shape
+            and frame.dtype == frames[0].dtype
+            for frame in frames
+        )
+        if stackable:
+            file_name = f"{split}_{modality_name}.npy"
+            buffer = np.lib.format.open_memmap(
+                cache_dir / file_name,
+                mode="w+",
+                dtype=frames[0].dtype,
+                shape=(len(frames),) + frames[0].shape,
+            )
+            for i, frame in enumerate(frames):
+                buffer[i] = frame
+            buffer.flush()
+            del buffer
+            modalities_meta[modality_name] = {"file": file_name, "stacked": True}
+        else:
+            files_names = []
+            for i, frame in enumerate(frames):
+                if frame is None:
+                    files_names.append(None)
+                    continue
+                file_name = f"{split}_{modality_name}_{i}.npy"
+                np.save(cache_dir / file_name, frame)
+                files_names.append(file_name)
+            modalities_meta[modality_name] = {"files": files_names, "stacked": False}
+    return modalities_meta
+
+
+def _load_modalities(modalities_meta: dict, nr_cameras: int, cache_dir: Path) -> list:
+    """memory maps the modalities of all cameras of a split"""
+    cameras_modalities = [{} for _ in range(nr_cameras)]
+    for modality_name, modality_meta in modalities_meta.items():
+        if modality_meta["stacked"]:
+            # copy-on-write mapping, pages are read from disk on first access
+            buffer = np.load(cache_dir / modality_meta["file"], mmap_mode="c")
+            for i in range(nr_cameras):
+                cameras_modalities[i][modality_name] = buffer[i]
+        else:
+            for i, file_name in enumerate(modality_meta["files"]):
+                if file_name is None:
+                    continue
+                cameras_modalities[i][modality_name] = np.load(
+                    cache_dir / file_name, mmap_mode="c"
+                )
+    return cameras_modalities
+
+
+def save_scene_cache(
+    res: dict,
+    cache_path: Path,
+    dataset_path: Path,
+    dataset_name: str,
+    scene_name: str,
+    config: dict,
+    loader: str,
+    verbose: bool = False,
+) -> Optional[Path]:
+    """saves the output of a loader to the scene cache
+
+    Args:
+        res (dict): loader output
+        cache_path (Path): root cache folder
+        dataset_path (Path): dataset folder
+        dataset_name (str): dataset name
+        scene_name (str): scene name
+        config (dict): dataset configuration
+        loader (str): loader name
+        verbose (bool, optional): print info. Defaults to False.
+
+    Returns:
+        Path: scene cache folder, None if the loader output can't be cached
+            (e.g. lazily loaded modalities, see DatasetConfig.lazy_loading)
+    """
+    cache_dir = get_scene_cache_dir(
+        cache_path, dataset_name, scene_name, config, loader
+    )
+
+    # check all entries can be cached
+    scalars = {}
+    arrays = {}
+    for key, val in res.items():
+        if key in ["cameras_splits", "point_clouds"]:
+            continue
+        if isinstance(val, np.ndarray):
+            arrays[key] = val
+        elif _is_serializable(val):
+            scalars[key] = val
+        else:
+            print_warning(f"scene cache: can't serialize `{key}`, scene not cached")
+            return None
+
+    # saving lazily loaded modalities would decode all their frames
+    for cameras in res["cameras_splits"].values():
+        for camera in cameras:
+            if any(is_lazy(val) for val in camera.data.values()):
+                print_warning("scene cache: lazily loaded modalities, scene not cached")
+                return None
+
+    # write to a temporary folder first, then move it in place
+    tmp_dir = cache_dir.with_name(f"{cache_dir.name}.tmp{os.getpid()}")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    try:
+        # cameras
+        cameras_meta = {}
+        for split, cameras in res["cameras_splits"].items():
+            cameras_meta[split] = {
+                "cameras": [_camera_to_meta(camera) for camera in cameras],
+                "modalities": (
+                    _save_modalities(cameras, split, tmp_dir)
+                    if len(cameras) > 0
+                    else {}
+                ),
+            }
+
+        # point clouds
+        point_clouds_meta = []
+        for i, point_cloud in enumerate(res.get("point_clouds", [])):
+            np.save(tmp_dir / f"point_cloud_{i}_points_3d.npy", point_cloud.points_3d)
+            if point_cloud.points_rgb is not None:
+                np.save(
+                    tmp_dir / f"point_cloud_{i}_points_rgb.npy", point_cloud.points_rgb
+                )
+            point_clouds_meta.append(
+                {
+                    "has_rgb": point_cloud.points_rgb is not None,
+                    "color": point_cloud.color,
+                    "label": point_cloud.label,
+                    "size": point_cloud.size,
+                    "marker": point_cloud.marker,
+                }
+            )
+
+        # other arrays
+        for key, val in arrays.items():
+            np.save(tmp_dir / f"res_{key}.npy", val)
+
+        meta = {
+            "version": SCENE_CACHE_VERSION,
+            "dataset_name": dataset_name,
+            "scene_name": scene_name,
+            "loader": loader,
+            "fingerprint": get_scene_fingerprint(
+                dataset_path, get_scene_source_paths(dataset_path, scene_name, loader)
+            ),
+            "scalars": scalars,
+            "arrays": list(arrays.keys()),
+            "has_point_clouds": "point_clouds" in res,
+            "point_clouds": point_clouds_meta,
+            "cameras_splits": cameras_meta,
+        }
+        with open(tmp_dir / _META_FILE_NAME, "w") as fp:
+            json.dump(_to_serializable(meta), fp)
+
+        # replace previous cache (if any)
+        if cache_dir.exists():
+            shutil.rmtree(cache_dir)
+        os.replace(tmp_dir, cache_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if verbose:
+        print_log(f"scene cached in {cache_dir}")
+
+    return cache_dir
+
+
+def load_scene_cache(
+    cache_path: Path,
+    dataset_path: Path,
+    dataset_name: str,
+    scene_name: str,
+    config: dict,
+    loader: str,
+    verbose: bool = False,
+) -> Optional[dict]:
+    """loads a scene from the scene cache, modalities are memory mapped
+
+    Args:
+        cache_path (Path): root cache folder
+        dataset_path (Path): dataset folder
+        dataset_name (str): dataset name
+        scene_name (str): scene name
+        config (dict): dataset configuration
+        loader (str): loader name
+        verbose (bool, optional): print info. Defaults to False.
+
+    Returns:
+        dict: loader output, None if the scene is not cached or the cache is stale
+    """
+    cache_dir = get_scene_cache_dir(
+        cache_path, dataset_name, scene_name, config, loader
+    )
+    meta_path = cache_dir / _META_FILE_NAME
+    if not meta_path.exists():
+        if verbose:
+            print_info(f"scene cache miss: {cache_dir}")
+        return None
+
+    with open(meta_path, "r") as fp:
+        meta = json.load(fp)
+
+    if meta["version"] != SCENE_CACHE_VERSION:
+        print_info("scene cache version changed, reloading scene")
+        return None
+
+    fingerprint = get_scene_fingerprint(
+        dataset_path, get_scene_source_paths(dataset_path, scene_name, loader)
+    )
+    if meta["fingerprint"] != fingerprint:
+        print_info("scene source files changed, reloading scene")
+        return None
+
+    res = dict(meta["scalars"])
+    for key in meta["arrays"]:
+        res[key] = np.load(cache_dir / f"res_{key}.npy")
+
+    # point clouds
+    if meta["has_point_clouds"]:
+        point_clouds = []
+        for i, point_cloud_meta in enumerate(meta["point_clouds"]):
+            points_3d = np.load(cache_dir / f"point_cloud_{i}_points_3d.npy")
+            points_rgb = None
+            if point_cloud_meta["has_rgb"]:
+                points_rgb = np.load(cache_dir / f"point_cloud_{i}_points_rgb.npy")
+            point_clouds.append(
+                PointCloud(
+                    points_3d,
+                    points_rgb=points_rgb,
+                    color=point_cloud_meta["color"],
+                    label=point_cloud_meta["label"],
+                    size=point_cloud_meta["size"],
+                    marker=point_cloud_meta["marker"],
+                )
+            )
+        res["point_clouds"] = point_clouds
+
+    # cameras
+    cameras_splits = {}
+    for split, split_meta in meta["cameras_splits"].items():
+        cameras_meta = split_meta["cameras"]
+        cameras_modalities = _load_modalities(
+            split_meta["modalities"], len(cameras_meta), cache_dir
+        )
+        cameras_splits[split] = [
+            _camera_from_meta(camera_meta, modalities)
+            for camera_meta, modalities in zip(cameras_meta, cameras_modalities)
+        ]
+    res["cameras_splits"] = cameras_splits
+
+    if verbose:
+        print_log(f"scene loaded from cache {cache_dir}")
+
+    return res
+
+
+def warm_scene_cache(
+    dataset_name: str,
+    scene_name: str,
+    datasets_path: Path,
+    config: dict,
+    cache_path: Path,
+    verbose: bool = False,
+) -> Optional[Path]:
+    """runs the loader and caches the scene (if not cached already)
+
+    Args:
+        dataset_name (str): dataset name
+        scene_name (str): scene name
+        datasets_path (Path): root datasets folder
+        config (dict): dataset configuration
+        cache_path (Path): root cache folder
+        verbose (bool, optional): print info. Defaults to False.
+
+    Returns:
+        Path: scene cache folder, None if the scene can't be cached
+    """
+    from mvdatasets.mvdataset import DATASET_LOADER_MAPPING, run_loader
+
+    loader = DATASET_LOADER_MAPPING.get(dataset_name, None)
+    if loader is None:
+        raise ValueError(f"Dataset {dataset_name} is not supported")
+
+    dataset_path = Path(datasets_path) / dataset_name
+    cache_dir = get_scene_cache_dir(
+        cache_path, dataset_name, scene_name, config, loader
+    )
+    meta_path = cache_dir / _META_FILE_NAME
+    if meta_path.exists():
+        with open(meta_path, "r") as fp:
+            meta = json.load(fp)
+        fingerprint = get_scene_fingerprint(
+            dataset_path, get_scene_source_paths(dataset_path, scene_name, loader)
+        )
+        if (
+            meta["version"] == SCENE_CACHE_VERSION
+            and meta["fingerprint"] == fingerprint
+        ):
+            if verbose:
+                print_log(f"scene cache is up to date {cache_dir}")
+            return cache_dir
+
+    res = run_loader(loader, dataset_path, scene_name, config, verbose=verbose)
+    if res is None:
+        return None
+    return save_scene_cache(
+        res,
+        cache_path,
+        dataset_path,
+        dataset_name,
+        scene_name,
+        config,
+        loader,
+        verbose=verbose,
+    )
+
+
+def purge_scene_cache(
+    cache_path: Path,
+    dataset_name: Optional[str] = None,
+    scene_name: Optional[str] = None,
+) -> int:
+    """removes cached scenes
+
+    Args:
+        cache_path (Path): root cache folder
+        dataset_name (str, optional): if given, only purge this dataset.
+        scene_name (str, optional): if given (with dataset_name), only purge this scene.
+
+    Returns:
+        int: number of removed cache entries
+    """
+    cache_path = Path(cache_path)
+    if scene_name is not None and dataset_name is None:
+        raise ValueError("scene_name requires dataset_name")
+
+    if dataset_name is None:
+        scenes_paths = [p for p in cache_path.glob("*/*") if p.is_dir()]
+    elif scene_name is None:
+        scenes_paths = [p for p in (cache_path / dataset_name).glob("*") if p.is_dir()]
+    else:
+        scenes_paths = [cache_path / dataset_name / scene_name]
+
+    nr_removed = 0
+    for scene_path in scenes_paths:
+        if not scene_path.exists():
+            continue
+        nr_removed += len([p for p in scene_path.iterdir() if p.is_dir()])
+        shutil.rmtree(scene_path)
+
+    # remove empty parent folders
+    for dataset_path in [p for p in cache_path.glob("*") if p.is_dir()]:
+        if not any(dataset_path.iterdir()):
+            dataset_path.rmdir()
+
+    return nr_removed
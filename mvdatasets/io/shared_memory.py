@@ -0,0 +1,164 @@
+import os
+import torch
+import numpy as np
+from typing import NamedTuple, Optional, Tuple
+
+
+def _get_root_array(array: np.ndarray) -> np.ndarray:
+    """returns the array owning the memory array is a view of"""
+    while True:
+        base = array.base
+        # views made by np.lib.stride_tricks.as_strided have a wrapper base
+        if not isinstance(base, np.ndarray) and hasattr(base, "__array_interface__"):
+            base = getattr(base, "base", None)
+        if not isinstance(base, np.ndarray):
+            return array
+        array = base
+
+
+def _get_byte_offset(array: np.ndarray, root: np.ndarray) -> int:
+    return array.__array_interface__["data"][0] - root.__array_interface__["data"][0]
+
+
+def _view_of_root(
+    root: np.ndarray, byte_offset: int, shape: Tuple[int, ...], strides: Tuple[int, ...]
+) -> np.ndarray:
+    flat = root.reshape(-1)[byte_offset // root.dtype.itemsize :]
+    return np.lib.stride_tricks.as_strided(
+        flat, shape=shape, strides=strides, subok=True
+    )
+
+
+def empty_shared(shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+    """allocates an uninitialized array in shared memory (backed by a torch
+    shared tensor), pickling its views with a multiprocessing pickler
+    (e.g. to DataLoader workers) sends a handle instead of the data
+
+    Args:
+        shape (tuple): array shape
+        dtype (np.dtype): array dtype
+
+    Returns:
+        np.ndarray: array in shared memory
+    """
+    torch_dtype = torch.from_numpy(np.empty(0, dtype=dtype)).dtype
+    return torch.empty(shape, dtype=torch_dtype).share_memory_().numpy()
+
+
+def get_shared_tensor(array: np.ndarray) -> Optional[torch.Tensor]:
+    """returns the torch shared tensor backing array, None if not in shared memory"""
+    if not isinstance(array, np.ndarray):
+        return None
+    base = _get_root_array(array).base
+    if isinstance(base, torch.Tensor) and base.is_shared():
+        return base
+    return None
+
+
+def is_shared(array: np.ndarray) -> bool:
+    """checks if array is in shared memory (see empty_shared)"""
+    return get_shared_tensor(array) is not None
+
+
+def to_shared_memory(array: np.ndarray) -> np.ndarray:
+    """copies array to shared memory (see empty_shared), if not already there
+
+    Args:
+        array (np.ndarray): array
+
+    Returns:
+        np.ndarray: array in shared memory
+    """
+    if is_shared(array):
+        return array
+    out = empty_shared(array.shape, array.dtype)
+    out[...] = array
+    return out
+
+
+class SharedArrayRef(NamedTuple):
+    """picklable reference to a view of an array in shared memory"""
+
+    tensor: torch.Tensor
+    byte_offset: int
+    shape: Tuple[int, ...]
+    strides: Tuple[int, ...]
+
+    def open(self) -> np.ndarray:
+        return _view_of_root(
+            self.tensor.numpy(), self.byte_offset, self.shape, self.strides
+        )
+
+
+class MemmapRef(NamedTuple):
+    """picklable reference to a view of a memory-mapped .npy file"""
+
+    filename: str
+    offset: int
+    dtype: np.dtype
+    root_shape: Tuple[int, ...]
+    byte_offset: int
+    shape: Tuple[int, ...]
+    strides: Tuple[int, ...]
+
+    def open(self) -> np.ndarray:
+        # copy-on-write, as load_memmap
+        root = np.memmap(
+            self.filename,
+            dtype=self.dtype,
+            mode="c",
+            offset=self.offset,
+            shape=self.root_shape,
+        )
+        return _view_of_root(root, self.byte_offset, self.shape, self.strides)
+
+
+def pack_array(array):
+    """returns a picklable reference to array if it is in shared memory or
+    memory-mapped from an existing file (so that pickling sends a handle or
+    a file name instead of the data), else returns array unchanged
+
+    Args:
+        array (np.ndarray): array (or any other object)
+
+    Returns:
+        SharedArrayRef, MemmapRef or the input array
+    """
+    if not isinstance(array, np.ndarray):
+        return array
+    root = _get_root_array(array)
+    if root.dtype != array.dtype or not root.flags.c_contiguous:
+        return array
+    byte_offset = _get_byte_offset(array, root)
+    tensor = get_shared_tensor(array)
+    if tensor is not None:
+        return SharedArrayRef(tensor, byte_offset, array.shape, array.strides)
+    if (
+        isinstance(root, np.memmap)
+        and root.filename is not None
+        and os.path.exists(root.filename)
+    ):
+        return MemmapRef(
+            root.filename,
+            root.offset,
+            root.dtype,
+            root.shape,
+            byte_offset,
+            array.shape,
+            array.strides,
+        )
+    return array
+
+
+def unpack_array(packed):
+    """re-opens an array packed by pack_array
+
+    Args:
+        packed (SharedArrayRef, MemmapRef or any other object): packed array
+
+    Returns:
+        np.ndarray: array (or the input object, if not a reference)
+    """
+    if isinstance(packed, (SharedArrayRef, MemmapRef)):
+        return packed.open()
+    return packed
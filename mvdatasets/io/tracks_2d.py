@@ -0,0 +1,237 @@
+import os
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+from tqdm import tqdm
+from functools import partial
+from typing import List, Optional, Tuple, Union
+from mvdatasets.io.decoding import get_decode_pool
+from mvdatasets.io.modality_storage import open_memmap
+
+# bump when the packed tracks layout changes
+TRACKS_2D_PACK_VERSION = 1
+
+
+def get_raw_tracks_2d_path(
+    tracks_dir: Union[str, Path], query_frame_name: str, target_frame_name: str
+) -> Path:
+    """returns the file of the tracks of a query frame in a target frame
+    (one (N, C) .npy file per pair of frames)"""
+    return Path(tracks_dir) / f"{query_frame_name}_{target_frame_name}.npy"
+
+
+def get_packed_tracks_2d_path(packed_dir: Union[str, Path], frame_name: str) -> Path:
+    """returns the packed tracks file of a query frame"""
+    return Path(packed_dir) / f"{frame_name}.npy"
+
+
+def _get_pack_meta_path(packed_dir: Union[str, Path], frame_name: str) -> Path:
+    # sources fingerprint of a packed file
+    return Path(packed_dir) / f"{frame_name}.json"
+
+
+def _get_sources_fingerprint(
+    tracks_dir: Path, query_frame_name: str, frames_names: List[str]
+) -> str:
+    """returns a fingerprint of the tracks files of a query frame
+    (ordered target frames names, mtimes and sizes)"""
+    hasher = hashlib.sha1(f"{TRACKS_2D_PACK_VERSION}\n".encode())
+    for target_frame_name in frames_names:
+        file_path = get_raw_tracks_2d_path(
+            tracks_dir, query_frame_name, target_frame_name
+        )
+        stat = os.stat(file_path)
+        hasher.update(
+            f"{target_frame_name}:{stat.st_mtime_ns}:{stat.st_size}\n".encode()
+        )
+    return hasher.hexdigest()
+
+
+def _pack_query_frame_tracks(
+    query_frame_name: str,
+    fingerprint: str,
+    tracks_dir: Path,
+    packed_dir: Path,
+    frames_names: List[str],
+) -> Path:
+    """packs the tracks of a query frame in all target frames in a (N, T, C) file"""
+    file_path = get_packed_tracks_2d_path(packed_dir, query_frame_name)
+    # write to a temporary file first, so that a partial file is never read
+    tmp_file_path = file_path.with_suffix(f".tmp{os.getpid()}.npy")
+    out = None
+    for j, target_frame_name in enumerate(frames_names):
+        tracks = np.load(
+            get_raw_tracks_2d_path(tracks_dir, query_frame_name, target_frame_name)
+        )
+        if out is None:
+            shape = (tracks.shape[0], len(frames_names), tracks.shape[1])
+            out = open_memmap(tmp_file_path, shape, np.float32)
+        out[:, j] = tracks
+    out.flush()
+    del out
+    os.replace(tmp_file_path, file_path)
+    # the fingerprint is written last, a pack without it is packed again
+    meta_path = _get_pack_meta_path(packed_dir, query_frame_name)
+    tmp_meta_path = meta_path.with_suffix(f".tmp{os.getpid()}.json")
+    with open(tmp_meta_path, "w") as fp:
+        json.dump({"fingerprint": fingerprint}, fp)
+    os.replace(tmp_meta_path, meta_path)
+    return file_path
+
+
+def _is_packed(packed_dir: Path, frame_name: str, fingerprint: str) -> bool:
+    meta_path = _get_pack_meta_path(packed_dir, frame_name)
+    if not meta_path.exists():
+        return False
+    if not get_packed_tracks_2d_path(packed_dir, frame_name).exists():
+        return False
+    with open(meta_path, "r") as fp:
+        meta = json.load(fp)
+    return meta.get("fingerprint") == fingerprint
+
+
+def pack_tracks_2d(
+    tracks_dir: Union[str, Path],
+    packed_dir: Union[str, Path],
+    frames_names: List[str],
+    nr_workers: Optional[int] = None,
+) -> None:
+    """packs per (query frame, target frame) 2D tracks files in one (N, T, C)
+    float32 file per query frame, query frames already packed from the same
+    source files (same ordered frames, mtimes and sizes) are skipped
+
+    Args:
+        tracks_dir (str or Path): folder with "{query}_{target}.npy" (N, C) files
+        packed_dir (str or Path): output folder
+        frames_names (list): ordered names of the T frames
+        nr_workers (int, optional): number of workers. Defaults to None (all cores).
+    """
+    tracks_dir = Path(tracks_dir)
+    packed_dir = Path(packed_dir)
+    packed_dir.mkdir(parents=True, exist_ok=True)
+
+    to_pack, fingerprints = [], []
+    for frame_name in frames_names:
+        fingerprint = _get_sources_fingerprint(tracks_dir, frame_name, frames_names)
+        if not _is_packed(packed_dir, frame_name, fingerprint):
+            to_pack.append(frame_name)
+            fingerprints.append(fingerprint)
+    if len(to_pack) == 0:
+        return
+
+    pool = get_decode_pool(nr_workers)
+    pack_fn = partial(
+        _pack_query_frame_tracks,
+        tracks_dir=tracks_dir,
+        packed_dir=packed_dir,
+        frames_names=frames_names,
+    )
+    # consume results to wait for all query frames (and raise errors)
+    list(
+        tqdm(
+            pool.map(pack_fn, to_pack, fingerprints),
+            total=len(to_pack),
+            desc="packing 2D tracks",
+            ncols=100,
+        )
+    )
+
+
+def _get_nr_samples_per_frame(nr_samples: int, nr_query_frames: int) -> np.ndarray:
+    # last query frame takes the remainder
+    nr_samples_per_frame = np.full(nr_query_frames, nr_samples // nr_query_frames)
+    nr_samples_per_frame[-1] = nr_samples - nr_samples_per_frame[:-1].sum()
+    return nr_samples_per_frame
+
+
+def _sample_tracks_sels(nr_tracks: int, nr_frame_samples: int) -> Optional[np.ndarray]:
+    # sorted rows are read sequentially, None if all rows are read
+    if nr_frame_samples >= nr_tracks:
+        return None
+    return np.sort(np.random.choice(nr_tracks, (nr_frame_samples,), replace=False))
+
+
+def load_tracks_2d(
+    packed_dir: Union[str, Path],
+    frames_names: List[str],
+    nr_samples: int,
+    query_frames_idxs: Optional[List[int]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """samples 2D tracks from packed files (see pack_tracks_2d),
+    the same number of tracks is sampled from each query frame and only
+    the sampled rows are read from the memory-mapped files
+
+    Args:
+        packed_dir (str or Path): packed tracks folder
+        frames_names (list): ordered names of the T frames
+        nr_samples (int): total number of tracks to sample
+        query_frames_idxs (list, optional): query frames to sample tracks from.
+            Defaults to None (all frames).
+
+    Returns:
+        np.ndarray: (N, T, C) tracks in all frames
+        np.ndarray: (N,) query frame index of each track
+    """
+    if query_frames_idxs is None:
+        query_frames_idxs = list(range(len(frames_names)))
+    nr_samples_per_frame = _get_nr_samples_per_frame(nr_samples, len(query_frames_idxs))
+
+    tracks_2d = []
+    tracks_query_frames = []
+    for i, nr_frame_samples in zip(query_frames_idxs, nr_samples_per_frame):
+        file_path = get_packed_tracks_2d_path(packed_dir, frames_names[i])
+        tracks = np.load(file_path, mmap_mode="r")  # (N_i, T, C)
+        tracks_sels = _sample_tracks_sels(tracks.shape[0], nr_frame_samples)
+        if tracks_sels is not None:
+            tracks = tracks[tracks_sels]
+        tracks_2d.append(np.asarray(tracks, dtype=np.float32))
+        tracks_query_frames.append(np.full(tracks.shape[0], i, dtype=np.int64))
+
+    return np.concatenate(tracks_2d), np.concatenate(tracks_query_frames)
+
+
+def load_raw_tracks_2d(
+    tracks_dir: Union[str, Path],
+    frames_names: List[str],
+    nr_samples: int,
+    query_frames_idxs: Optional[List[int]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """samples 2D tracks as load_tracks_2d, reading the sampled rows from the
+    per (query frame, target frame) files (not packed)
+
+    Args:
+        tracks_dir (str or Path): folder with "{query}_{target}.npy" (N, C) files
+        frames_names (list): ordered names of the T frames
+        nr_samples (int): total number of tracks to sample
+        query_frames_idxs (list, optional): query frames to sample tracks from.
+            Defaults to None (all frames).
+
+    Returns:
+        np.ndarray: (N, T, C) tracks in all frames
+        np.ndarray: (N,) query frame index of each track
+    """
+    if query_frames_idxs is None:
+        query_frames_idxs = list(range(len(frames_names)))
+    nr_samples_per_frame = _get_nr_samples_per_frame(nr_samples, len(query_frames_idxs))
+
+    tracks_2d = []
+    tracks_query_frames = []
+    for i, nr_frame_samples in zip(query_frames_idxs, nr_samples_per_frame):
+        query_frame_name = frames_names[i]
+        out = None
+        for j, target_frame_name in enumerate(frames_names):
+            file_path = get_raw_tracks_2d_path(
+                tracks_dir, query_frame_name, target_frame_name
+            )
+            tracks = np.load(file_path, mmap_mode="r")  # (N_i, C)
+            if out is None:
+                tracks_sels = _sample_tracks_sels(tracks.shape[0], nr_frame_samples)
+                nr_rows = tracks.shape[0] if tracks_sels is None else len(tracks_sels)
+                shape = (nr_rows, len(frames_names), tracks.shape[1])
+                out = np.empty(shape, dtype=np.float32)
+            out[:, j] = tracks if tracks_sels is None else tracks[tracks_sels]
+        tracks_2d.append(out)
+        tracks_query_frames.append(np.full(out.shape[0], i, dtype=np.int64))
+
+    return np.concatenate(tracks_2d), np.concatenate(tracks_query_frames)
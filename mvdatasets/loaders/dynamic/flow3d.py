@@ -4,9 +4,15 @@ from pathlib import Path
 import os.path as osp
 import os
 import json
-from PIL import Image
+from functools import partial
 from tqdm import tqdm
-from mvdatasets.utils.images import image_to_numpy
+from mvdatasets.io.decoding import load_frames, load_image
+from mvdatasets.io.modality_storage import get_memmap_file_path, ModalityBuffer
+from mvdatasets.io.tracks_2d import (
+    pack_tracks_2d,
+    load_tracks_2d,
+    load_raw_tracks_2d,
+)
 from mvdatasets import Camera
 from mvdatasets.geometry.primitives.point_cloud import PointCloud
 from mvdatasets.geometry.primitives.bounding_box import BoundingBox
@@ -14,6 +20,16 @@ from mvdatasets.utils.printing import print_error, print_warning, print_success
 from mvdatasets.utils.loader_utils import rescale
 from mvdatasets.geometry.common import rot_euler_3d_deg
 from dataclasses import dataclass, asdict
+from typing import Optional
+
+
+def _get_packed_tracks_2d_dir(
+    config: dict, scene_name: str, subsample_factor: int
+) -> Optional[Path]:
+    """returns the packed 2D tracks folder, None if packing is disabled"""
+    if config["tracks_2d_cache_path"] is None:
+        return None
+    return Path(config["tracks_2d_cache_path"]) / scene_name / f"{subsample_factor}x"
 
 
 def load(
@@ -216,28 +232,21 @@ def load(
     depths_dict = {}
     if not config["pose_only"]:
 
-        pbar = tqdm(data.items(), desc="loading images", ncols=100)
-        for split_name, split_data in pbar:
-            rgbs_dict[split_name] = []
-
-            frames_pbar = tqdm(split_data["frame_names"], desc=split_name, ncols=100)
-            for frame_name in frames_pbar:
-                rgb_path = os.path.join(
+        for split_name, split_data in data.items():
+            rgbs_paths = [
+                os.path.join(
                     scene_path, "rgb", f"{subsample_factor}x", f"{frame_name}.png"
                 )
-                # load PIL image
-                img_pil = Image.open(rgb_path)
-                img_np = image_to_numpy(img_pil, use_uint8=True)
-                # mask = img_np[..., -1]
-                # # negate mask
-                # mask = 255 - mask
-                # rgb_np = img_np[..., :-1]
-                # # set masked pixels to black
-                # rgb_np[mask == 0] = 0
-                # print("img_np", img_np.shape, img_np.dtype)
-                # exit(0)
-                rgb_np = img_np[..., :3]
-                rgbs_dict[split_name].append(rgb_np)
+                for frame_name in split_data["frame_names"]
+            ]
+            # decode all split images in parallel (drop alpha channel)
+            rgbs_dict[split_name] = load_frames(
+                rgbs_paths,
+                decode_fn=partial(load_image, channels="RGB"),
+                config=config,
+                desc=split_name,
+                out_path=get_memmap_file_path(config, scene_name, split_name, "rgbs"),
+            )
 
         # if config["load_masks"]:
         #     for split_name, split_data in data.items():
@@ -245,12 +254,19 @@ def load(
 
         if config["load_depths"]:
             for split_name, split_data in data.items():
-                depths_dict[split_name] = []
+                # written in place, allocated once the first frame is loaded
+                depths_buffer = ModalityBuffer(
+                    len(split_data["frame_names"]),
+                    out_path=get_memmap_file_path(
+                        config, scene_name, split_name, "depths"
+                    ),
+                    shared=config["shared_memory"],
+                )
 
                 frames_pbar = tqdm(
                     split_data["frame_names"], desc=split_name, ncols=100
                 )
-                for frame_name in frames_pbar:
+                for i, frame_name in enumerate(frames_pbar):
                     depth_path = os.path.join(
                         scene_path, "depth", f"{subsample_factor}x", f"{frame_name}.npy"
                     )
@@ -262,66 +278,50 @@ def load(
                     depth_np = np.load(depth_path)
                     # multiply depth times scene scale mult
                     depth_np *= scene_radius_mult
-                    #
-                    depths_dict[split_name].append(depth_np)
+                    # unsqueeze to (H, W, 1)
+                    if depth_np.ndim == 2:
+                        depth_np = np.expand_dims(depth_np, axis=-1)
+                    depths_buffer[i] = depth_np
 
-        # TODO: load covisible for validation split
+                if depths_buffer.nr_written > 0:
+                    # missing depth maps are left empty (zero depth)
+                    depths_dict[split_name] = depths_buffer.finalize(fill_value=0)
 
-    # Load 2D tracks
-    frame_names = []
+        # TODO: load covisible for validation split
 
-    # Load the query pixels from 2D tracks.
-    query_tracks_2d = [
-        np.load(
-            osp.join(
-                scene_path,
-                "flow3d_preprocessed/2d_tracks/",
-                f"{subsample_factor}x/{frame_name}_{frame_name}.npy",
-            )
-        ).astype(np.float32)
-        for frame_name in frame_names
-    ]
-
-    num_samples = 1000
-    num_frames = 10  # TODO: full sequence length
-    step = 1
-
-    raw_tracks_2d = []
-    candidate_frames = list(range(0, num_frames, step))
-    num_sampled_frames = len(candidate_frames)
-    for i in tqdm(candidate_frames, desc="Loading 2D tracks", leave=False):
-        curr_num_samples = query_tracks_2d[i].shape[0]
-        num_samples_per_frame = (
-            int(np.floor(num_samples / num_sampled_frames))
-            if i != candidate_frames[-1]
-            else num_samples
-            - (num_sampled_frames - 1) * int(np.floor(num_samples / num_sampled_frames))
+    # (optional) load 2D tracks of the train frames
+    tracks_2d = None
+    tracks_2d_query_frames = None
+    if (
+        not config["pose_only"]
+        and config["load_2d_tracks"]
+        and "frame_names" in data.get("train", {})
+    ):
+        frames_names = data["train"]["frame_names"]
+        tracks_dir = osp.join(
+            scene_path, "flow3d_preprocessed", "2d_tracks", f"{subsample_factor}x"
         )
-        if num_samples_per_frame < curr_num_samples:
-            track_sels = np.random.choice(
-                curr_num_samples, (num_samples_per_frame,), replace=False
-            )
+        packed_dir = _get_packed_tracks_2d_dir(config, scene_name, subsample_factor)
+        if packed_dir is None:
+            # read only sampled rows of the per (query, target) files
+            tracks_2d, tracks_2d_query_frames = load_raw_tracks_2d(
+                tracks_dir,
+                frames_names,
+                nr_samples=config["nr_tracks_2d_samples"],
+            )  # (N, T, C), (N,)
         else:
-            track_sels = np.arange(0, curr_num_samples)
-
-        curr_tracks_2d = []
-        for j in range(0, num_frames, step):
-            if i == j:
-                target_tracks_2d = query_tracks_2d[i]
-            else:
-                target_tracks_2d = np.load(
-                    osp.join(
-                        scene_path,
-                        "flow3d_preprocessed/2d_tracks/",
-                        f"{subsample_factor}x/"
-                        f"{frame_names[i]}_"
-                        f"{frame_names[j]}.npy",
-                    )
-                ).astype(np.float32)
-
-            curr_tracks_2d.append(target_tracks_2d[track_sels])
-        # stack with numpy
-        raw_tracks_2d.append(np.stack(curr_tracks_2d, axis=1))
+            # pack per (query, target) files once, then read only sampled rows
+            pack_tracks_2d(
+                tracks_dir=tracks_dir,
+                packed_dir=packed_dir,
+                frames_names=frames_names,
+                nr_workers=config["nr_workers"],
+            )
+            tracks_2d, tracks_2d_query_frames = load_tracks_2d(
+                packed_dir,
+                frames_names,
+                nr_samples=config["nr_tracks_2d_samples"],
+            )  # (N, T, C), (N,)
 
     # cameras objects
     cameras_splits = {}
@@ -333,7 +333,7 @@ def load(
             # print(i, frame_name)
             rgbs_split = rgbs_dict.get(split)
             if rgbs_split is not None and len(rgbs_split) > 0:
-                cam_imgs = rgbs_split[i][None, ...]  # (1, H, W, 3)
+                cam_imgs = rgbs_split[i : i + 1]  # (1, H, W, 3)
             else:
                 cam_imgs = None
 
@@ -345,7 +345,7 @@ def load(
 
             depths_split = depths_dict.get(split)
             if depths_split is not None and len(depths_split) > 0:
-                cam_depths = depths_split[i][None, ...]  # (1, H, W, 1)
+                cam_depths = depths_split[i : i + 1]  # (1, H, W, 1)
             else:
                 cam_depths = None
 
@@ -393,4 +393,6 @@ def load(
         "fps": fps,
         "nr_per_camera_frames": 1,
         "nr_sequence_frames": len(cameras_splits["train"]),
+        "tracks_2d": tracks_2d,
+        "tracks_2d_query_frames": tracks_2d_query_frames,
     }
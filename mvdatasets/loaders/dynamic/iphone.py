@@ -3,9 +3,10 @@ import numpy as np
 from pathlib import Path
 import os
 import json
-from PIL import Image
+from functools import partial
 from tqdm import tqdm
-from mvdatasets.utils.images import image_to_numpy
+from mvdatasets.io.decoding import load_frames, load_image
+from mvdatasets.io.modality_storage import get_memmap_file_path, ModalityBuffer
 from mvdatasets import Camera
 from mvdatasets.geometry.primitives.point_cloud import PointCloud
 from mvdatasets.geometry.primitives.bounding_box import BoundingBox
@@ -213,28 +214,21 @@ def load(
     depths_dict = {}
     if not config["pose_only"]:
 
-        pbar = tqdm(data.items(), desc="loading images", ncols=100)
-        for split_name, split_data in pbar:
-            rgbs_dict[split_name] = []
-
-            frames_pbar = tqdm(split_data["frame_names"], desc=split_name, ncols=100)
-            for frame_name in frames_pbar:
-                rgb_path = os.path.join(
+        for split_name, split_data in data.items():
+            rgbs_paths = [
+                os.path.join(
                     scene_path, "rgb", f"{subsample_factor}x", f"{frame_name}.png"
                 )
-                # load PIL image
-                img_pil = Image.open(rgb_path)
-                img_np = image_to_numpy(img_pil, use_uint8=True)
-                # mask = img_np[..., -1]
-                # # negate mask
-                # mask = 255 - mask
-                # rgb_np = img_np[..., :-1]
-                # # set masked pixels to black
-                # rgb_np[mask == 0] = 0
-                # print("img_np", img_np.shape, img_np.dtype)
-                # exit(0)
-                rgb_np = img_np[..., :3]
-                rgbs_dict[split_name].append(rgb_np)
+                for frame_name in split_data["frame_names"]
+            ]
+            # decode all split images in parallel (drop alpha channel)
+            rgbs_dict[split_name] = load_frames(
+                rgbs_paths,
+                decode_fn=partial(load_image, channels="RGB"),
+                config=config,
+                desc=split_name,
+                out_path=get_memmap_file_path(config, scene_name, split_name, "rgbs"),
+            )
 
         # if config["load_masks"]:
         #     for split_name, split_data in data.items():
@@ -242,12 +236,19 @@ def load(
 
         if config["load_depths"]:
             for split_name, split_data in data.items():
-                depths_dict[split_name] = []
+                # written in place, allocated once the first frame is loaded
+                depths_buffer = ModalityBuffer(
+                    len(split_data["frame_names"]),
+                    out_path=get_memmap_file_path(
+                        config, scene_name, split_name, "depths"
+                    ),
+                    shared=config["shared_memory"],
+                )
 
                 frames_pbar = tqdm(
                     split_data["frame_names"], desc=split_name, ncols=100
                 )
-                for frame_name in frames_pbar:
+                for i, frame_name in enumerate(frames_pbar):
                     depth_path = os.path.join(
                         scene_path, "depth", f"{subsample_factor}x", f"{frame_name}.npy"
                     )
@@ -259,8 +260,14 @@ def load(
                     depth_np = np.load(depth_path)
                     # multiply depth times scene scale mult
                     depth_np *= scene_radius_mult
-                    #
-                    depths_dict[split_name].append(depth_np)
+                    # unsqueeze to (H, W, 1)
+                    if depth_np.ndim == 2:
+                        depth_np = np.expand_dims(depth_np, axis=-1)
+                    depths_buffer[i] = depth_np
+
+                if depths_buffer.nr_written > 0:
+                    # missing depth maps are left empty (zero depth)
+                    depths_dict[split_name] = depths_buffer.finalize(fill_value=0)
 
         # TODO: load covisible for validation split
 
@@ -274,7 +281,7 @@ def load(
             # print(i, frame_name)
             rgbs_split = rgbs_dict.get(split)
             if rgbs_split is not None and len(rgbs_split) > 0:
-                cam_imgs = rgbs_split[i][None, ...]  # (1, H, W, 3)
+                cam_imgs = rgbs_split[i : i + 1]  # (1, H, W, 3)
             else:
                 cam_imgs = None
 
@@ -286,7 +293,7 @@ def load(
 
             depths_split = depths_dict.get(split)
             if depths_split is not None and len(depths_split) > 0:
-                cam_depths = depths_split[i][None, ...]  # (1, H, W, 1)
+                cam_depths = depths_split[i : i + 1]  # (1, H, W, 1)
             else:
                 cam_depths = None
 
@@ -7,6 +7,8 @@ from PIL import Image
 from tqdm import tqdm
 from mvdatasets.utils.images import image_to_numpy
 from mvdatasets import Camera
+from mvdatasets.io.decoding import load_frames
+from mvdatasets.io.modality_storage import get_memmap_file_path, ModalityBuffer
 from mvdatasets.geometry.primitives.point_cloud import PointCloud
 from mvdatasets.geometry.primitives.bounding_box import BoundingBox
 from mvdatasets.utils.printing import print_error, print_warning, print_success
@@ -161,32 +163,39 @@ def load(
         width, height = rgb.shape[1], rgb.shape[0]
     else:
         # load all rgb frames
-        pbar = tqdm(rgb_frames, desc="rgbs", ncols=100)
-        for rgb_frame in pbar:
-            rgb = image_to_numpy(Image.open(rgb_frame), use_uint8=True)
-            width, height = rgb.shape[1], rgb.shape[0]
-            # print(rgb.shape, rgb.dtype)
-            rgbs_list.append(rgb)
+        rgbs_list = load_frames(
+            rgb_frames,
+            config=config,
+            desc="rgbs",
+            out_path=get_memmap_file_path(config, scene_name, "rgbs"),
+        )
+        width, height = rgbs_list.shape[2], rgbs_list.shape[1]
 
         # load all depth frames
         if config["load_depths"]:
+            # written in place, allocated once the first frame is loaded
+            depths_buffer = ModalityBuffer(
+                len(depth_frames),
+                out_path=get_memmap_file_path(config, scene_name, "depths"),
+                shared=config["shared_memory"],
+            )
             pbar = tqdm(depth_frames, desc="depths", ncols=100)
-            for depth_frame in pbar:
+            for i, depth_frame in enumerate(pbar):
                 depth_np = np.load(depth_frame)  # (H, W)
                 # multiply depth times scene scale mult
                 depth_np *= scene_radius_mult
                 # unsqueeze to (H, W, 1)
-                depth_np = np.expand_dims(depth_np, axis=-1)
-                # print(depth.shape, depth.dtype)
-                depths_list.append(depth_np)
+                depths_buffer[i] = np.expand_dims(depth_np, axis=-1)
+            depths_list = depths_buffer.finalize()
 
         # load all mask frames
         if config["load_masks"]:
-            pbar = tqdm(masks_frames, desc="masks", ncols=100)
-            for mask_frame in pbar:
-                mask_np = image_to_numpy(Image.open(mask_frame), use_uint8=True)
-                mask_np = mask_np[:, :, None]
-                masks_list.append(mask_np)
+            masks_list = load_frames(
+                masks_frames,
+                config=config,
+                desc="masks",
+                out_path=get_memmap_file_path(config, scene_name, "masks"),
+            )
 
     # cameras objects
     cameras_splits = {}
@@ -198,12 +207,12 @@ def load(
             if len(depths_list) == 0:
                 depths = None
             else:
-                depths = depths_list[i][None, ...]
+                depths = depths_list[i : i + 1]
 
             if len(masks_list) == 0:
                 masks = None
             else:
-                masks = masks_list[i][None, ...]
+                masks = masks_list[i : i + 1]
 
             # create camera object
             camera = Camera(
@@ -211,7 +220,7 @@ def load(
                 pose=poses_list[i],
                 global_transform=global_transform,
                 local_transform=local_transform,
-                rgbs=rgbs_list[i][None, ...],
+                rgbs=rgbs_list[i : i + 1],
                 depths=depths,
                 masks=masks,
                 timestamps=tt_list[i],
@@ -1,18 +1,21 @@
 from rich import print
 import numpy as np
 from pathlib import Path
-import os
-import json
-from PIL import Image
 from tqdm import tqdm
-from mvdatasets.utils.images import image_to_numpy
+from functools import partial
 from mvdatasets import Camera
-from mvdatasets.geometry.primitives.point_cloud import PointCloud
-from mvdatasets.geometry.primitives.bounding_box import BoundingBox
-from mvdatasets.utils.printing import print_error, print_warning, print_success
-from mvdatasets.utils.loader_utils import rescale
+from mvdatasets.io.modality_storage import get_memmap_file_path, LazyFrames
+from mvdatasets.utils.video_utils import (
+    VideoReader,
+    read_video_frame,
+    read_videos_frames,
+)
+from mvdatasets.utils.loader_utils import (
+    rescale,
+    get_subsampled_resolution,
+    subsample_intrinsics,
+)
 from mvdatasets.geometry.common import rot_euler_3d_deg
-from mvdatasets.geometry.quaternions import quats_to_rots
 
 
 def load(
@@ -69,52 +72,146 @@ def load(
     if not poses_bounds_path.exists():
         raise ValueError(f"File {poses_bounds_path} does not exist.")
 
-    poses_bounds = np.load(poses_bounds_path)
-    print(poses_bounds)
-
-    # camera poses are in OpenGL format
-    # Poses are stored as 3x4 numpy arrays that represent camera-to-world
-    # transformation matrices. The other data you will need is simple pinhole
-    # camera intrinsics (hwf = [height, width, focal length]) and near/far scene bounds
-
-    poses_list = []
-    intrinsics_list = []
-    for poses_bound in poses_bounds:
-        c2w_ogl = poses_bound[: 3 * 4].reshape(3, 4)  # :12
-        height = poses_bound[3 * 4]  # 12
-        width = poses_bound[3 * 4 + 1]  # 13
-        focal_length = poses_bound[3 * 4 + 2]  # 14
-        near = poses_bound[3 * 4 + 3]  # 15
-        far = poses_bound[3 * 4 + 4]  # 16
-        print("c2w", c2w_ogl)
-        print("height", height)
-        print("width", width)
-        print("focal_length", focal_length)
-        print("near", near)
-        print("far", far)
-        # poses_list.append(poses_bound[:3, :4])
-        # intrinsics_list.append(poses_bound[3:])
+    # LLFF format, one row per camera:
+    # (3, 5) [R | t | hwf] camera-to-world matrix flattened + near, far bounds
+    poses_bounds = np.load(poses_bounds_path).astype(np.float32)  # (N, 17)
+    poses_hwf = poses_bounds[:, :15].reshape(-1, 3, 5)  # (N, 3, 5)
+    bounds = poses_bounds[:, 15:17]  # (N, 2)
+
+    # rotation columns are [down, right, backwards], convert to OpenGL
+    # [right, up, backwards]
+    c2w_ogl = np.concatenate(
+        [poses_hwf[:, :, 1:2], -poses_hwf[:, :, 0:1], poses_hwf[:, :, 2:4]], axis=-1
+    )  # (N, 3, 4)
+    poses_all = np.tile(np.eye(4, dtype=np.float32), (len(c2w_ogl), 1, 1))
+    poses_all[:, :3, :4] = c2w_ogl  # (N, 4, 4)
+    hwf_all = poses_hwf[:, :, 4]  # (N, 3)
 
     # find all cam00.mp4 cameras feeds
-    cam_videos = list(scene_path.glob("cam*.mp4"))
-    cam_videos = sorted(cam_videos)
-
-    # check if frames where already extracted
-    for cam_video in cam_videos:
-        video_path = scene_path / cam_video
-        frames_folder = scene_path / cam_video.stem
-        if not frames_folder.exists():
-            print_warning(f"Frames folder {frames_folder} does not exist.")
-            # extract frames
-            from mvdatasets.utils.video_utils import extract_frames
-
-            extract_frames(
-                video_path=video_path,
-                subsample_factor=1,
-                ext="jpg",
+    cam_videos = sorted(scene_path.glob("cam*.mp4"))
+    if len(cam_videos) != len(poses_all):
+        raise ValueError(
+            f"found {len(cam_videos)} videos, but {len(poses_all)} poses in {poses_bounds_path}"
+        )
+
+    # open videos (frames are decoded in-process, without extracting them to disk)
+    video_readers = [VideoReader(cam_video) for cam_video in cam_videos]
+    # videos can differ by a few frames, keep the common ones
+    temporal_dim = min(len(video_reader) for video_reader in video_readers)
+    cam_timestamps = np.arange(temporal_dim) / config["frame_rate"]
+
+    # rescale (optional)
+    scene_radius_mult, min_camera_distance, max_camera_distance = rescale(
+        poses_all, to_distance=config["max_cameras_distance"]
+    )
+
+    scene_radius = max_camera_distance
+
+    # global transform
+    global_transform = np.eye(4)
+    # rotate and scale
+    rot = rot_euler_3d_deg(
+        config["rotate_deg"][0], config["rotate_deg"][1], config["rotate_deg"][2]
+    )
+    global_transform[:3, :3] = scene_radius_mult * rot
+
+    # local transform (OpenGL to OpenCV)
+    local_transform = np.eye(4)
+    local_transform[:3, :3] = np.array([[1, 0, 0], [0, -1, 0], [0, 0, -1]])
+
+    # images are decoded at the subsampled resolution
+    subsample_factor = int(config["subsample_factor"])
+
+    # first camera is the test camera
+    cam_idxs_split = {
+        "train": list(range(1, len(cam_videos))),
+        "test": [0],
+    }
+
+    cameras_splits = {}
+    for split in splits:
+
+        cameras_splits[split] = []
+
+        # stream all frames of all split videos, one video per worker
+        if not config["pose_only"] and not config["lazy_loading"]:
+            split_imgs = read_videos_frames(
+                [cam_videos[i] for i in cam_idxs_split[split]],
+                temporal_dim,
+                subsample_factor=subsample_factor,
+                nr_workers=config["nr_workers"],
+                desc=f"{split} videos",
+                out_path=get_memmap_file_path(config, scene_name, split, "rgbs"),
+                shared=config["shared_memory"],
+            )  # (N, T, H, W, 3)
+
+        pbar = tqdm(cam_idxs_split[split], desc=f"{split} cameras", ncols=100)
+        for k, i in enumerate(pbar):
+
+            video_reader = video_readers[i]
+            camera_id = cam_videos[i].stem
+            width, height = video_reader.width, video_reader.height
+            cam_width, cam_height = get_subsampled_resolution(
+                width, height, subsample_factor
             )
-            print_success(f"Frames extracted to {frames_folder}")
 
-    # TODO: complete implementation
+            if config["pose_only"]:
+                cam_imgs = None
+            elif config["lazy_loading"]:
+                # decode frames on first access
+                cam_imgs = LazyFrames(
+                    [(cam_videos[i], frame_idx) for frame_idx in range(temporal_dim)],
+                    decode_fn=partial(
+                        read_video_frame, subsample_factor=subsample_factor
+                    ),
+                    frame_shape=(cam_height, cam_width, 3),
+                    dtype=np.uint8,
+                )
+            else:
+                cam_imgs = split_imgs[k]  # (T, H, W, 3)
+
+            # hwf refers to the original resolution, rescale to the video one
+            hwf_height, _, focal_length = hwf_all[i]
+            focal_length = focal_length * height / hwf_height
+            intrinsics = np.eye(3, dtype=np.float32)
+            intrinsics[0, 0] = focal_length
+            intrinsics[1, 1] = focal_length
+            intrinsics[0, 2] = width / 2.0
+            intrinsics[1, 2] = height / 2.0
+            intrinsics, cam_width, cam_height = subsample_intrinsics(
+                intrinsics, width, height, subsample_factor
+            )
+
+            camera = Camera(
+                intrinsics=intrinsics,
+                pose=poses_all[i],
+                global_transform=global_transform,
+                local_transform=local_transform,
+                rgbs=cam_imgs,
+                timestamps=cam_timestamps,
+                camera_label=camera_id,
+                width=cam_width,
+                height=cam_height,
+                near=float(bounds[i, 0] * scene_radius_mult),
+                far=float(bounds[i, 1] * scene_radius_mult),
+                temporal_dim=temporal_dim,
+                # verbose=verbose,
+            )
 
-    raise NotImplementedError("nerfies loader is not implemented yet")
+            cameras_splits[split].append(camera)
+
+    for video_reader in video_readers:
+        video_reader.close()
+
+    return {
+        "scene_type": config["scene_type"],
+        "cameras_splits": cameras_splits,
+        "global_transform": global_transform,
+        "min_camera_distance": min_camera_distance,
+        "max_camera_distance": max_camera_distance,
+        "foreground_scale_mult": config["foreground_scale_mult"],
+        "scene_radius": scene_radius,
+        "nr_per_camera_frames": temporal_dim,
+        "fps": config["frame_rate"],
+        "nr_sequence_frames": temporal_dim,
+    }
@@ -2,15 +2,32 @@ from rich import print
 import os
 import json
 from pathlib import Path
+from typing import List
 from tqdm import tqdm
+from functools import partial
 import numpy as np
 from mvdatasets.utils.printing import print_warning, print_success
 from mvdatasets.camera import Camera
 from mvdatasets.geometry.primitives.point_cloud import PointCloud
-from mvdatasets.utils.images import image_to_numpy
-from mvdatasets.utils.loader_utils import rescale
+from mvdatasets.io.decoding import load_frames, load_image
+from mvdatasets.io.modality_storage import get_memmap_file_path
+from mvdatasets.utils.loader_utils import rescale, subsample_intrinsics
 from mvdatasets.geometry.common import rot_euler_3d_deg
-from PIL import Image
+
+
+def _split_per_camera(frames, files_per_camera: List[List[Path]]) -> list:
+    """slices the frames of all cameras (concatenated) per camera,
+    cameras without files get None"""
+    cams_frames = []
+    offset = 0
+    for cam_files in files_per_camera:
+        nr_frames = len(cam_files)
+        if nr_frames > 0:
+            cams_frames.append(frames[offset : offset + nr_frames])
+        else:
+            cams_frames.append(None)
+        offset += nr_frames
+    return cams_frames
 
 
 def load(
@@ -148,57 +165,65 @@ def load(
 
     cam_timestamps = np.arange(temporal_dim) / config["frame_rate"]
 
+    # images are decoded at the subsampled resolution
+    subsample_factor = int(config["subsample_factor"])
+    decode_fn = partial(load_image, subsample_factor=subsample_factor)
+
     cameras_splits = {}
     for split in splits:
 
+        cam_ids = cam_ids_split[split]
+        cams_imgs = [None] * len(cam_ids)
+        cams_masks = [None] * len(cam_ids)
+        if not config["pose_only"]:
+
+            # decode the frames of all split cameras in a single parallel pass,
+            # into one (N * T, H, W, C) array sliced per camera
+            imgs_files = [
+                sorted((scene_path / "ims" / str(camera_id)).glob("*.jpg"))
+                for camera_id in cam_ids
+            ]
+            split_imgs = load_frames(
+                [img_file for cam_files in imgs_files for img_file in cam_files],
+                decode_fn=decode_fn,
+                config=config,
+                desc=f"{split} images",
+                out_path=get_memmap_file_path(config, scene_name, split, "rgbs"),
+            )
+            cams_imgs = _split_per_camera(split_imgs, imgs_files)
+
+            if config["load_masks"]:
+                masks_files = [
+                    sorted((scene_path / "seg" / str(camera_id)).glob("*.png"))
+                    for camera_id in cam_ids
+                ]
+                # test cameras might not have masks
+                if sum(len(cam_files) for cam_files in masks_files) > 0:
+                    split_masks = load_frames(
+                        [
+                            mask_file
+                            for cam_files in masks_files
+                            for mask_file in cam_files
+                        ],
+                        decode_fn=decode_fn,
+                        config=config,
+                        desc=f"{split} masks",
+                        out_path=get_memmap_file_path(
+                            config, scene_name, split, "masks"
+                        ),
+                    )
+                    cams_masks = _split_per_camera(split_masks, masks_files)
+
         cameras_splits[split] = []
-        pbar = tqdm(cam_ids_split[split], desc=f"{split} cameras", ncols=100)
+        pbar = tqdm(cam_ids, desc=f"{split} cameras", ncols=100)
         for i, camera_id in enumerate(pbar):
 
-            if not config["pose_only"]:
-
-                # get all images in camera_id folder
-                cam_path = scene_path / "ims" / str(camera_id)
-
-                # list all images in the folder
-                cam_imgs = []
-                imgs_files = sorted(list(cam_path.glob("*.jpg")))
-                # print(imgs_files)
-                for img_file in imgs_files:
-                    # load image
-                    img_pil = Image.open(img_file)
-                    img_np = image_to_numpy(img_pil, use_uint8=True)
-                    cam_imgs.append(img_np)
-                cam_imgs = np.stack(cam_imgs, axis=0)
-
-                if config["load_masks"]:
-
-                    # get all masks in camera_id folder
-                    cam_path = scene_path / "seg" / str(camera_id)
-
-                    # list all masks in the folder
-                    cam_masks = []
-                    masks_files = sorted(list(cam_path.glob("*.png")))
-                    for mask_file in masks_files:
-                        # load image
-                        img_pil = Image.open(mask_file)
-                        img_np = image_to_numpy(img_pil, use_uint8=True)[
-                            ..., np.newaxis
-                        ]
-                        cam_masks.append(img_np)
-                    # test cameras might not have masks
-                    if len(cam_masks) > 0:
-                        cam_masks = np.stack(cam_masks, axis=0)
-                    else:
-                        cam_masks = None
-                else:
-                    cam_masks = None
-
-            else:
-                cam_imgs = None
-                cam_masks = None
-
-            intrinsics = intrisics_split[split][i]
+            cam_imgs = cams_imgs[i]
+            cam_masks = cams_masks[i]
+
+            intrinsics, cam_width, cam_height = subsample_intrinsics(
+                intrisics_split[split][i], width, height, subsample_factor
+            )
             pose = c2w_split[split][i]
 
             camera = Camera(
@@ -210,9 +235,8 @@ def load(
                 masks=cam_masks,
                 timestamps=cam_timestamps,
                 camera_label=camera_id,
-                width=width,
-                height=height,
-                subsample_factor=int(config["subsample_factor"]),
+                width=cam_width,
+                height=cam_height,
                 # verbose=verbose,
             )
 
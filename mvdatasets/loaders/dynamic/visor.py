@@ -3,57 +3,200 @@ from pathlib import Path
 import os
 import numpy as np
 import json
+import hashlib
 from tqdm import tqdm
-from PIL import Image
+from functools import partial
 import cv2
-from typing import List
+from typing import List, Optional, Tuple
 from mvdatasets.geometry.primitives.point_cloud import PointCloud
-from mvdatasets.utils.loader_utils import rescale
+from mvdatasets.utils.loader_utils import rescale, subsample_intrinsics
 from mvdatasets.geometry.common import rot_euler_3d_deg
 from mvdatasets.utils.printing import print_warning, print_log
 from mvdatasets.geometry.quaternions import quats_to_rots
 from mvdatasets import Camera
+from mvdatasets.io.decoding import (
+    get_decode_pool,
+    load_frames,
+    load_image,
+)
+from mvdatasets.io.modality_storage import get_memmap_file_path, ModalityBuffer
 
+# bump when the rasterised masks or the cached frames data change
+MASKS_CACHE_VERSION = 3
 
-def _generate_mask_from_polygons(
+# fractional bits of the polygons vertices rasterised at a reduced resolution
+FILL_POLY_SHIFT = 4
+
+
+def _rasterize_masks(
     annotations: List[dict],
     width: int,
     height: int,
-):
-    img = np.zeros((height, width, 1), dtype=np.uint8)
-    for annotation in annotations:
-        segments = annotation["segments"]
-        polygons = []
-        polygons.append(segments)
-        ps = []
-        for polygon in polygons:
-            for poly in polygon:
-                if poly == []:
-                    poly = [[0.0, 0.0]]
-                ps.append(np.array(poly, dtype=np.int32))
-        cv2.fillPoly(img, ps, 255)
-    return img
+    out_width: Optional[int] = None,
+    out_height: Optional[int] = None,
+) -> np.ndarray:
+    """rasterises the annotations polygons of a frame in a single pass
 
+    Each annotation is filled once with its (1-based) index, binary and semantic
+    masks are then looked up from the index image, later annotations are drawn
+    over earlier ones (as when filling each mask separately). Polygons are
+    rasterised directly at the output resolution (no resampling of the class ids).
 
-def _generate_semantic_mask_from_polygons(
-    annotations: List[dict],
+    Args:
+        annotations (list): frame annotations (with "segments" and "class_id")
+        width (int): annotations image width
+        height (int): annotations image height
+        out_width (int, optional): output width, if None, width.
+        out_height (int, optional): output height, if None, height.
+
+    Returns:
+        np.ndarray: (H, W, 2) uint8 binary mask (0 or 255) and semantic mask (class ids)
+    """
+    if out_width is None or out_height is None:
+        out_width, out_height = width, height
+    # annotations pixel centers to output pixels, in fixed point
+    scale = np.array([out_width / width, out_height / height])
+    shift = 0 if (out_width, out_height) == (width, height) else FILL_POLY_SHIFT
+
+    idxs_img = np.zeros((out_height, out_width), dtype=np.uint16)
+    for i, annotation in enumerate(annotations):
+        ps = []
+        for poly in annotation["segments"]:
+            if poly == []:
+                poly = [[0.0, 0.0]]
+            poly = np.array(poly, dtype=np.int32)
+            if shift > 0:
+                poly = np.round(((poly + 0.5) * scale - 0.5) * (1 << shift))
+                poly = poly.astype(np.int32)
+            ps.append(poly)
+        cv2.fillPoly(idxs_img, ps, i + 1, shift=shift)
+
+    # index 0 is the background
+    masks_lut = np.full((len(annotations) + 1, 2), 255, dtype=np.uint8)
+    masks_lut[0] = 0
+    # (class ids are saturated to uint8, as when filling a uint8 mask)
+    class_ids = [annotation["class_id"] for annotation in annotations]
+    masks_lut[1:, 1] = np.clip(class_ids, 0, 255)
+    return masks_lut[idxs_img]  # (H, W, 2)
+
+
+def _rasterize_frames_masks(
+    frames_annotations: List[List[dict]],
     width: int,
     height: int,
-):
-    img = np.zeros((height, width, 1), dtype=np.uint8)
-    for annotation in annotations:
-        class_id = annotation["class_id"]
-        segments = annotation["segments"]
-        polygons = []
-        polygons.append(segments)
-        ps = []
-        for polygon in polygons:
-            for poly in polygon:
-                if poly == []:
-                    poly = [[0.0, 0.0]]
-                ps.append(np.array(poly, dtype=np.int32))
-        cv2.fillPoly(img, ps, class_id)
-    return img
+    out_width: int,
+    out_height: int,
+    nr_workers: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """rasterises the masks of all frames in parallel (see _rasterize_masks),
+    binary and semantic masks are written to separate contiguous buffers
+
+    Returns:
+        np.ndarray: (N, H, W, 1) uint8 binary masks (0 or 255)
+        np.ndarray: (N, H, W, 1) uint8 semantic masks (class ids)
+    """
+    frame_shape = (out_height, out_width, 1)
+    nr_frames = len(frames_annotations)
+    masks = ModalityBuffer(nr_frames, frame_shape=frame_shape, dtype=np.uint8)
+    semantic_masks = ModalityBuffer(nr_frames, frame_shape=frame_shape, dtype=np.uint8)
+
+    def _rasterize_into(i: int) -> None:
+        frame_masks = _rasterize_masks(
+            frames_annotations[i], width, height, out_width, out_height
+        )
+        masks[i] = frame_masks[..., :1]
+        semantic_masks[i] = frame_masks[..., 1:]
+
+    pool = get_decode_pool(nr_workers)
+    # consume results to wait for all frames (and raise errors)
+    list(
+        tqdm(
+            pool.map(_rasterize_into, range(nr_frames)),
+            total=nr_frames,
+            desc="masks",
+            ncols=100,
+        )
+    )
+    return masks.finalize(), semantic_masks.finalize()
+
+
+def _get_masks_cache_file_path(
+    config: dict, scene_name: str, split: str, width: int, height: int
+) -> Optional[Path]:
+    """returns the rasterised masks cache file, None if caching is disabled"""
+    if config["masks_cache_path"] is None:
+        return None
+    file_name = f"{scene_name}_{split}_{width}x{height}.npz"
+    return Path(config["masks_cache_path"]) / file_name
+
+
+def _get_sources_fingerprint(files_paths: List[Path]) -> str:
+    """returns a fingerprint of the given files (paths, mtimes and sizes)"""
+    hasher = hashlib.sha1(f"{MASKS_CACHE_VERSION}\n".encode())
+    for file_path in files_paths:
+        stat = os.stat(file_path)
+        hasher.update(f"{file_path}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+    return hasher.hexdigest()
+
+
+def _save_masks_cache(
+    file_path: Path,
+    fingerprint: str,
+    dataset_path: Path,
+    c2w_mats: np.ndarray,
+    frames_idxs: np.ndarray,
+    images_paths: List[str],
+    mapped_images_names: List[str],
+    masks: np.ndarray,
+    semantic_masks: np.ndarray,
+) -> None:
+    """writes frames data and rasterised masks to a compressed .npz file"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    images_paths = [os.path.relpath(path, dataset_path) for path in images_paths]
+    # write to a temporary file first, so that a partial file is never read
+    tmp_file_path = file_path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp_file_path,
+        fingerprint=np.array(fingerprint),
+        c2w_mats=c2w_mats,
+        frames_idxs=frames_idxs,
+        images_paths=np.array(images_paths),
+        mapped_images_names=np.array(mapped_images_names),
+        masks=masks,
+        semantic_masks=semantic_masks,
+    )
+    os.replace(tmp_file_path, file_path)
+    print_log(f"saved masks cache {file_path}")
+
+
+def _load_masks_cache(
+    file_path: Path, fingerprint: str, dataset_path: Path
+) -> Optional[tuple]:
+    """reads a masks cache written by _save_masks_cache
+
+    Returns:
+        tuple: c2w_mats, frames_idxs, images_paths, mapped_images_names,
+            (N, H, W, 1) masks and semantic masks, None if missing or stale
+    """
+    if not file_path.exists():
+        return None
+    with np.load(file_path) as cache:
+        if str(cache["fingerprint"]) != fingerprint:
+            print_warning(f"masks cache {file_path} is stale, rebuilding it")
+            return None
+        images_paths = [
+            os.path.join(dataset_path, path) for path in cache["images_paths"]
+        ]
+        res = (
+            cache["c2w_mats"],
+            cache["frames_idxs"],
+            images_paths,
+            [str(name) for name in cache["mapped_images_names"]],
+            cache["masks"],
+            cache["semantic_masks"],
+        )
+    print_log(f"loaded masks cache {file_path}")
+    return res
 
 
 def _extract_data(
@@ -225,13 +368,6 @@ def load(
 
     # -------------------------------------------------------------------------
 
-    # load frame mapping
-    # mapping of VISOR sparse frames to the originally released rgb_frames in EPIC-KITCHENS
-    frame_mapping_path = dataset_path / "frame_mapping.json"
-    with open(frame_mapping_path, "r") as fp:
-        frame_mapping = json.load(fp)[scene_name]
-    print_log(f"loaded frame mapping {frame_mapping_path}")
-
     # read JSON_DATA cameras
     cameras_path = dataset_path / "JSON_DATA"
     assert cameras_path.exists(), f"cameras_path path does not exist: {cameras_path}"
@@ -300,19 +436,79 @@ def load(
 
     # TODO: load validation split
 
-    res = _extract_data(
-        scene_name,
-        annotations_path,
-        frame_mapping,
-        posed_images,
-        sparse_annotations_path,
-        split,
+    # images and masks are decoded at the subsampled resolution
+    subsample_factor = int(config["subsample_factor"])
+    K, cam_width, cam_height = subsample_intrinsics(
+        K, target_width, target_height, subsample_factor
+    )
+
+    # mapping of VISOR sparse frames to the originally released rgb_frames in EPIC-KITCHENS
+    frame_mapping_path = dataset_path / "frame_mapping.json"
+    annotation_json_path = annotations_path / split / f"{scene_name}.json"
+
+    # (optional) load frames data and rasterised masks from cache,
+    # skipping annotations parsing and rasterisation
+    load_masks = not config["pose_only"] and (
+        config["load_masks"] or config["load_semantic_masks"]
     )
-    c2w_mats = res[0]
-    frames_idxs = res[1]
-    images_paths = res[2]
-    mapped_images_names = res[3]
-    images_segments_dict = res[4]
+    masks_all = None
+    semantic_masks_all = None
+    cache_file_path = _get_masks_cache_file_path(
+        config, scene_name, split, cam_width, cam_height
+    )
+    res = None
+    if cache_file_path is not None:
+        fingerprint = _get_sources_fingerprint(
+            [frame_mapping_path, cameras_json_path, annotation_json_path]
+        )
+        res = _load_masks_cache(cache_file_path, fingerprint, dataset_path)
+
+    if res is not None:
+        c2w_mats, frames_idxs, images_paths, mapped_images_names = res[:4]
+        if load_masks:
+            masks_all, semantic_masks_all = res[4:]
+    else:
+        # load frame mapping
+        with open(frame_mapping_path, "r") as fp:
+            frame_mapping = json.load(fp)[scene_name]
+        print_log(f"loaded frame mapping {frame_mapping_path}")
+
+        res = _extract_data(
+            scene_name,
+            annotations_path,
+            frame_mapping,
+            posed_images,
+            sparse_annotations_path,
+            split,
+        )
+        c2w_mats = res[0]
+        frames_idxs = res[1]
+        images_paths = res[2]
+        mapped_images_names = res[3]
+        images_segments_dict = res[4]
+
+        if load_masks:
+            # rasterise binary and semantic masks of all frames in parallel
+            masks_all, semantic_masks_all = _rasterize_frames_masks(
+                [images_segments_dict[name] for name in mapped_images_names],
+                width=target_width,
+                height=target_height,
+                out_width=cam_width,
+                out_height=cam_height,
+                nr_workers=config["nr_workers"],
+            )  # (N, H, W, 1), (N, H, W, 1)
+            if cache_file_path is not None:
+                _save_masks_cache(
+                    cache_file_path,
+                    fingerprint,
+                    dataset_path,
+                    c2w_mats,
+                    frames_idxs,
+                    images_paths,
+                    mapped_images_names,
+                    masks_all,
+                    semantic_masks_all,
+                )
 
     # rescale (optional)
     scene_radius_mult, min_camera_distance, max_camera_distance = rescale(
@@ -361,11 +557,25 @@ def load(
     # point_cloud *= scene_radius_mult
     # point_cloud.transform(scene_transform)
 
+    # load images in parallel
+    if not config["pose_only"]:
+        imgs = load_frames(
+            images_paths,
+            decode_fn=partial(
+                load_image, channels="RGB", subsample_factor=subsample_factor
+            ),
+            config=config,
+            desc="images",
+            out_path=get_memmap_file_path(config, scene_name, "rgbs"),
+        )
+    else:
+        imgs = None
+
     # build cameras
     cameras_all = []
     pbar = tqdm(
         zip(c2w_mats, images_paths, frames_idxs, mapped_images_names),
-        desc="images",
+        desc="cameras",
         ncols=100,
     )
     for idx, camera_meta in enumerate(pbar):
@@ -375,40 +585,26 @@ def load(
         c2w_mat = camera_meta[0]
         # c2w_mat[:3, 3] *= scene_radius_mult
         # c2w_mat = scene_transform @ c2w_mat
-        # img path
-        img_path = camera_meta[1]
         # frame_index / frame_rate = time
         frame_idx = camera_meta[2]
         time = frame_idx / config["frame_rate"]
         cam_timestamp = np.array([time])
 
-        # load img
-        if config["pose_only"]:
-            cam_imgs = None
+        # get img
+        if imgs is not None:
+            cam_imgs = imgs[idx : idx + 1]  # (1, H, W, 3)
         else:
-            img_pil = Image.open(img_path)
-            img_np = np.array(img_pil)[..., :3]
-            cam_imgs = img_np[None, ...]  # (1, H, W, 3)
-
-        # get annotations
-        mapped_image_name = camera_meta[3]
-        annotations = images_segments_dict[mapped_image_name]
+            cam_imgs = None
 
         # get mask
-        if not config["pose_only"] and config["load_masks"]:
-            mask_np = _generate_mask_from_polygons(
-                annotations=annotations, width=target_width, height=target_height
-            )  # (H, W, 1)
-            cam_masks = mask_np[None, ...]  # (1, H, W, 1)
+        if masks_all is not None and config["load_masks"]:
+            cam_masks = masks_all[idx : idx + 1]  # (1, H, W, 1)
         else:
             cam_masks = None
 
         # get semantic mask
-        if not config["pose_only"] and config["load_semantic_masks"]:
-            semantic_mask_np = _generate_semantic_mask_from_polygons(
-                annotations=annotations, width=target_width, height=target_height
-            )  # (H, W, 1)
-            cam_semantic_masks = semantic_mask_np[None, ...]  # (1, H, W, 1)
+        if semantic_masks_all is not None and config["load_semantic_masks"]:
+            cam_semantic_masks = semantic_masks_all[idx : idx + 1]  # (1, H, W, 1)
         else:
             cam_semantic_masks = None
 
@@ -423,9 +619,8 @@ def load(
             semantic_masks=cam_semantic_masks,
             timestamps=cam_timestamp,
             camera_label=frame_idx,
-            height=target_height,
-            width=target_width,
-            subsample_factor=int(config["subsample_factor"]),
+            height=cam_height,
+            width=cam_width,
             # verbose=verbose,
         )
 
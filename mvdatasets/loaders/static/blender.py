@@ -4,12 +4,13 @@ import os
 import json
 import numpy as np
 from PIL import Image
-from tqdm import tqdm
 from mvdatasets import Camera
-from mvdatasets.utils.images import image_to_numpy
-from mvdatasets.utils.loader_utils import rescale
+from functools import partial
+from mvdatasets.io.decoding import decode_rgba_images
+from mvdatasets.io.modality_storage import get_memmap_file_path, LazyFrames
+from mvdatasets.utils.loader_utils import rescale, subsample_intrinsics
 from mvdatasets.geometry.common import rot_euler_3d_deg
-from mvdatasets.utils.images import image_uint8_to_float32, image_float32_to_uint8
+from mvdatasets.utils.images import load_rgb_from_rgba, load_mask_from_rgba
 from mvdatasets.utils.printing import print_error, print_warning, print_success
 
 
@@ -118,75 +119,68 @@ def load(
             test_skip = config["test_skip"]
             frames_list = frames_list[::test_skip]
 
-        # iterate over images and load them
-        pbar = tqdm(frames_list, desc=split, ncols=100)
-        for frame in pbar:
+        imgs_paths = [
+            os.path.join(scene_path, f"{split}", frame[0]) for frame in frames_list
+        ]
+
+        # only read first image header to get image size
+        if height is None or width is None:
+            with Image.open(imgs_paths[0]) as img_pil:
+                width, height = img_pil.size
+
+        # images are decoded at the subsampled resolution
+        subsample_factor = int(config["subsample_factor"])
+
+        if config["pose_only"]:
+            rgbs = None
+            masks = None
+        elif config["lazy_loading"]:
+            # decode images on first access
+            rgbs = LazyFrames(
+                imgs_paths,
+                decode_fn=partial(
+                    load_rgb_from_rgba,
+                    white_bg=config["white_bg"],
+                    subsample_factor=subsample_factor,
+                ),
+            )
+            if config["load_masks"]:
+                masks = LazyFrames(
+                    imgs_paths,
+                    decode_fn=partial(
+                        load_mask_from_rgba,
+                        use_binary_mask=config["use_binary_mask"],
+                        subsample_factor=subsample_factor,
+                    ),
+                )
+            else:
+                masks = None
+        else:
+            # decode all split images in parallel,
+            # RGB images and masks are written to separate buffers
+            rgbs, masks = decode_rgba_images(
+                imgs_paths,
+                white_bg=config["white_bg"],
+                use_binary_mask=config["use_binary_mask"],
+                load_masks=config["load_masks"],
+                subsample_factor=subsample_factor,
+                nr_workers=config["nr_workers"],
+                desc=split,
+                rgbs_out_path=get_memmap_file_path(config, scene_name, split, "rgbs"),
+                masks_out_path=get_memmap_file_path(config, scene_name, split, "masks"),
+                shared=config["shared_memory"],
+            )
 
-            # get image name
-            im_name = frame[0]
-            # camera_pose = frame[1]
+        for i, frame in enumerate(frames_list):
 
             # get frame idx and pose
             idx = int(frame[0].split(".")[0].split("_")[-1])
 
-            if config["pose_only"]:
-
-                # do not load images
-                cam_imgs = None
-                cam_masks = None
+            # get images
+            cam_imgs = rgbs[i : i + 1] if rgbs is not None else None
 
-                # only read first image to get image size
-                if height is None or width is None:
-                    img_pil = Image.open(os.path.join(scene_path, f"{split}", im_name))
-                    width, height = img_pil.size
-
-            else:
-
-                # load PIL image
-                img_pil = Image.open(os.path.join(scene_path, f"{split}", im_name))
-                img_np = image_to_numpy(img_pil, use_uint8=True)
-
-                # override H, W
-                if height is None or width is None:
-                    height, width = img_np.shape[:2]
-
-                if config["load_masks"]:
-                    # use alpha channel as mask
-                    # (nb: this is only resonable for synthetic data)
-                    mask_np = img_np[..., -1, None]
-                    if config["use_binary_mask"]:
-                        mask_np = mask_np > 0
-                        mask_np = mask_np.astype(np.uint8) * 255
-                else:
-                    mask_np = None
-
-                # apply white background, else black
-                if config["white_bg"]:
-                    if img_np.dtype == np.uint8:
-                        # values in [0, 255], cast to [0, 1], run operation, cast back
-                        img_np = image_uint8_to_float32(img_np)
-                        img_np = img_np[..., :3] * img_np[..., -1:] + (
-                            1 - img_np[..., -1:]
-                        )
-                        img_np = image_float32_to_uint8(img_np)
-                    else:
-                        # values in [0, 1]
-                        img_np = img_np[..., :3] * img_np[..., -1:] + (
-                            1 - img_np[..., -1:]
-                        )
-                else:
-                    img_np = img_np[..., :3]
-
-                # get images
-                cam_imgs = img_np[None, ...]
-                # print(cam_imgs.shape)
-
-                # get mask (optional)
-                if config["load_masks"]:
-                    cam_masks = mask_np[None, ...]
-                    # print(cam_masks.shape)
-                else:
-                    cam_masks = None
+            # get mask (optional)
+            cam_masks = masks[i : i + 1] if masks is not None else None
 
             pose = np.array(frame[1], dtype=np.float32)
             intrinsics = np.eye(3, dtype=np.float32)
@@ -195,6 +189,9 @@ def load(
             intrinsics[1, 1] = focal_length
             intrinsics[0, 2] = width / 2.0
             intrinsics[1, 2] = height / 2.0
+            intrinsics, cam_width, cam_height = subsample_intrinsics(
+                intrinsics, width, height, subsample_factor
+            )
 
             camera = Camera(
                 intrinsics=intrinsics,
@@ -204,9 +201,8 @@ def load(
                 rgbs=cam_imgs,
                 masks=cam_masks,
                 camera_label=str(idx),
-                width=width,
-                height=height,
-                subsample_factor=int(config["subsample_factor"]),
+                width=cam_width,
+                height=cam_height,
                 # verbose=verbose,
             )
 
@@ -2,12 +2,14 @@ from rich import print
 from pathlib import Path
 import os
 import numpy as np
-from pycolmap import SceneManager
-from tqdm import tqdm
 from PIL import Image
 from copy import deepcopy
+from functools import partial
 
 from mvdatasets import Camera
+from mvdatasets.io.decoding import load_frames, load_image
+from mvdatasets.io.modality_storage import get_memmap_file_path
+from mvdatasets.io.colmap_model import read_model, get_w2c_mats, get_camera_params
 from mvdatasets.geometry.primitives.point_cloud import PointCloud
 from mvdatasets.utils.loader_utils import rescale
 from mvdatasets.geometry.common import rot_euler_3d_deg
@@ -91,93 +93,44 @@ def load(
     if not os.path.exists(colmap_dir):
         raise ValueError(f"COLMAP directory {colmap_dir} does not exist.")
 
-    manager = SceneManager(colmap_dir, image_path=images_path)
-    manager.load_cameras()
-    manager.load_images()
-    manager.load_points3D()
+    cameras, images, points = read_model(colmap_dir, load_points=True)
     # get points
-    points_3d = manager.points3D.astype(np.float32)
-    points_rgb = manager.point3D_colors
+    points_3d = points["xyz"].astype(np.float32)
     # get points colors
-    if points_rgb is not None:
-        points_rgb = points_rgb.astype(np.uint8)
+    points_rgb = points["rgb"].astype(np.uint8)
     point_cloud = PointCloud(points_3d, points_rgb)
 
     # Extract extrinsic matrices in world-to-camera format.
-    imdata = manager.images
-    w2c_mats = []
-    camera_ids = []
+    w2c_mats = get_w2c_mats(images).astype(np.float32)  # (N, 4, 4)
+    camera_ids = images["camera_ids"].tolist()
+
+    # support different camera intrinsics
     Ks_dict = dict()
     params_dict = dict()
     imsize_dict = dict()  # width, height
-    bottom = np.array([0, 0, 0, 1]).reshape(1, 4)
-
-    pbar = tqdm(imdata, desc="metadata", ncols=100)
-    for i, k in enumerate(pbar):
-        #
-        im = imdata[k]
-        rot = im.R()
-        trans = im.tvec.reshape(3, 1)
-        w2c = np.concatenate(
-            [np.concatenate([rot, trans], 1), bottom], axis=0, dtype=np.float32
-        )
-        w2c_mats.append(w2c)
-
-        # support different camera intrinsics
-        camera_id = im.camera_id
-        camera_ids.append(camera_id)
-
-        # camera intrinsics
-        cam = manager.cameras[camera_id]
-        fx, fy, cx, cy = cam.fx, cam.fy, cam.cx, cam.cy
-        K = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]], dtype=np.float32)
-
-        Ks_dict[camera_id] = K
-
-        # Get distortion parameters.
-        type_ = cam.camera_type
-        if type_ == 0 or type_ == "SIMPLE_PINHOLE":
-            params = np.empty(0, dtype=np.float32)
-            camtype = "perspective"
-        elif type_ == 1 or type_ == "PINHOLE":
-            params = np.empty(0, dtype=np.float32)
-            camtype = "perspective"
-        if type_ == 2 or type_ == "SIMPLE_RADIAL":
-            params = np.array([cam.k1, 0.0, 0.0, 0.0], dtype=np.float32)
-            camtype = "perspective"
-        elif type_ == 3 or type_ == "RADIAL":
-            params = np.array([cam.k1, cam.k2, 0.0, 0.0], dtype=np.float32)
-            camtype = "perspective"
-        elif type_ == 4 or type_ == "OPENCV":
-            params = np.array([cam.k1, cam.k2, cam.p1, cam.p2], dtype=np.float32)
-            camtype = "perspective"
-        elif type_ == 5 or type_ == "OPENCV_FISHEYE":
-            params = np.array([cam.k1, cam.k2, cam.k3, cam.k4], dtype=np.float32)
-            camtype = "fisheye"
-        assert (
-            camtype == "perspective" or camtype == "fisheye"
-        ), f"Only perspective and fisheye cameras are supported, got {type_}"
-
-        params_dict[camera_id] = params
+    for camera_id in set(camera_ids):
+        cam = cameras[camera_id]
+        # camera intrinsics and distortion parameters
+        Ks_dict[camera_id], params_dict[camera_id], _ = get_camera_params(cam)
         imsize_dict[camera_id] = (
-            cam.width,  # subsample_factor,
-            cam.height,  # subsample_factor
+            cam["width"],  # subsample_factor,
+            cam["height"],  # subsample_factor
         )
 
-    print(f"[COLMAP] {len(imdata)} images, taken by {len(set(camera_ids))} cameras.")
+    print(
+        f"[COLMAP] {len(images['names'])} images, taken by {len(set(camera_ids))} cameras."
+    )
 
-    if len(imdata) == 0:
+    if len(images["names"]) == 0:
         raise ValueError("No images found in COLMAP.")
-    if not (type_ == 0 or type_ == 1):
+    if any(len(params) > 0 for params in params_dict.values()):
         print_warning("COLMAP Camera is not PINHOLE. Images have distortion.")
 
-    w2c_mats = np.stack(w2c_mats, axis=0)
-
     # Convert extrinsics to camera-to-world.
     c2w_mats = np.linalg.inv(w2c_mats)
 
     # Image names from COLMAP
-    imgs_names = [imdata[k].name for k in imdata]
+    imgs_names = images["names"]
 
     # Previous Nerf results were generated with images sorted by filename,
     # ensure metrics are reported on the same test set.
@@ -242,10 +195,21 @@ def load(
     img_pil = Image.open(img_path)
     actual_width, actual_height = img_pil.size
 
+    # load images in parallel
+    if not config["pose_only"]:
+        imgs = load_frames(
+            [os.path.join(images_path, img_name) for img_name in imgs_names],
+            decode_fn=partial(load_image, channels="RGB"),
+            config=config,
+            desc="images",
+            out_path=get_memmap_file_path(config, scene_name, "rgbs"),
+        )
+    else:
+        imgs = None
+
     # build cameras
     cameras_all = []
-    pbar = tqdm(zip(c2w_mats, camera_ids, imgs_names), desc="images", ncols=100)
-    for idx, camera_meta in enumerate(pbar):
+    for idx, camera_meta in enumerate(zip(c2w_mats, camera_ids, imgs_names)):
 
         # unpack
         camera_id = camera_meta[1]
@@ -255,12 +219,8 @@ def load(
         colmap_width, colmap_height = imsize_dict[camera_id]
 
         # load img
-        if not config["pose_only"]:
-            img_path = os.path.join(images_path, img_name)
-            img_pil = Image.open(img_path)
-            img_np = np.array(img_pil)[..., :3]
-            # actual_height, actual_width = img_np.shape[:2]
-            cam_imgs = img_np[None, ...]  # (1, H, W, 3)
+        if imgs is not None:
+            cam_imgs = imgs[idx : idx + 1]  # (1, H, W, 3)
         else:
             cam_imgs = None
 
@@ -4,10 +4,11 @@ import os
 import json
 import numpy as np
 from PIL import Image
-from tqdm import tqdm
+from functools import partial
 from mvdatasets import Camera
-from mvdatasets.utils.images import image_to_numpy
-from mvdatasets.utils.loader_utils import rescale
+from mvdatasets.io.decoding import load_frames, load_image
+from mvdatasets.io.modality_storage import get_memmap_file_path
+from mvdatasets.utils.loader_utils import rescale, subsample_intrinsics
 from mvdatasets.geometry.common import rot_euler_3d_deg
 from mvdatasets.utils.printing import print_error, print_warning, print_success
 
@@ -117,31 +118,40 @@ def load(
         if height is None or width is None:
             frame = frames_list[0]
             im_name = frame[0]
-            # load PIL image
-            img_pil = Image.open(os.path.join(scene_path, f"{split}", "rgbs", im_name))
-            img_np = image_to_numpy(img_pil, use_uint8=True)
-            height, width = img_np.shape[:2]
-
-        # iterate over images and load them
-        pbar = tqdm(frames_list, desc=split, ncols=100)
-        for frame in pbar:
-            # get image name
-            im_name = frame[0]
-            # camera_pose = frame[1]
+            # only read image header
+            with Image.open(
+                os.path.join(scene_path, f"{split}", "rgbs", im_name)
+            ) as img_pil:
+                width, height = img_pil.size
+
+        # images are decoded at the subsampled resolution
+        subsample_factor = int(config["subsample_factor"])
+
+        if config["pose_only"]:
+            imgs = None
+        else:
+            # decode all split images in parallel
+            imgs = load_frames(
+                [
+                    os.path.join(scene_path, f"{split}", "rgbs", frame[0])
+                    for frame in frames_list
+                ],
+                # remove alpha (it is always 1)
+                decode_fn=partial(
+                    load_image, channels="RGB", subsample_factor=subsample_factor
+                ),
+                config=config,
+                desc=split,
+                out_path=get_memmap_file_path(config, scene_name, split, "rgbs"),
+            )
 
-            if config["pose_only"]:
-                cam_imgs = None
+        for i, frame in enumerate(frames_list):
+
+            # get images
+            if imgs is not None:
+                cam_imgs = imgs[i : i + 1]
             else:
-                # load PIL image
-                img_pil = Image.open(
-                    os.path.join(scene_path, f"{split}", "rgbs", im_name)
-                )
-                img_np = image_to_numpy(img_pil, use_uint8=True)
-                # remove alpha (it is always 1)
-                img_np = img_np[:, :, :3]
-                # get images
-                cam_imgs = img_np[None, ...]
-                # depth_imgs = depth_np[None, ...]
+                cam_imgs = None
 
             # im_name = im_name.replace('r', 'd')
             # depth_pil = Image.open(os.path.join(scene_path, f"{split}", "depth", im_name))
@@ -157,6 +167,9 @@ def load(
             intrinsics[1, 1] = focal_length
             intrinsics[0, 2] = width / 2.0
             intrinsics[1, 2] = height / 2.0
+            intrinsics, cam_width, cam_height = subsample_intrinsics(
+                intrinsics, width, height, subsample_factor
+            )
 
             camera = Camera(
                 intrinsics=intrinsics,
@@ -167,9 +180,8 @@ def load(
                 # depths=depth_imgs,
                 masks=None,  # dataset has no masks
                 camera_label=str(idx),
-                width=width,
-                height=height,
-                subsample_factor=int(config["subsample_factor"]),
+                width=cam_width,
+                height=cam_height,
                 # verbose=verbose,
             )
 
@@ -3,12 +3,13 @@ from pathlib import Path
 import os
 from glob import glob
 import numpy as np
-from PIL import Image
-from tqdm import tqdm
 import cv2 as cv
-from mvdatasets.utils.images import image_to_numpy
+from PIL import Image
+from functools import partial
+from mvdatasets.io.decoding import load_frames, load_image
+from mvdatasets.io.modality_storage import get_memmap_file_path
 from mvdatasets import Camera
-from mvdatasets.utils.loader_utils import rescale
+from mvdatasets.utils.loader_utils import rescale, subsample_intrinsics
 from mvdatasets.geometry.common import rot_euler_3d_deg
 
 
@@ -36,6 +37,11 @@ def load_K_Rt_from_P(filename, P=None):
     return intrinsics, pose
 
 
+def _load_mask(mask_path: str, subsample_factor: int = 1) -> np.ndarray:
+    # keep only the first channel
+    return load_image(mask_path, subsample_factor=subsample_factor)[..., :1]
+
+
 def load(
     dataset_path: Path,
     scene_name: str,
@@ -81,30 +87,39 @@ def load(
 
     # -------------------------------------------------------------------------
 
+    images_list = sorted(glob(os.path.join(scene_path, "image/*.png")))
+
+    # only read first image header to get image size
+    with Image.open(images_list[0]) as img_pil:
+        width, height = img_pil.size
+
+    # images are decoded at the subsampled resolution
+    subsample_factor = int(config["subsample_factor"])
+
     # load images to cpu as numpy arrays
-    imgs = []
-    masks = []
+    imgs = None
+    masks = None
 
     if not config["pose_only"]:
 
-        images_list = sorted(glob(os.path.join(scene_path, "image/*.png")))
-        pbar = tqdm(images_list, desc="images", ncols=100)
-        for im_name in pbar:
-            # load PIL image
-            img_pil = Image.open(im_name)
-            img_np = image_to_numpy(img_pil, use_uint8=True)
-            imgs.append(img_np)
+        imgs = load_frames(
+            images_list,
+            decode_fn=partial(load_image, subsample_factor=subsample_factor),
+            config=config,
+            desc="images",
+            out_path=get_memmap_file_path(config, scene_name, "rgbs"),
+        )
 
         # (optional) load mask images to cpu as numpy arrays
         if config["load_masks"]:
             masks_list = sorted(glob(os.path.join(scene_path, "mask/*.png")))
-            pbar = tqdm(masks_list, desc="masks", ncols=100)
-            for im_name in pbar:
-                # load PIL image
-                mask_pil = Image.open(im_name)
-                mask_np = image_to_numpy(mask_pil, use_uint8=True)
-                mask_np = mask_np[:, :, 0, None]
-                masks.append(mask_np)
+            masks = load_frames(
+                masks_list,
+                decode_fn=partial(_load_mask, subsample_factor=subsample_factor),
+                config=config,
+                desc="masks",
+                out_path=get_memmap_file_path(config, scene_name, "masks"),
+            )
 
     # load camera params
     camera_dict = np.load(os.path.join(scene_path, "cameras_sphere.npz"))
@@ -152,16 +167,19 @@ def load(
     for idx, params in enumerate(zip(intrinsics_all, poses_all)):
 
         intrinsics, pose = params
+        intrinsics, cam_width, cam_height = subsample_intrinsics(
+            intrinsics, width, height, subsample_factor
+        )
 
         # get images
-        if len(imgs) > idx:
-            cam_imgs = imgs[idx][None, ...]
+        if imgs is not None:
+            cam_imgs = imgs[idx : idx + 1]
         else:
             cam_imgs = None
 
         # get mask (optional)
-        if len(masks) > idx:
-            cam_masks = masks[idx][None, ...]
+        if masks is not None:
+            cam_masks = masks[idx : idx + 1]
         else:
             cam_masks = None
 
@@ -173,7 +191,8 @@ def load(
             rgbs=cam_imgs,
             masks=cam_masks,
             camera_label=str(idx),
-            subsample_factor=int(config["subsample_factor"]),
+            width=cam_width,
+            height=cam_height,
             # verbose=verbose,
         )
 
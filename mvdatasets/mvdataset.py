@@ -1,12 +1,14 @@
 from rich import print
-from typing import List
+from typing import List, Optional
 import numpy as np
 from pathlib import Path
 from mvdatasets.utils.point_clouds import load_point_clouds
+from mvdatasets.io.scene_cache import load_scene_cache, save_scene_cache
+from mvdatasets.io.modality_storage import get_frames_cache
+from mvdatasets.utils.memory import gb_to_bytes
 from mvdatasets.utils.printing import print_error, print_warning, print_info
 from mvdatasets import Camera
 
-
 DATASET_LOADER_MAPPING = {
     "nerf_synthetic": "blender",
     "nerf_furry": "blender",
@@ -32,6 +34,113 @@ DATASET_LOADER_MAPPING = {
 }
 
 
+def run_loader(
+    loader: str,
+    dataset_path: Path,
+    scene_name: str,
+    config: dict,
+    verbose: bool = False,
+) -> Optional[dict]:
+    """runs a dataset loader
+
+    Args:
+        loader (str): loader name (see DATASET_LOADER_MAPPING)
+        dataset_path (Path): dataset folder
+        scene_name (str): scene name
+        config (dict): dataset configuration
+        verbose (bool, optional): print info. Defaults to False.
+
+    Returns:
+        dict: loader output
+    """
+
+    # STATIC SCENE DATASETS -----------------------------------------------
+
+    # dtu loader
+    if loader == "dtu":
+        from mvdatasets.loaders.static.dtu import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # blender loader
+    elif loader == "blender":
+        from mvdatasets.loaders.static.blender import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # ingp loader (deprecated)
+    # elif loader == "ingp":
+    #     res = load_ingp(dataset_path, scene_name, splits, config, verbose=verbose)
+
+    # dmsr loader
+    elif loader == "dmsr":
+        from mvdatasets.loaders.static.dmsr import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # colmap loader
+    elif loader == "colmap":
+        from mvdatasets.loaders.static.colmap import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # DYNAMIC SCENE DATASETS ----------------------------------------------
+
+    # d-nerf loader
+    elif loader == "d-nerf":
+        from mvdatasets.loaders.dynamic.d_nerf import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # visor loader
+    elif loader == "visor":
+        from mvdatasets.loaders.dynamic.visor import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # neu3d loader
+    elif loader == "neu3d":
+        from mvdatasets.loaders.dynamic.neu3d import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # panoptic-sports loader
+    elif loader == "panoptic-sports":
+        from mvdatasets.loaders.dynamic.panoptic_sports import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # nerfies loader
+    elif loader == "nerfies":
+        from mvdatasets.loaders.dynamic.nerfies import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # iphone loader
+    elif loader == "iphone":
+        from mvdatasets.loaders.dynamic.iphone import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # monst3r loader
+    elif loader == "monst3r":
+        from mvdatasets.loaders.dynamic.monst3r import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    # flow3d loader
+    elif loader == "flow3d":
+        from mvdatasets.loaders.dynamic.flow3d import load
+
+        res = load(dataset_path, scene_name, config, verbose=verbose)
+
+    else:
+
+        raise ValueError(f"Loader {loader} is not supported")
+
+    return res
+
+
 class MVDataset:
     """Any dataset container.
     All data is stored in CPU memory.
@@ -44,6 +153,7 @@ class MVDataset:
         datasets_path: Path,
         config: dict,
         point_clouds_paths: list = [],
+        cache_path: Optional[Path] = None,
         verbose: bool = False,
     ):
         self.dataset_name = dataset_name
@@ -69,96 +179,50 @@ class MVDataset:
         self.nr_per_camera_frames = 0
         self.nr_sequence_frames = 0
         self.point_clouds = []
+        self.tracks_2d = None
+        self.tracks_2d_query_frames = None
         self.fps = 0.0
         self.data = {}
 
-        # STATIC SCENE DATASETS -----------------------------------------------
-
         loader = DATASET_LOADER_MAPPING.get(dataset_name, None)
+        if loader is None:
+            raise ValueError(f"Dataset {dataset_name} is not supported")
 
-        # dtu loader
-        if loader == "dtu":
-            from mvdatasets.loaders.static.dtu import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
+        # lazy modalities share a bounded cache of decoded frames
+        if config["lazy_loading"]:
+            get_frames_cache().set_max_bytes(gb_to_bytes(config["lazy_cache_gb"]))
+
+        # (optional) load preprocessed scene from cache
+        res = None
+        if cache_path is not None:
+            res = load_scene_cache(
+                cache_path,
+                dataset_path,
+                dataset_name,
+                scene_name,
+                config,
+                loader,
+                verbose=verbose,
+            )
 
-        # blender loader
-        elif loader == "blender":
-            from mvdatasets.loaders.static.blender import load
+        if res is None:
+            res = run_loader(loader, dataset_path, scene_name, config, verbose=verbose)
+            # (optional) save preprocessed scene to cache
+            if cache_path is not None and res is not None:
+                save_scene_cache(
+                    res,
+                    cache_path,
+                    dataset_path,
+                    dataset_name,
+                    scene_name,
+                    config,
+                    loader,
+                    verbose=verbose,
+                )
 
-            res = load(dataset_path, scene_name, config, verbose=verbose)
+        if loader == "blender":
             self.cameras_on_hemisphere = True
 
-        # ingp loader (deprecated)
-        # elif loader == "ingp":
-        #     res = load_ingp(dataset_path, scene_name, splits, config, verbose=verbose)
-
-        # dmsr loader
-        elif loader == "dmsr":
-            from mvdatasets.loaders.static.dmsr import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # colmap loader
-        elif loader == "colmap":
-            from mvdatasets.loaders.static.colmap import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # DYNAMIC SCENE DATASETS ----------------------------------------------
-
-        # d-nerf loader
-        elif loader == "d-nerf":
-            from mvdatasets.loaders.dynamic.d_nerf import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # visor loader
-        elif loader == "visor":
-            from mvdatasets.loaders.dynamic.visor import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # neu3d loader
-        elif loader == "neu3d":
-            from mvdatasets.loaders.dynamic.neu3d import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # panoptic-sports loader
-        elif loader == "panoptic-sports":
-            from mvdatasets.loaders.dynamic.panoptic_sports import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # nerfies loader
-        elif loader == "nerfies":
-            from mvdatasets.loaders.dynamic.nerfies import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # iphone loader
-        elif loader == "iphone":
-            from mvdatasets.loaders.dynamic.iphone import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # monst3r loader
-        elif loader == "monst3r":
-            from mvdatasets.loaders.dynamic.monst3r import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        # flow3d loader
-        elif loader == "flow3d":
-            from mvdatasets.loaders.dynamic.flow3d import load
-
-            res = load(dataset_path, scene_name, config, verbose=verbose)
-
-        else:
-
-            raise ValueError(f"Dataset {dataset_name} is not supported")
-
         # UNPACK -------------------------------------------------------------
 
         if res is not None:
@@ -218,6 +282,9 @@ class MVDataset:
 
             # optional
             self.point_clouds = res.get("point_clouds", [])
+            # (N, T, C) 2D tracks and (N,) their query frames
+            self.tracks_2d = res.get("tracks_2d", None)
+            self.tracks_2d_query_frames = res.get("tracks_2d_query_frames", None)
             print("loaded scene has", len(self.point_clouds), "point clouds")
 
             # ---------------------------------------------------------------------
@@ -243,6 +310,12 @@ class MVDataset:
             # split data into train and test (or keep the all set)
             self.data = cameras_splits
 
+            # (optional) build cameras mip pyramids
+            if config["nr_mip_levels"] > 1:
+                for cameras in self.data.values():
+                    for camera in cameras:
+                        camera.build_mip_pyramid(config["nr_mip_levels"])
+
         else:
             # res is None
             self.data = {}
@@ -0,0 +1,171 @@
+import math
+import torch
+import numpy as np
+from typing import Optional
+from mvdatasets.datasplit import DataSplit
+from mvdatasets.utils.raycasting import (
+    get_random_pixels,
+    get_points_2d_screen_from_pixels,
+    get_rays_per_points_2d_screen,
+)
+
+
+class RaysSplit(torch.utils.data.IterableDataset):
+
+    def __init__(
+        self,
+        data_split: DataSplit,
+        batch_size: int = 512,
+        nr_batches: Optional[int] = None,
+        jitter_pixels: bool = False,
+        nr_rays_per_pixel: int = 1,
+    ):
+        """Iterable dataset of rays batches sampled from a DataSplit, rays are
+        generated where the dataset is iterated (e.g. in DataLoader workers),
+        so that it overlaps with the training step in the main process.
+
+        Batches have the same content of TensorReel.get_next_rays_batch, use
+        get_data_loader (or a DataLoader with batch_size=None) to iterate them.
+
+        Args:
+            data_split (DataSplit): split to sample from, its selected mip level
+                and window of active frames (see DataSplit.set_active_frames) are used.
+            batch_size (int, optional): number of rays per batch. Defaults to 512.
+            nr_batches (int, optional): number of batches per epoch. Defaults to None,
+                means as many batches as needed to sample each pixel once on average.
+            jitter_pixels (bool, optional): Defaults to False.
+            nr_rays_per_pixel (int, optional): Defaults to 1.
+        """
+        assert nr_rays_per_pixel > 0, "nr_rays_per_pixel must be > 0"
+        assert nr_rays_per_pixel == 1 or (
+            nr_rays_per_pixel > 1 and jitter_pixels is True
+        ), "jitter_pixels must be True if nr_rays_per_pixel > 1"
+        assert (
+            batch_size % nr_rays_per_pixel == 0
+        ), "batch_size must be a multiple of nr_rays_per_pixel"
+
+        self.data_split = data_split
+        self.batch_size = batch_size
+        self.nr_batches = nr_batches
+        self.jitter_pixels = jitter_pixels
+        self.nr_rays_per_pixel = nr_rays_per_pixel
+
+    def __len__(self) -> int:
+        # returns the number of batches per epoch
+        if self.nr_batches is not None:
+            return self.nr_batches
+        split = self.data_split
+        nr_pixels = split.nr_cameras * split.temporal_dim * split.width * split.height
+        return math.ceil(nr_pixels * self.nr_rays_per_pixel / self.batch_size)
+
+    def __iter__(self):
+        nr_batches = len(self)
+        worker_info = torch.utils.data.get_worker_info()
+        if worker_info is not None:
+            # batches are split among workers
+            # (torch random generators are seeded differently in each worker)
+            nr_batches = len(range(worker_info.id, nr_batches, worker_info.num_workers))
+        for _ in range(nr_batches):
+            yield self.get_next_rays_batch()
+
+    def get_next_rays_batch(self) -> dict:
+        """samples a batch of rays, uniformly among cameras, active frames and pixels
+
+        Returns:
+            cameras_idx (torch.Tensor, int32): (batch_size)
+            frames_idx (torch.Tensor, int32): (batch_size)
+            pixels (torch.Tensor, int32): (batch_size, 2) with values in [0, W-1], [0, H-1]
+            rays_o (torch.Tensor, float32): (batch_size, 3)
+            rays_d (torch.Tensor, float32): (batch_size, 3)
+            vals (dict): "modality" (torch.Tensor): (batch_size, C)
+            timestamps (torch.Tensor, float32): (batch_size)
+        """
+        split = self.data_split
+        real_batch_size = self.batch_size // self.nr_rays_per_pixel
+
+        # sample cameras, frames (in the window of active frames) and pixels
+        frames_start, temporal_dim = split.frames_start, split.temporal_dim
+        cameras_idx = torch.randint(
+            0, split.nr_cameras, (real_batch_size,), dtype=torch.int32
+        )
+        frames_idx = frames_start + torch.randint(
+            0, temporal_dim, (real_batch_size,), dtype=torch.int32
+        )
+        pixels = get_random_pixels(split.height, split.width, real_batch_size)  # (N, 2)
+
+        # gather data values at pixels (jittering does not change pixels)
+        vals = {}
+        cam_idx = cameras_idx.numpy()
+        frame_idx = frames_idx.numpy()
+        i = pixels[:, 0].numpy()  # x coordinate (width)
+        j = pixels[:, 1].numpy()  # y coordinate (height)
+        for key, val in split.data.items():
+            vals[key] = torch.from_numpy(
+                np.asarray(val[cam_idx, frame_idx, j, i])
+            )  # (N, C)
+
+        # repeat pixels if needed
+        if self.nr_rays_per_pixel > 1:
+            pixels = pixels.repeat_interleave(self.nr_rays_per_pixel, dim=0)
+            cameras_idx = cameras_idx.repeat_interleave(self.nr_rays_per_pixel, dim=0)
+            frames_idx = frames_idx.repeat_interleave(self.nr_rays_per_pixel, dim=0)
+            for key, val in vals.items():
+                vals[key] = val.repeat_interleave(self.nr_rays_per_pixel, dim=0)
+
+        # get 2d points on the image plane
+        points_2d_screen = get_points_2d_screen_from_pixels(
+            pixels, self.jitter_pixels
+        )  # (N, 2)
+
+        # get a ray for each pixel in corresponding camera frame
+        rays_o, rays_d = get_rays_per_points_2d_screen(
+            c2w=split.c2w_all[cameras_idx],
+            intrinsics_inv=split.intrinsics_inv_all[cameras_idx],
+            points_2d_screen=points_2d_screen,
+        )
+
+        return {
+            "cameras_idx": cameras_idx,
+            "pixels": pixels,
+            "rays_o": rays_o,
+            "rays_d": rays_d,
+            "vals": vals,
+            "timestamps": split.timestamps_all[cameras_idx, frames_idx],  # (N)
+            "frames_idx": frames_idx,
+        }
+
+    def get_data_loader(
+        self,
+        num_workers: int = 0,
+        pin_memory: Optional[bool] = None,
+        persistent_workers: bool = True,
+        **kwargs,
+    ) -> torch.utils.data.DataLoader:
+        """returns a DataLoader iterating the rays batches, generated in
+        num_workers worker processes while the main process trains
+
+        Args:
+            num_workers (int, optional): Defaults to 0.
+            pin_memory (bool, optional): batches are copied to page-locked memory
+                for faster (and asynchronous) transfers to the GPU.
+                Defaults to None, means True if CUDA is available.
+            persistent_workers (bool, optional): keep workers alive between epochs,
+                ignored if num_workers is 0. Defaults to True.
+            **kwargs: other DataLoader arguments.
+
+        Returns:
+            torch.utils.data.DataLoader: data loader
+        """
+        if pin_memory is None:
+            pin_memory = torch.cuda.is_available()
+        return torch.utils.data.DataLoader(
+            self,
+            batch_size=None,  # batches are made by the dataset
+            num_workers=num_workers,
+            pin_memory=pin_memory,
+            persistent_workers=persistent_workers and num_workers > 0,
+            **kwargs,
+        )
+
+    def __str__(self) -> str:
+        return f"RaysSplit with {len(self)} batches of {self.batch_size} rays per epoch, sampled from {self.data_split}"
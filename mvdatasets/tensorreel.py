@@ -1,14 +1,18 @@
 import torch
+import queue
+import threading
 import numpy as np
 from tqdm import tqdm
 from typing import List, Optional
 from mvdatasets.utils.raycasting import (
+    get_pixels,
     get_random_pixels,
     get_rays_per_points_2d_screen,
     get_data_per_points_2d_screen,
     get_points_2d_screen_from_pixels,
 )
 from mvdatasets import Camera
+from mvdatasets.io.modality_storage import stack_like_storage
 from mvdatasets.utils.printing import print_info
 
 
@@ -19,6 +23,8 @@ class TensorReel:
         device: str = "cuda",
         verbose: bool = False,
         modalities: List[str] = ["rgbs", "masks"],
+        rays_d_lut: bool = False,
+        rays_d_lut_dtype: torch.dtype = torch.float32,
     ):
         """Create a tensorreel object, containing all data stored contiguosly in tensors.
 
@@ -27,62 +33,117 @@ class TensorReel:
             device (str, optional): device to move tensors to. Defaults to "cuda".
             verbose (bool, optional): print info. Defaults to False.
             modalities (list, optional): list of modalities to include in the tensor reel. Defaults to ["rgbs", "masks"].
+            rays_d_lut (bool, optional): precompute the rays directions of all cameras pixels centers (N, H, W, 3) for each mip level, so that rays directions of batches without jittering are gathered instead of computed. Defaults to False.
+            rays_d_lut_dtype (torch.dtype, optional): dtype of the rays directions tables (e.g. torch.float16 to halve their memory). Defaults to torch.float32.
         """
 
         if len(cameras) == 0:
             raise ValueError("tensor reel has no cameras")
 
-        data = {}
+        # assumption: all cameras have the same number of mip levels
+        nr_mip_levels = min(camera.get_nr_mip_levels() for camera in cameras)
+
+        data = [{} for _ in range(nr_mip_levels)]
         c2w_all = []  # list of (4, 4) matrices
         w2c_all = []  # list of (4, 4) matrices
-        intrinsics = []  # list of (3, 3) matrices
-        intrinsics_inv = []  # list of (3, 3) matrices
+        intrinsics = [[] for _ in range(nr_mip_levels)]  # lists of (3, 3) matrices
+        intrinsics_inv = [[] for _ in range(nr_mip_levels)]  # lists of (3, 3) matrices
         timestamps = []  # list of (T) tensors
 
         # collect data from all cameras
         pbar = tqdm(cameras, desc="tensor reel", ncols=100)
         for camera in pbar:
-            # get camera data
-            for key, val in camera.data.items():
-                # populate data dict
-                if key in modalities:
-                    if key not in data:
-                        data[key] = []
-                    if val is not None:
-                        data[key].append(torch.from_numpy(val))
-                    else:
-                        raise ValueError(
-                            f"camera {camera.camera_label} has no {key} data"
-                        )
+            for level in range(nr_mip_levels):
+                mip_level = camera.get_mip_level(level)
+                # get camera data
+                for key, val in mip_level["data"].items():
+                    # populate data dict
+                    if key in modalities:
+                        if key not in data[level]:
+                            data[level][key] = []
+                        if val is not None:
+                            data[level][key].append(val)
+                        else:
+                            raise ValueError(
+                                f"camera {camera.camera_label} has no {key} data"
+                            )
+                intrinsics[level].append(
+                    torch.from_numpy(mip_level["intrinsics"]).float()
+                )
+                intrinsics_inv[level].append(
+                    torch.from_numpy(mip_level["intrinsics_inv"]).float()
+                )
 
             # camera matrices
             c2w_all.append(torch.from_numpy(camera.get_pose()).float())
             w2c_all.append(torch.from_numpy(camera.get_pose_inv()).float())
-            intrinsics.append(torch.from_numpy(camera.get_intrinsics()).float())
-            intrinsics_inv.append(torch.from_numpy(camera.get_intrinsics_inv()).float())
             timestamps.append(torch.from_numpy(camera.get_timestamps()).float())
 
         # concat data and move to device
-        for key, val in data.items():
-            data[key] = torch.stack(val).to(device).contiguous()
-        self.data = data
+        self.mip_levels = []
+        for level in range(nr_mip_levels):
+            for key, val in data[level].items():
+                # views of a split buffer are wrapped without copying,
+                # lazy modalities are decoded here
+                stacked = np.asarray(stack_like_storage(val))
+                data[level][key] = torch.from_numpy(stacked).to(device).contiguous()
+            mip_level = cameras[0].get_mip_level(level)
+            # (N, 3, 3)
+            intrinsics[level] = torch.stack(intrinsics[level]).to(device)
+            intrinsics_inv[level] = torch.stack(intrinsics_inv[level]).to(device)
+            self.mip_levels.append(
+                {
+                    "width": mip_level["width"],
+                    "height": mip_level["height"],
+                    "intrinsics": intrinsics[level],
+                    "intrinsics_inv": intrinsics_inv[level],
+                    "data": data[level],
+                }
+            )
+
+        # full resolution
+        self.data = self.mip_levels[0]["data"]
+        self.intrinsics = self.mip_levels[0]["intrinsics"]  # (N, 3, 3)
+        self.intrinsics_inv = self.mip_levels[0]["intrinsics_inv"]  # (N, 3, 3)
 
         # concat cameras matrices
         self.c2w_all = torch.stack(c2w_all).to(device).contiguous()  # (N, 4, 4)
         self.w2c_all = torch.stack(w2c_all).to(device).contiguous()  # (N, 4, 4)
-        self.intrinsics = torch.stack(intrinsics).to(device).contiguous()  # (N, 3, 3)
-        self.intrinsics_inv = (
-            torch.stack(intrinsics_inv).to(device).contiguous()
-        )  # (N, 3, 3)
         self.timestamps = torch.stack(timestamps).to(device).contiguous()  # (N, T)
 
+        # rays directions lookup tables
+        for mip_level in self.mip_levels:
+            mip_level["rays_d_lut"] = None
+            if rays_d_lut:
+                self._build_rays_d_lut(mip_level, rays_d_lut_dtype)
+
         self.temporal_dim = cameras[0].get_temporal_dim()
         self.width, self.height = cameras[0].get_resolution()
         self.device = device
+        # patches pixels offsets, by patch size
+        self.patch_offsets = {}
 
         if verbose:
             print_info(f"tensor reel on {self.device}")
 
+    @torch.no_grad()
+    def _build_rays_d_lut(self, mip_level: dict, dtype: torch.dtype) -> None:
+        """precomputes the world space rays directions of all pixels centers
+        of all cameras at a mip level"""
+        width, height = mip_level["width"], mip_level["height"]
+        pixels = get_pixels(height, width, device=self.c2w_all.device)  # (W, H, 2)
+        points_2d_screen = get_points_2d_screen_from_pixels(pixels)  # (W * H, 2)
+        rays_d_lut = []
+        for c2w, intrinsics_inv in zip(self.c2w_all, mip_level["intrinsics_inv"]):
+            _, rays_d = get_rays_per_points_2d_screen(
+                c2w=c2w,
+                intrinsics_inv=intrinsics_inv,
+                points_2d_screen=points_2d_screen,
+            )  # (W * H, 3)
+            rays_d = rays_d.reshape(width, height, 3).permute(1, 0, 2)  # (H, W, 3)
+            rays_d_lut.append(rays_d.to(dtype))
+        mip_level["rays_d_lut"] = torch.stack(rays_d_lut).contiguous()  # (N, H, W, 3)
+
     # TODO: deprecated
     # @torch.no_grad()
     # def get_next_cameras_batch(self, batch_size=8, cameras_idx=None, frames_idx=None):
@@ -193,6 +254,69 @@ class TensorReel:
 
     #     return cameras_idx, projections, view_dirs, vals, frames_idx
 
+    def _get_rays(
+        self,
+        level: dict,
+        cameras_idx: torch.Tensor,
+        pixels: torch.Tensor,
+        points_2d_screen: torch.Tensor,
+        jitter_pixels: bool,
+    ):
+        """returns the rays of points_2d_screen (of pixels) in cameras"""
+        if level["rays_d_lut"] is not None and not jitter_pixels:
+            # gather the precomputed directions of pixels centers
+            rays_o = self.c2w_all[cameras_idx, :3, -1]  # (N, 3)
+            rays_d = level["rays_d_lut"][cameras_idx, pixels[:, 1], pixels[:, 0]]
+            return rays_o, rays_d.float()  # (N, 3)
+        return get_rays_per_points_2d_screen(
+            c2w=self.c2w_all[cameras_idx],
+            intrinsics_inv=level["intrinsics_inv"][cameras_idx],
+            points_2d_screen=points_2d_screen,
+        )
+
+    def _sample_uniform(
+        self,
+        batch_size: int,
+        cameras_idx: Optional[np.ndarray],
+        frames_idx: Optional[np.ndarray],
+        height: int,
+        width: int,
+    ):
+        """uniformly samples cameras (among cameras_idx, if given), frames
+        (among frames_idx, if given) and pixels in [0, width-1], [0, height-1]"""
+
+        # sample cameras_idx
+        nr_cameras = self.c2w_all.shape[0]
+        if cameras_idx is None:
+            # Sample among all cameras with repetitions
+            cameras_idx = np.random.randint(0, nr_cameras, size=batch_size)
+        else:
+            # Sample among given camera indices with repetitions
+            sampled_idx = np.random.randint(0, len(cameras_idx), size=batch_size)
+            cameras_idx = cameras_idx[sampled_idx]
+        cameras_idx = cameras_idx.astype(np.int32)
+
+        # move cameras_idx to device
+        cameras_idx = torch.tensor(cameras_idx, device=self.device)
+
+        # sample frames_idx
+        if frames_idx is None:
+            # Sample among all frames with repetitions
+            frames_idx = np.random.randint(0, self.temporal_dim, size=batch_size)
+        else:
+            # Sample among given frame indices with repetitions
+            sampled_idx = np.random.randint(0, len(frames_idx), size=batch_size)
+            frames_idx = frames_idx[sampled_idx]
+        frames_idx = frames_idx.astype(np.int32)
+
+        # move frames_idx to device
+        frames_idx = torch.tensor(frames_idx, device=self.device)
+
+        # get random pixels
+        pixels = get_random_pixels(height, width, batch_size, device=self.device)
+
+        return cameras_idx, frames_idx, pixels
+
     @torch.no_grad()
     def get_next_rays_batch(
         self,
@@ -201,6 +325,8 @@ class TensorReel:
         frames_idx: Optional[np.ndarray] = None,
         jitter_pixels: bool = False,
         nr_rays_per_pixel: int = 1,
+        mip_level: int = 0,
+        sampler=None,
     ):
         """Sample a batch of rays from the tensor reel.
 
@@ -210,10 +336,16 @@ class TensorReel:
             frames_idx (np.ndarray, optional): (N) Defaults to None.
             jitter_pixels (bool, optional): Defaults to False.
             nr_rays_per_pixel (int, optional): Defaults to 1.
+            mip_level (int, optional): mip level to sample from, 0 is the full resolution. Defaults to 0.
+            sampler (optional): samples cameras, frames and pixels instead of
+                uniform sampling (e.g. utils.samplers.ErrorMapSampler), its sample(batch_size)
+                method returns (cameras_idx, frames_idx, pixels) and its height and width
+                must match the mip level ones. Defaults to None.
 
         Returns:
             cameras_idx (np.ndarray): (batch_size)
             frames_idx (np.ndarray): (batch_size)
+            pixels (torch.Tensor): (batch_size, 2) with values in [0, W-1], [0, H-1]
             rays_o (torch.Tensor): (batch_size, 3)
             rays_d (torch.Tensor): (batch_size, 3)
             vals (dict): "modality" (torch.Tensor): (batch_size, H, W, C)
@@ -225,39 +357,34 @@ class TensorReel:
             nr_rays_per_pixel > 1 and jitter_pixels is True
         ), "jitter_pixels must be True if nr_rays_per_pixel > 1"
 
-        real_batch_size = batch_size // nr_rays_per_pixel
+        if mip_level < 0 or mip_level >= len(self.mip_levels):
+            raise ValueError(
+                f"mip level {mip_level} out of range [0, {len(self.mip_levels)})"
+            )
+        level = self.mip_levels[mip_level]
 
-        # sample cameras_idx
-        nr_cameras = self.c2w_all.shape[0]
-        if cameras_idx is None:
-            # Sample among all cameras with repetitions
-            cameras_idx = np.random.randint(0, nr_cameras, size=real_batch_size)
-        else:
-            # Sample among given camera indices with repetitions
-            sampled_idx = np.random.randint(0, len(cameras_idx), size=real_batch_size)
-            cameras_idx = cameras_idx[sampled_idx]
-        cameras_idx = cameras_idx.astype(np.int32)
-
-        # move cameras_idx to device
-        cameras_idx = torch.tensor(cameras_idx, device=self.device)
+        real_batch_size = batch_size // nr_rays_per_pixel
 
-        # sample frames_idx
-        if frames_idx is None:
-            # Sample among all frames with repetitions
-            frames_idx = np.random.randint(0, self.temporal_dim, size=real_batch_size)
+        if sampler is not None:
+            if cameras_idx is not None or frames_idx is not None:
+                raise ValueError(
+                    "cameras_idx and frames_idx can not be used with a sampler"
+                )
+            if (sampler.height, sampler.width) != (level["height"], level["width"]):
+                raise ValueError(
+                    f"sampler resolution {sampler.width}x{sampler.height} does not match mip level {mip_level} resolution {level['width']}x{level['height']}"
+                )
+            cameras_idx, frames_idx, pixels = (
+                val.to(self.device) for val in sampler.sample(real_batch_size)
+            )
         else:
-            # Sample among given frame indices with repetitions
-            sampled_idx = np.random.randint(0, len(frames_idx), size=real_batch_size)
-            frames_idx = frames_idx[sampled_idx]
-        frames_idx = frames_idx.astype(np.int32)
-
-        # move frames_idx to device
-        frames_idx = torch.tensor(frames_idx, device=self.device)
-
-        # get random pixels
-        pixels = get_random_pixels(
-            self.height, self.width, real_batch_size, device=self.device
-        )  # (N, 2)
+            cameras_idx, frames_idx, pixels = self._sample_uniform(
+                real_batch_size,
+                cameras_idx,
+                frames_idx,
+                level["height"],
+                level["width"],
+            )
 
         # repeat pixels if needed
         if nr_rays_per_pixel > 1:
@@ -276,14 +403,12 @@ class TensorReel:
             points_2d_screen=points_2d_screen,
             cameras_idx=cameras_idx,
             frames_idx=frames_idx,
-            data_dict=self.data,
+            data_dict=level["data"],
         )
 
         # get a ray for each pixel in corresponding camera frame
-        rays_o, rays_d = get_rays_per_points_2d_screen(
-            c2w=self.c2w_all[cameras_idx],
-            intrinsics_inv=self.intrinsics_inv[cameras_idx],
-            points_2d_screen=points_2d_screen,
+        rays_o, rays_d = self._get_rays(
+            level, cameras_idx, pixels, points_2d_screen, jitter_pixels
         )
 
         # timestamps
@@ -291,6 +416,7 @@ class TensorReel:
 
         return {
             "cameras_idx": cameras_idx,
+            "pixels": pixels,
             "rays_o": rays_o,
             "rays_d": rays_d,
             "vals": vals,
@@ -298,6 +424,106 @@ class TensorReel:
             "frames_idx": frames_idx,
         }
 
+    def _get_patch_offsets(self, patch_size: int) -> torch.Tensor:
+        """returns the (cached) pixels offsets of a patch from its top-left pixel"""
+        if patch_size not in self.patch_offsets:
+            offsets = get_pixels(patch_size, patch_size, device=self.device)
+            # (W, H, 2) to (H, W, 2)
+            self.patch_offsets[patch_size] = offsets.transpose(0, 1).contiguous()
+        return self.patch_offsets[patch_size]
+
+    @torch.no_grad()
+    def get_next_patches_batch(
+        self,
+        nr_patches: int = 8,
+        patch_size: int = 8,
+        cameras_idx: Optional[np.ndarray] = None,
+        frames_idx: Optional[np.ndarray] = None,
+        jitter_pixels: bool = False,
+        mip_level: int = 0,
+    ):
+        """Sample a batch of square patches of rays from the tensor reel
+        (e.g. for perceptual or smoothness losses), patches are uniformly
+        sampled among cameras, frames and their top-left pixels.
+
+        Args:
+            nr_patches (int, optional): Defaults to 8.
+            patch_size (int, optional): patches side P, in pixels. Defaults to 8.
+            cameras_idx (np.ndarray, optional): (N) Defaults to None.
+            frames_idx (np.ndarray, optional): (N) Defaults to None.
+            jitter_pixels (bool, optional): Defaults to False.
+            mip_level (int, optional): mip level to sample from, 0 is the full resolution. Defaults to 0.
+
+        Returns:
+            cameras_idx (torch.Tensor): (nr_patches)
+            frames_idx (torch.Tensor): (nr_patches)
+            pixels (torch.Tensor): (nr_patches, P, P, 2) with values in [0, W-1], [0, H-1]
+            rays_o (torch.Tensor): (nr_patches, P, P, 3)
+            rays_d (torch.Tensor): (nr_patches, P, P, 3)
+            vals (dict): "modality" (torch.Tensor): (nr_patches, P, P, C)
+            timestamps (torch.Tensor): (nr_patches)
+        """
+
+        if mip_level < 0 or mip_level >= len(self.mip_levels):
+            raise ValueError(
+                f"mip level {mip_level} out of range [0, {len(self.mip_levels)})"
+            )
+        level = self.mip_levels[mip_level]
+        if patch_size < 1 or patch_size > min(level["height"], level["width"]):
+            raise ValueError(
+                f"patch_size {patch_size} out of range [1, {min(level['height'], level['width'])}]"
+            )
+
+        # sample patches top-left pixels
+        cameras_idx, frames_idx, corners = self._sample_uniform(
+            nr_patches,
+            cameras_idx,
+            frames_idx,
+            level["height"] - patch_size + 1,
+            level["width"] - patch_size + 1,
+        )
+
+        # all pixels of all patches, gathered at once
+        offsets = self._get_patch_offsets(patch_size)  # (P, P, 2)
+        pixels = corners[:, None, None] + offsets[None]  # (K, P, P, 2)
+        nr_pixels = patch_size * patch_size
+        patches_pixels = pixels.reshape(-1, 2)  # (K * P * P, 2)
+        patches_cameras_idx = cameras_idx.repeat_interleave(nr_pixels)
+        patches_frames_idx = frames_idx.repeat_interleave(nr_pixels)
+
+        # get 2d points on the image plane
+        points_2d_screen = get_points_2d_screen_from_pixels(
+            patches_pixels, jitter_pixels
+        )  # (K * P * P, 2)
+
+        # get ground truth values at pixels
+        vals = get_data_per_points_2d_screen(
+            points_2d_screen=points_2d_screen,
+            cameras_idx=patches_cameras_idx,
+            frames_idx=patches_frames_idx,
+            data_dict=level["data"],
+        )
+
+        # get a ray for each pixel in corresponding camera frame
+        rays_o, rays_d = self._get_rays(
+            level, patches_cameras_idx, patches_pixels, points_2d_screen, jitter_pixels
+        )
+
+        # reshape to patches
+        patch_shape = (nr_patches, patch_size, patch_size)
+        return {
+            "cameras_idx": cameras_idx,
+            "pixels": pixels,
+            "rays_o": rays_o.reshape(*patch_shape, 3),
+            "rays_d": rays_d.reshape(*patch_shape, 3),
+            "vals": {
+                key: val.reshape(*patch_shape, *val.shape[1:])
+                for key, val in vals.items()
+            },
+            "timestamps": self.timestamps[cameras_idx, frames_idx],  # (K)
+            "frames_idx": frames_idx,
+        }
+
     # TODO: deprecated
     # def get_cameras_rays_per_points_2d(c2w_all, intrinsics_inv_all, points_2d_screen):
     #     """given a list of c2w, intrinsics_inv and points_2d_screen, return rays origins and
@@ -405,4 +631,139 @@ class TensorReel:
         # string += f"projections: {self.projections.shape}, {self.projections.dtype}\n"
         for key, val in self.data.items():
             string += f"{key}: {val.shape}, {val.dtype}\n"
+        rays_d_lut = self.mip_levels[0]["rays_d_lut"]
+        if rays_d_lut is not None:
+            string += f"rays_d_lut: {rays_d_lut.shape}, {rays_d_lut.dtype}\n"
         return string
+
+
+def _map_batch(fn, batch: dict, *others: dict) -> dict:
+    """applies fn to the tensors of (nested) batch dicts"""
+    return {
+        key: (
+            _map_batch(fn, val, *(other[key] for other in others))
+            if isinstance(val, dict)
+            else fn(val, *(other[key] for other in others))
+        )
+        for key, val in batch.items()
+    }
+
+
+class TensorReelPrefetcher:
+    def __init__(self, tensor_reel: TensorReel, nr_prefetched: int = 2, **kwargs):
+        """Samples the next rays batches of a tensor reel ahead of time in a
+        background thread (on a separate CUDA stream, if on GPU), so that
+        sampling overlaps with the training step.
+
+        Batches are written into a ring of nr_prefetched + 1 preallocated
+        buffers, a returned batch is valid until the next one is requested
+        (clone it to keep it longer). Call close (or use it as a context
+        manager) to stop the thread.
+
+        Args:
+            tensor_reel (TensorReel): tensor reel to sample from
+            nr_prefetched (int, optional): number of batches sampled ahead. Defaults to 2.
+            **kwargs: TensorReel.get_next_rays_batch arguments (e.g. batch_size).
+        """
+        assert nr_prefetched > 0, "nr_prefetched must be > 0"
+
+        self.tensor_reel = tensor_reel
+        self.kwargs = kwargs
+        self.nr_buffers = nr_prefetched + 1
+        # allocated with the first batch
+        self.buffers = [None] * self.nr_buffers
+
+        device = torch.device(tensor_reel.device)
+        if device.type == "cuda":
+            self.stream = torch.cuda.Stream(device)
+            # buffers are released when the consumer stream is done with them
+            self.ready_events = [torch.cuda.Event() for _ in range(self.nr_buffers)]
+            self.released_events = [torch.cuda.Event() for _ in range(self.nr_buffers)]
+        else:
+            self.stream = None
+
+        # the buffer being used by the consumer
+        self.current = None
+        # buffers that are neither ready nor in use by the consumer
+        self.free_queue = queue.Queue()
+        for i in range(self.nr_buffers):
+            self.free_queue.put(i)
+        self.ready_queue = queue.Queue(maxsize=nr_prefetched)
+
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._prefetch, daemon=True)
+        self.thread.start()
+
+    def _prefetch(self):
+        try:
+            while not self.stop_event.is_set():
+                i = self.free_queue.get()
+                if i is None:
+                    break
+                with torch.no_grad(), torch.cuda.stream(self.stream):
+                    batch = self.tensor_reel.get_next_rays_batch(**self.kwargs)
+                    if self.buffers[i] is None:
+                        self.buffers[i] = _map_batch(torch.empty_like, batch)
+                    elif self.stream is not None:
+                        # wait for the consumer to be done with the buffer
+                        self.stream.wait_event(self.released_events[i])
+                    _map_batch(
+                        lambda out, val: out.copy_(val, non_blocking=True),
+                        self.buffers[i],
+                        batch,
+                    )
+                    if self.stream is not None:
+                        self.ready_events[i].record(self.stream)
+                self.ready_queue.put(i)
+        except Exception as e:
+            # raised in the consumer thread
+            self.ready_queue.put(e)
+
+    def get_next_rays_batch(self) -> dict:
+        """returns the next prefetched batch (see TensorReel.get_next_rays_batch)"""
+        if self.stop_event.is_set():
+            raise RuntimeError("prefetcher is closed")
+        # release the buffer returned last time
+        self._release_current()
+        i = self.ready_queue.get()
+        if isinstance(i, Exception):
+            self.close()
+            raise i
+        if self.stream is not None:
+            torch.cuda.current_stream().wait_event(self.ready_events[i])
+        self.current = i
+        return self.buffers[i]
+
+    def _release_current(self):
+        if self.current is None:
+            return
+        if self.stream is not None:
+            self.released_events[self.current].record(torch.cuda.current_stream())
+        self.free_queue.put(self.current)
+        self.current = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        return self.get_next_rays_batch()
+
+    def close(self):
+        """stops the background thread"""
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        # unblock the thread, if waiting for a free buffer or a free ready slot
+        self.free_queue.put(None)
+        while self.thread.is_alive():
+            try:
+                self.ready_queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+    def __enter__(self) -> "TensorReelPrefetcher":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -3,6 +3,8 @@ import numpy as np
 import torch
 import os
 import cv2
+from typing import Optional
+from mvdatasets.utils.loader_utils import get_subsampled_resolution
 
 
 def bilinear_downscale(img_np, times=1):
@@ -144,6 +146,154 @@ def image_float32_to_uint8(tensor):
     raise ValueError("tensor must be torch.Tensor or np.ndarray")
 
 
+# number of frames composited at once (bounds the uint16 temporaries)
+ALPHA_CHUNK_SIZE = 8
+
+
+def _iter_chunks(rgba: np.ndarray):
+    # yields slices over the frames of a (N, H, W, 4) stack or the whole (H, W, 4) image
+    if rgba.ndim < 4:
+        yield slice(None)
+        return
+    for start in range(0, rgba.shape[0], ALPHA_CHUNK_SIZE):
+        yield slice(start, start + ALPHA_CHUNK_SIZE)
+
+
+def alpha_composite_uint8(
+    rgba: np.ndarray, white_bg: bool = True, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """composites RGBA images onto a white background (exact integer arithmetic,
+    no float conversion), if not white_bg, alpha is dropped (black background)
+
+    Args:
+        rgba (np.ndarray): (H, W, 4) or (N, H, W, 4) RGBA images, uint8
+        white_bg (bool, optional): Defaults to True.
+        out (np.ndarray, optional): (..., 3) output (e.g. memory-mapped),
+            Defaults to None (allocated in RAM).
+
+    Returns:
+        np.ndarray: (H, W, 3) or (N, H, W, 3) RGB images, uint8
+    """
+    if rgba.dtype != np.uint8 or rgba.shape[-1] != 4:
+        raise ValueError("rgba must be a uint8 array with 4 channels")
+    if out is None:
+        out = np.empty(rgba.shape[:-1] + (3,), dtype=np.uint8)
+    for chunk in _iter_chunks(rgba):
+        rgba_ = np.asarray(rgba[chunk])
+        if not white_bg:
+            out[chunk] = rgba_[..., :3]
+            continue
+        # rgb * a / 255 + 255 * (1 - a / 255) = (rgb * a + 255 * (255 - a)) / 255,
+        # numerator <= 255 * 255, fits uint16
+        alpha = rgba_[..., 3:].astype(np.uint16)
+        res = rgba_[..., :3].astype(np.uint16)
+        res *= alpha
+        np.subtract(255, alpha, out=alpha)
+        alpha *= 255
+        res += alpha
+        res //= 255
+        out[chunk] = res
+    return out
+
+
+def alpha_to_mask(
+    rgba: np.ndarray, binary: bool = False, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """extracts RGBA images alpha channel as masks
+
+    Args:
+        rgba (np.ndarray): (H, W, 4) or (N, H, W, 4) RGBA images, uint8
+        binary (bool, optional): if True, masks are 255 where alpha > 0, else 0.
+            Defaults to False.
+        out (np.ndarray, optional): (..., 1) output (e.g. memory-mapped),
+            Defaults to None (allocated in RAM).
+
+    Returns:
+        np.ndarray: (H, W, 1) or (N, H, W, 1) masks, uint8
+    """
+    if out is None:
+        out = np.empty(rgba.shape[:-1] + (1,), dtype=np.uint8)
+    for chunk in _iter_chunks(rgba):
+        alpha = np.asarray(rgba[chunk][..., -1:])
+        if binary:
+            # bool to {0, 255}
+            out[chunk] = (alpha > 0).view(np.uint8) * np.uint8(255)
+        else:
+            out[chunk] = alpha
+    return out
+
+
+def load_rgb_mask_from_rgba(
+    img_path: str, white_bg: bool, use_binary_mask: bool, subsample_factor: int = 1
+) -> np.ndarray:
+    """decodes an RGBA image file to its RGB composited on background and its
+    mask stacked in channels, resized after compositing and thresholding
+    at full resolution
+
+    Args:
+        img_path (str): RGBA image file path
+        white_bg (bool): composite onto a white background (see alpha_composite_uint8)
+        use_binary_mask (bool): threshold alpha (see alpha_to_mask)
+        subsample_factor (int, optional): Defaults to 1.
+
+    Returns:
+        np.ndarray: (H, W, 4) uint8 image
+    """
+    # avoid circular import
+    from mvdatasets.io.decoding import load_image, resize_image
+
+    rgba = load_image(img_path)
+    rgb_mask = np.empty_like(rgba)
+    alpha_composite_uint8(rgba, white_bg=white_bg, out=rgb_mask[..., :3])
+    alpha_to_mask(rgba, binary=use_binary_mask, out=rgb_mask[..., 3:])
+    width, height = get_subsampled_resolution(
+        rgba.shape[1], rgba.shape[0], subsample_factor
+    )
+    return resize_image(rgb_mask, width, height)
+
+
+def load_rgb_from_rgba(
+    img_path: str, white_bg: bool, subsample_factor: int = 1
+) -> np.ndarray:
+    """decodes an RGBA image file to its RGB composited on background
+
+    Returns:
+        np.ndarray: (H, W, 3) uint8 image
+    """
+    # avoid circular import
+    from mvdatasets.io.decoding import load_image, resize_image
+
+    rgba = load_image(img_path, channels="RGBA")
+    rgb = alpha_composite_uint8(rgba, white_bg=white_bg)
+    width, height = get_subsampled_resolution(
+        rgba.shape[1], rgba.shape[0], subsample_factor
+    )
+    return resize_image(rgb, width, height)
+
+
+def load_mask_from_rgba(
+    img_path: str, use_binary_mask: bool, subsample_factor: int = 1
+) -> np.ndarray:
+    """decodes the alpha channel of an RGBA image file to a mask
+    (RGB channels are not composited)
+
+    Returns:
+        np.ndarray: (H, W, 1) uint8 mask
+    """
+    # avoid circular import
+    from mvdatasets.io.decoding import resize_image
+
+    with Image.open(img_path) as img_pil:
+        if "A" not in img_pil.getbands():
+            img_pil = img_pil.convert("RGBA")
+        alpha = np.asarray(img_pil.getchannel("A"))[..., None]
+    mask = alpha_to_mask(alpha, binary=use_binary_mask)
+    width, height = get_subsampled_resolution(
+        alpha.shape[1], alpha.shape[0], subsample_factor
+    )
+    return resize_image(mask, width, height)
+
+
 def image_to_numpy(pil_image, use_lower_left_origin=False, use_uint8=False):
     """
     Convert a PIL Image to a numpy array.
@@ -57,3 +57,46 @@ def rescale(
     max_camera_distance = max_camera_distance * scene_radius_mult
 
     return scene_radius_mult, min_camera_distance, max_camera_distance
+
+
+def get_subsampled_resolution(
+    width: int, height: int, subsample_factor: float
+) -> Tuple[int, int]:
+    """returns the resolution of images subsampled by subsample_factor
+    (same rounding as Camera.resize)
+
+    Args:
+        width (int): image width
+        height (int): image height
+        subsample_factor (float): inverse of scale factor
+
+    Returns:
+        int: subsampled width
+        int: subsampled height
+    """
+    scale = 1 / subsample_factor
+    return round(width * scale), round(height * scale)
+
+
+def subsample_intrinsics(
+    intrinsics: np.ndarray, width: int, height: int, subsample_factor: float
+) -> Tuple[np.ndarray, int, int]:
+    """returns intrinsics and resolution of a camera whose images are
+    subsampled by subsample_factor (e.g. decoded at reduced size)
+
+    Args:
+        intrinsics (np.ndarray): (3, 3) intrinsics at full resolution
+        width (int): full resolution image width
+        height (int): full resolution image height
+        subsample_factor (float): inverse of scale factor
+
+    Returns:
+        np.ndarray: (3, 3) subsampled intrinsics
+        int: subsampled width
+        int: subsampled height
+    """
+    new_width, new_height = get_subsampled_resolution(width, height, subsample_factor)
+    intrinsics = intrinsics.copy()
+    intrinsics[0, :] *= new_width / width
+    intrinsics[1, :] *= new_height / height
+    return intrinsics, new_width, new_height
@@ -4,3 +4,7 @@ def bytes_to_gb(n_bytes: int) -> float:
 
 def bytes_to_mb(n_bytes: int) -> float:
     return n_bytes / 1e6
+
+
+def gb_to_bytes(n_gb: float) -> int:
+    return int(n_gb * 1e9)
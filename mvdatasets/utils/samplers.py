@@ -0,0 +1,413 @@
+import math
+import torch
+from typing import Tuple
+
+
+class ErrorMapSampler:
+
+    def __init__(
+        self,
+        nr_cameras: int,
+        temporal_dim: int,
+        height: int,
+        width: int,
+        tile_size: int = 8,
+        init_error: float = 1.0,
+        min_error: float = 1e-3,
+        momentum: float = 0.9,
+        device: str = "cpu",
+    ):
+        """Importance sampler of rays over all cameras frames, proportional to
+        a persistent error map of (camera, frame, pixels tile) cells.
+
+        Errors are stored in the leaves of a sum tree, so that sampling a batch
+        and updating it from per ray losses is O(batch_size * log(nr_cells)).
+
+        Args:
+            nr_cameras (int): number of cameras
+            temporal_dim (int): number of frames per camera
+            height (int): frames height (of the sampled mip level)
+            width (int): frames width (of the sampled mip level)
+            tile_size (int, optional): side of the pixels tiles. Defaults to 8.
+            init_error (float, optional): initial error of all cells. Defaults to 1.0.
+            min_error (float, optional): lower bound of cells errors, so that no cell
+                stops being sampled. Defaults to 1e-3.
+            momentum (float, optional): weight of the previous error of a cell when
+                it is updated (exponential moving average). Defaults to 0.9.
+            device (str, optional): Defaults to "cpu".
+        """
+        assert tile_size > 0, "tile_size must be > 0"
+        assert 0.0 <= momentum < 1.0, "momentum must be in [0, 1)"
+        assert init_error >= min_error > 0.0, "init_error must be >= min_error > 0"
+
+        self.nr_cameras = nr_cameras
+        self.temporal_dim = temporal_dim
+        self.height = height
+        self.width = width
+        self.tile_size = tile_size
+        self.min_error = min_error
+        self.momentum = momentum
+        self.device = device
+
+        self.nr_tiles_h = math.ceil(height / tile_size)
+        self.nr_tiles_w = math.ceil(width / tile_size)
+        self.nr_cells = nr_cameras * temporal_dim * self.nr_tiles_h * self.nr_tiles_w
+
+        # complete binary tree stored as an array, node k has children
+        # 2k and 2k + 1, leaves start at nr_leaves (node 0 is unused)
+        self.depth = max(1, math.ceil(math.log2(self.nr_cells)))
+        self.nr_leaves = 2**self.depth
+        self.tree = torch.zeros(2 * self.nr_leaves, dtype=torch.float64, device=device)
+        self.tree[self.nr_leaves : self.nr_leaves + self.nr_cells] = init_error
+        for level in range(self.depth - 1, -1, -1):
+            start, end = 2**level, 2 ** (level + 1)
+            self.tree[start:end] = (
+                self.tree[2 * start : 2 * end : 2]
+                + self.tree[2 * start + 1 : 2 * end : 2]
+            )
+
+    @property
+    def errors(self) -> torch.Tensor:
+        """errors of all cells (nr_cameras, temporal_dim, nr_tiles_h, nr_tiles_w)"""
+        return self.tree[self.nr_leaves : self.nr_leaves + self.nr_cells].view(
+            self.nr_cameras, self.temporal_dim, self.nr_tiles_h, self.nr_tiles_w
+        )
+
+    def _get_cells(
+        self,
+        cameras_idx: torch.Tensor,
+        frames_idx: torch.Tensor,
+        pixels: torch.Tensor,
+    ) -> torch.Tensor:
+        tiles_i = pixels[:, 1].long() // self.tile_size
+        tiles_j = pixels[:, 0].long() // self.tile_size
+        cells = cameras_idx.long() * self.temporal_dim + frames_idx.long()
+        cells = cells * self.nr_tiles_h + tiles_i
+        return cells * self.nr_tiles_w + tiles_j
+
+    @torch.no_grad()
+    def sample(
+        self, batch_size: int
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """samples cells proportionally to their error, then a pixel uniformly in
+        each sampled tile
+
+        Args:
+            batch_size (int): number of samples
+
+        Returns:
+            cameras_idx (torch.Tensor, int32): (batch_size)
+            frames_idx (torch.Tensor, int32): (batch_size)
+            pixels (torch.Tensor, int32): (batch_size, 2) with values in [0, W-1], [0, H-1]
+        """
+        # descend the tree, going right when the value is past the left subtree
+        values = torch.rand(batch_size, dtype=torch.float64, device=self.device)
+        values *= self.tree[1]
+        nodes = torch.ones(batch_size, dtype=torch.long, device=self.device)
+        for _ in range(self.depth):
+            nodes *= 2
+            left = self.tree[nodes]
+            go_right = values >= left
+            values -= left * go_right
+            nodes += go_right
+        # rounding errors can reach the (zero) padding leaves
+        cells = torch.clamp(nodes - self.nr_leaves, max=self.nr_cells - 1)
+
+        # unravel cells indices
+        tiles_j = cells % self.nr_tiles_w
+        cells = cells // self.nr_tiles_w
+        tiles_i = cells % self.nr_tiles_h
+        cells = cells // self.nr_tiles_h
+        frames_idx = cells % self.temporal_dim
+        cameras_idx = cells // self.temporal_dim
+
+        # uniformly sample pixels in tiles, tiles on the borders can be cropped
+        offsets = torch.rand(batch_size, 2, device=self.device)
+        x = tiles_j * self.tile_size
+        y = tiles_i * self.tile_size
+        tiles_w = torch.clamp(self.width - x, max=self.tile_size)
+        tiles_h = torch.clamp(self.height - y, max=self.tile_size)
+        x = x + (offsets[:, 0] * tiles_w).long()
+        y = y + (offsets[:, 1] * tiles_h).long()
+        pixels = torch.stack([x, y], dim=-1).int()
+
+        return cameras_idx.int(), frames_idx.int(), pixels
+
+    @torch.no_grad()
+    def update(
+        self,
+        cameras_idx: torch.Tensor,
+        frames_idx: torch.Tensor,
+        pixels: torch.Tensor,
+        errors: torch.Tensor,
+    ) -> None:
+        """updates the error of the cells of a batch of rays (e.g. with their losses),
+        as the moving average of the mean error of the rays in each cell
+
+        Args:
+            cameras_idx (torch.Tensor, int): (N)
+            frames_idx (torch.Tensor, int): (N)
+            pixels (torch.Tensor, int): (N, 2) with values in [0, W-1], [0, H-1]
+            errors (torch.Tensor, float): (N) or (N, 1) non-negative errors
+        """
+        device = self.tree.device
+        cells = self._get_cells(
+            cameras_idx.to(device), frames_idx.to(device), pixels.to(device)
+        )
+        errors = errors.detach().to(device, torch.float64).reshape(-1)
+
+        # mean error of the rays of each cell
+        cells, inverse = torch.unique(cells, return_inverse=True)
+        errors_sum = torch.zeros(len(cells), dtype=torch.float64, device=device)
+        errors_sum.index_add_(0, inverse, errors)
+        counts = torch.bincount(inverse, minlength=len(cells))
+        nodes = cells + self.nr_leaves
+        self.tree[nodes] = torch.clamp(
+            self.momentum * self.tree[nodes]
+            + (1.0 - self.momentum) * errors_sum / counts,
+            min=self.min_error,
+        )
+
+        # update the sums of the ancestors
+        for _ in range(self.depth):
+            nodes = torch.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def __str__(self) -> str:
+        return f"ErrorMapSampler with {self.nr_cells} cells (nr_cameras: {self.nr_cameras}, temporal_dim: {self.temporal_dim}, tiles: {self.nr_tiles_h}x{self.nr_tiles_w} of {self.tile_size} pixels)"
+
+
+class MaskSampler:
+
+    def __init__(
+        self,
+        masks: torch.Tensor,
+        foreground_fraction: float = 0.5,
+        threshold: float = 0.5,
+    ):
+        """Sampler of rays drawing a fixed fraction of each batch from the
+        foreground pixels of masks and the rest from the background ones.
+
+        Foreground and background pixels of each (camera, frame) are compacted
+        once in contiguous index lists (on the masks device), sampling is fully
+        vectorized: a (camera, frame) is drawn uniformly among the ones with
+        foreground (or background) pixels, then one of its pixels.
+
+        Args:
+            masks (torch.Tensor): (N, T, H, W, 1) masks, e.g. the "masks" modality
+                of a TensorReel mip level
+            foreground_fraction (float, optional): fraction of rays sampled from the
+                foreground, all rays come from the background (or foreground) if
+                there are no foreground (or background) pixels. Defaults to 0.5.
+            threshold (float, optional): foreground threshold on masks values in
+                [0, 1] (uint8 masks are in [0, 255]). Defaults to 0.5.
+        """
+        assert masks.ndim == 5, "masks must be (N, T, H, W, 1)"
+        assert (
+            0.0 <= foreground_fraction <= 1.0
+        ), "foreground_fraction must be in [0, 1]"
+
+        self.nr_cameras, self.temporal_dim, self.height, self.width = masks.shape[:4]
+        self.foreground_fraction = foreground_fraction
+        self.device = masks.device
+
+        if masks.dtype == torch.uint8:
+            threshold = threshold * 255
+        foreground = masks[..., 0].reshape(-1, self.height * self.width) > threshold
+
+        self.foreground = self._compact(foreground)
+        self.background = self._compact(~foreground)
+
+    @staticmethod
+    def _compact(selected: torch.Tensor) -> dict:
+        """compacts the selected pixels (nr_frames, nr_pixels) of each frame in
+        a contiguous list"""
+        counts = selected.sum(dim=1)  # (N * T)
+        offsets = torch.cumsum(counts, dim=0) - counts  # (N * T)
+        frames = torch.nonzero(counts).squeeze(-1)  # frames with pixels
+        return {
+            # pixels indices, sorted by frame
+            "pixels": torch.nonzero(selected)[:, 1].int(),
+            "frames": frames,
+            "offsets": offsets[frames],
+            "counts": counts[frames],
+        }
+
+    def _sample_from(
+        self, compacted: dict, batch_size: int
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """samples a frame with selected pixels uniformly, then one of its pixels"""
+        if batch_size == 0:
+            empty = torch.zeros(0, dtype=torch.long, device=self.device)
+            return empty, empty.int()
+        idx = torch.randint(
+            0, len(compacted["frames"]), (batch_size,), device=self.device
+        )
+        offsets = torch.rand(batch_size, device=self.device) * compacted["counts"][idx]
+        pixels = compacted["pixels"][compacted["offsets"][idx] + offsets.long()]
+        return compacted["frames"][idx], pixels
+
+    @torch.no_grad()
+    def sample(
+        self, batch_size: int
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """samples round(foreground_fraction * batch_size) foreground rays
+        followed by background rays
+
+        Args:
+            batch_size (int): number of samples
+
+        Returns:
+            cameras_idx (torch.Tensor, int32): (batch_size)
+            frames_idx (torch.Tensor, int32): (batch_size)
+            pixels (torch.Tensor, int32): (batch_size, 2) with values in [0, W-1], [0, H-1]
+        """
+        nr_foreground = round(self.foreground_fraction * batch_size)
+        if len(self.foreground["frames"]) == 0:
+            nr_foreground = 0
+        elif len(self.background["frames"]) == 0:
+            nr_foreground = batch_size
+
+        frames_fg, pixels_fg = self._sample_from(self.foreground, nr_foreground)
+        frames_bg, pixels_bg = self._sample_from(
+            self.background, batch_size - nr_foreground
+        )
+        frames = torch.cat([frames_fg, frames_bg])
+        pixels = torch.cat([pixels_fg, pixels_bg])
+
+        cameras_idx = (frames // self.temporal_dim).int()
+        frames_idx = (frames % self.temporal_dim).int()
+        pixels = torch.stack([pixels % self.width, pixels // self.width], dim=-1)
+        return cameras_idx, frames_idx, pixels
+
+    def __str__(self) -> str:
+        nr_foreground = len(self.foreground["pixels"])
+        nr_pixels = nr_foreground + len(self.background["pixels"])
+        return f"MaskSampler with {nr_foreground}/{nr_pixels} foreground pixels, sampling {self.foreground_fraction:.0%} of rays from the foreground"
+
+
+class EpochSampler:
+
+    def __init__(
+        self,
+        nr_cameras: int,
+        temporal_dim: int,
+        height: int,
+        width: int,
+        nr_rounds: int = 4,
+        device: str = "cpu",
+    ):
+        """Sampler of rays without replacement: batches walk a random permutation
+        of all (camera, frame, pixel) rays, so that each ray is sampled once per
+        epoch (a batch can span two epochs).
+
+        The permutation is not materialized, positions are mapped to rays by a
+        keyed Feistel network (a bijection of a power of two range, values out
+        of range are mapped again until in range), with new keys each epoch.
+
+        Args:
+            nr_cameras (int): number of cameras
+            temporal_dim (int): number of frames per camera
+            height (int): frames height (of the sampled mip level)
+            width (int): frames width (of the sampled mip level)
+            nr_rounds (int, optional): Feistel network rounds. Defaults to 4.
+            device (str, optional): Defaults to "cpu".
+        """
+        assert nr_rounds > 0, "nr_rounds must be > 0"
+
+        self.nr_cameras = nr_cameras
+        self.temporal_dim = temporal_dim
+        self.height = height
+        self.width = width
+        self.nr_rounds = nr_rounds
+        self.device = device
+        self.nr_rays = nr_cameras * temporal_dim * height * width
+
+        # permuted range is [0, 2^(2 * half_bits)), at most 4 times nr_rays
+        self.half_bits = max(1, math.ceil(math.log2(self.nr_rays) / 2))
+        self.half_mask = 2**self.half_bits - 1
+
+        self.epoch = -1
+        self.position = 0
+        self._new_epoch()
+
+    def _new_epoch(self):
+        self.epoch += 1
+        self.position = 0
+        self.keys = torch.randint(
+            0, 2**31, (self.nr_rounds,), dtype=torch.long, device=self.device
+        ).tolist()
+
+    def _feistel(self, x: torch.Tensor) -> torch.Tensor:
+        """bijection of [0, 2^(2 * half_bits))"""
+        left = x >> self.half_bits
+        right = x & self.half_mask
+        for key in self.keys:
+            # integer hash of the right half (masked, so int64 products
+            # do not overflow)
+            f = (right * 0x2545F491 + key) & 0xFFFFFFFF
+            f = ((f ^ (f >> 15)) * 0x27D4EB2F) & 0xFFFFFFFF
+            f = f ^ (f >> 13)
+            left, right = right, (left ^ f) & self.half_mask
+        return (left << self.half_bits) | right
+
+    def permute(self, positions: torch.Tensor) -> torch.Tensor:
+        """maps positions in [0, nr_rays) of the current epoch to rays indices
+
+        Args:
+            positions (torch.Tensor, long): (N) positions
+
+        Returns:
+            torch.Tensor: (N) rays indices in [0, nr_rays)
+        """
+        rays = self._feistel(positions)
+        # cycle walking, stays a permutation of [0, nr_rays)
+        out_of_range = rays >= self.nr_rays
+        while out_of_range.any():
+            rays[out_of_range] = self._feistel(rays[out_of_range])
+            out_of_range = rays >= self.nr_rays
+        return rays
+
+    @torch.no_grad()
+    def sample(
+        self, batch_size: int
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        """returns the next batch_size rays of the epoch permutation
+
+        Args:
+            batch_size (int): number of samples
+
+        Returns:
+            cameras_idx (torch.Tensor, int32): (batch_size)
+            frames_idx (torch.Tensor, int32): (batch_size)
+            pixels (torch.Tensor, int32): (batch_size, 2) with values in [0, W-1], [0, H-1]
+        """
+        rays = []
+        while batch_size > 0:
+            if self.position == self.nr_rays:
+                self._new_epoch()
+            end = min(self.position + batch_size, self.nr_rays)
+            positions = torch.arange(
+                self.position, end, dtype=torch.long, device=self.device
+            )
+            rays.append(self.permute(positions))
+            batch_size -= end - self.position
+            self.position = end
+        rays = torch.cat(rays)
+
+        # unravel rays indices
+        x = rays % self.width
+        rays = rays // self.width
+        y = rays % self.height
+        rays = rays // self.height
+        frames_idx = rays % self.temporal_dim
+        cameras_idx = rays // self.temporal_dim
+        pixels = torch.stack([x, y], dim=-1).int()
+        return cameras_idx.int(), frames_idx.int(), pixels
+
+    def __len__(self) -> int:
+        # returns the number of rays per epoch
+        return self.nr_rays
+
+    def __str__(self) -> str:
+        return f"EpochSampler of {self.nr_rays} rays (nr_cameras: {self.nr_cameras}, temporal_dim: {self.temporal_dim}, width: {self.width}, height: {self.height}), epoch {self.epoch}, position {self.position}"
@@ -1,7 +1,24 @@
 import os
+import atexit
+import bisect
+import weakref
+import threading
 import subprocess
-from typing import Optional
+from collections import OrderedDict
+import cv2 as cv
+import numpy as np
+from typing import List, Optional, Tuple, Union
 from pathlib import Path
+from tqdm import tqdm
+from mvdatasets.io.decoding import resize_image, get_decode_pool
+from mvdatasets.io.modality_storage import ModalityBuffer
+from mvdatasets.utils.loader_utils import get_subsampled_resolution
+
+# number of frames a VideoReader decodes forward before falling back to seeking
+MAX_GRAB_FRAMES = 32
+
+# number of VideoReaders each thread keeps open (least recently used are closed)
+MAX_OPEN_VIDEO_READERS = 8
 
 
 def extract_frames(
@@ -38,3 +55,320 @@ def extract_frames(
     height = h // subsample_factor
     command = f"ffmpeg -i {video_path} -vf \"select='not(mod(n,{skip_time}))',scale=-1:{height}\" -vsync vfr -ss {start_time} {to_str} {output_path}/%05d.{ext}"
     subprocess.call(command, shell=True)
+
+
+class VideoReader:
+    """streaming video decoder with random access by frame index.
+
+    Frames are decoded in-process (OpenCV / FFmpeg backend), no frames are
+    written to disk. Consecutive reads decode forward from the current
+    position, reads far ahead or backwards seek to the closest keyframe
+    preceding the requested frame and decode forward from there. Keyframes
+    are indexed on the first seek (packets are demuxed, not decoded).
+    """
+
+    def __init__(self, video_path: Union[str, Path]):
+        """
+        Args:
+            video_path (str or Path): video file path.
+        """
+        self.video_path = Path(video_path)
+        if not self.video_path.exists():
+            raise FileNotFoundError(f"video {self.video_path} does not exist")
+        self._capture = self._open()
+        self.width = int(self._capture.get(cv.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._capture.get(cv.CAP_PROP_FRAME_HEIGHT))
+        self.fps = float(self._capture.get(cv.CAP_PROP_FPS))
+        self.nr_frames = int(self._capture.get(cv.CAP_PROP_FRAME_COUNT))
+        # index of the last decoded frame
+        self._frame_idx = -1
+        # keyframes indices and frames timestamps (ms), built on first seek
+        self._keyframes = None
+        self._frames_msec = None
+
+    def __len__(self) -> int:
+        return self.nr_frames
+
+    def __enter__(self) -> "VideoReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._capture.release()
+
+    def _open(self) -> cv.VideoCapture:
+        capture = cv.VideoCapture(str(self.video_path))
+        if not capture.isOpened():
+            raise ValueError(f"could not open video {self.video_path}")
+        return capture
+
+    def _build_keyframes_index(self) -> None:
+        keyframes = [0]
+        frames_msec = None
+        # raw mode returns encoded packets, flagging keyframes (FFmpeg backend)
+        capture = cv.VideoCapture(
+            str(self.video_path), cv.CAP_FFMPEG, [cv.CAP_PROP_FORMAT, -1]
+        )
+        if capture.isOpened():
+            packets_msec, packets_key = [], []
+            while capture.grab():
+                packets_msec.append(capture.get(cv.CAP_PROP_POS_MSEC))
+                packets_key.append(capture.get(cv.CAP_PROP_LRF_HAS_KEY_FRAME) > 0)
+            capture.release()
+            if len(packets_msec) == self.nr_frames:
+                # packets are in decoding order, frames in presentation order
+                order = np.argsort(packets_msec, kind="stable")
+                frames_msec = np.asarray(packets_msec)[order]
+                keyframes = [
+                    frame_idx
+                    for frame_idx, packet_idx in enumerate(order)
+                    if packets_key[packet_idx]
+                ]
+        # without an index, random access decodes from the first frame
+        self._keyframes = keyframes if len(keyframes) > 0 else [0]
+        self._frames_msec = frames_msec
+
+    def _seek_keyframe(self, keyframe_idx: int) -> None:
+        if keyframe_idx > 0:
+            self._capture.set(cv.CAP_PROP_POS_FRAMES, keyframe_idx)
+            # CAP_PROP_POS_FRAMES is not frame-accurate on every container,
+            # check the decoded frame timestamp against the index
+            if self._capture.grab():
+                frame_msec = self._capture.get(cv.CAP_PROP_POS_MSEC)
+                tolerance = 500.0 / self.fps if self.fps > 0 else 1e-3
+                if abs(frame_msec - self._frames_msec[keyframe_idx]) < tolerance:
+                    self._frame_idx = keyframe_idx
+                    return
+        # rewind by reopening the video
+        self._capture.release()
+        self._capture = self._open()
+        self._frame_idx = -1
+
+    def _grab(self) -> None:
+        if not self._capture.grab():
+            raise IndexError(
+                f"frame {self._frame_idx + 1} out of range for video {self.video_path}"
+            )
+        self._frame_idx += 1
+
+    def _seek(self, frame_idx: int) -> None:
+        if frame_idx < self._frame_idx or (
+            frame_idx - self._frame_idx > MAX_GRAB_FRAMES
+        ):
+            if self._keyframes is None:
+                self._build_keyframes_index()
+            keyframe_idx = self._keyframes[
+                bisect.bisect_right(self._keyframes, frame_idx) - 1
+            ]
+            # jump to closest keyframe (if behind or ahead of the current frame)
+            if frame_idx < self._frame_idx or keyframe_idx > self._frame_idx:
+                self._seek_keyframe(keyframe_idx)
+        # decode forward to frame_idx (the current frame is retrieved again)
+        while self._frame_idx < frame_idx:
+            self._grab()
+
+    def read_frame(self, frame_idx: int, subsample_factor: int = 1) -> np.ndarray:
+        """decodes a single frame
+
+        Args:
+            frame_idx (int): frame index
+            subsample_factor (int, optional): if > 1, the frame is resized to the
+                subsampled resolution (see get_subsampled_resolution). Defaults to 1.
+
+        Returns:
+            np.ndarray: (H, W, 3) RGB frame, uint8
+        """
+        if frame_idx < 0 or frame_idx >= self.nr_frames:
+            raise IndexError(
+                f"frame {frame_idx} out of range for video {self.video_path} "
+                f"with {self.nr_frames} frames"
+            )
+        self._seek(frame_idx)
+        ret, frame_bgr = self._capture.retrieve()
+        if not ret:
+            raise IndexError(
+                f"frame {frame_idx} out of range for video {self.video_path}"
+            )
+        frame_rgb = cv.cvtColor(frame_bgr, cv.COLOR_BGR2RGB)
+        width, height = get_subsampled_resolution(
+            self.width, self.height, subsample_factor
+        )
+        return resize_image(frame_rgb, width, height)
+
+    def read_frames(
+        self,
+        frames_idxs: Optional[List[int]] = None,
+        out: Optional[np.ndarray] = None,
+        subsample_factor: int = 1,
+    ) -> np.ndarray:
+        """decodes frames in a single forward pass over the video
+
+        Args:
+            frames_idxs (list, optional): sorted frames indices. Defaults to None (all).
+            out (np.ndarray, optional): (N, H, W, 3) preallocated output
+                (e.g. memory-mapped). Defaults to None (RAM).
+            subsample_factor (int, optional): if > 1, frames are resized to the
+                subsampled resolution (see get_subsampled_resolution). Defaults to 1.
+
+        Returns:
+            np.ndarray: (N, H, W, 3) RGB frames, uint8
+        """
+        if frames_idxs is None:
+            frames_idxs = range(self.nr_frames)
+        if out is None:
+            width, height = get_subsampled_resolution(
+                self.width, self.height, subsample_factor
+            )
+            out = np.empty((len(frames_idxs), height, width, 3), dtype=np.uint8)
+        for i, frame_idx in enumerate(frames_idxs):
+            out[i] = self.read_frame(frame_idx, subsample_factor=subsample_factor)
+        return out
+
+
+class _VideoReadersCache:
+    """least recently used VideoReaders opened by a thread"""
+
+    def __init__(self, max_readers: int = MAX_OPEN_VIDEO_READERS):
+        self.max_readers = max_readers
+        self._readers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, video_path: str) -> VideoReader:
+        with self._lock:
+            reader = self._readers.pop(video_path, None)
+            if reader is None:
+                reader = VideoReader(video_path)
+            self._readers[video_path] = reader
+            while len(self._readers) > self.max_readers:
+                _, evicted = self._readers.popitem(last=False)
+                evicted.close()
+        return reader
+
+    def release(self) -> None:
+        with self._lock:
+            readers = list(self._readers.values())
+            self._readers.clear()
+        for reader in readers:
+            reader.close()
+
+    def __del__(self):
+        # the owning thread exited
+        self.release()
+
+
+# per-thread open video readers, so that consecutive reads of the
+# same video decode forward instead of re-opening the file
+_video_readers = threading.local()
+# caches of all threads, released by release_video_readers
+_video_readers_caches = weakref.WeakSet()
+_video_readers_caches_lock = threading.Lock()
+
+
+def get_video_reader(video_path: Union[str, Path]) -> VideoReader:
+    """returns the calling thread VideoReader for video_path (opened on first use,
+    each thread keeps at most MAX_OPEN_VIDEO_READERS open)"""
+    cache = getattr(_video_readers, "cache", None)
+    if cache is None:
+        cache = _video_readers.cache = _VideoReadersCache()
+        with _video_readers_caches_lock:
+            _video_readers_caches.add(cache)
+    return cache.get(str(video_path))
+
+
+def release_video_readers() -> None:
+    """closes the VideoReaders opened by all threads (see get_video_reader),
+    they are reopened on the next read"""
+    with _video_readers_caches_lock:
+        caches = list(_video_readers_caches)
+    for cache in caches:
+        cache.release()
+
+
+atexit.register(release_video_readers)
+
+
+def read_video_frame(
+    source: Tuple[Union[str, Path], int], subsample_factor: int = 1
+) -> np.ndarray:
+    """decodes a single video frame, to be used as LazyFrames decode function
+
+    Args:
+        source (tuple): (video_path, frame_idx)
+        subsample_factor (int, optional): see VideoReader.read_frame. Defaults to 1.
+
+    Returns:
+        np.ndarray: (H, W, 3) RGB frame, uint8
+    """
+    video_path, frame_idx = source
+    return get_video_reader(video_path).read_frame(
+        int(frame_idx), subsample_factor=subsample_factor
+    )
+
+
+def read_videos_frames(
+    videos_paths: List[Union[str, Path]],
+    nr_frames: int,
+    subsample_factor: int = 1,
+    nr_workers: Optional[int] = None,
+    desc: Optional[str] = None,
+    out_path: Optional[Union[str, Path]] = None,
+    shared: bool = False,
+) -> np.ndarray:
+    """decodes the first nr_frames of multiple videos in parallel, one video per
+    worker, each worker writes its frames directly into the preallocated output
+
+    Args:
+        videos_paths (list): ordered list of videos (with the same resolution)
+        nr_frames (int): number of frames to decode from each video
+        subsample_factor (int, optional): see VideoReader.read_frame. Defaults to 1.
+        nr_workers (int, optional): number of workers. Defaults to None (all cores).
+        desc (str, optional): progress bar description, if None, no progress bar.
+        out_path (str or Path, optional): if given, frames are written to this
+            .npy file and returned memory-mapped. Defaults to None (RAM).
+        shared (bool, optional): if True and out_path is None, frames are written
+            to shared memory (see empty_shared). Defaults to False.
+
+    Returns:
+        np.ndarray: (N, T, H, W, 3) RGB frames, uint8
+    """
+    if len(videos_paths) == 0:
+        raise ValueError("no videos to decode")
+
+    with VideoReader(videos_paths[0]) as video_reader:
+        resolution = (video_reader.width, video_reader.height)
+    width, height = get_subsampled_resolution(*resolution, subsample_factor)
+    out = ModalityBuffer(
+        len(videos_paths),
+        out_path=out_path,
+        frame_shape=(nr_frames, height, width, 3),
+        dtype=np.uint8,
+        shared=shared,
+    )
+
+    def _read_video_into(i: int) -> None:
+        with VideoReader(videos_paths[i]) as video_reader:
+            if (video_reader.width, video_reader.height) != resolution:
+                raise ValueError(
+                    f"{videos_paths[i]} resolution differs from {videos_paths[0]}"
+                )
+            video_reader.read_frames(
+                range(nr_frames),
+                out=out.frame_view(i),
+                subsample_factor=subsample_factor,
+            )
+
+    pool = get_decode_pool(nr_workers)
+    # consume results to wait for all videos (and raise errors)
+    list(
+        tqdm(
+            pool.map(_read_video_into, range(len(videos_paths))),
+            total=len(videos_paths),
+            desc=desc,
+            ncols=100,
+            disable=desc is None,
+        )
+    )
+
+    return out.finalize()
@@ -29,7 +29,6 @@ setup(
         "open3d>=0.18.0",
         "rich>=13.8.1",
         "tyro>=0.9.11",
-        "pycolmap@git+https://github.com/rmbrualla/pycolmap@cc7ea4b7301720ac29287dbe450952511b32125e",
     ],
     extras_require={
         "tests": [
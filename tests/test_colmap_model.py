@@ -0,0 +1,131 @@
+import unittest
+import struct
+import tempfile
+import numpy as np
+from pathlib import Path
+from mvdatasets.io.colmap_model import read_model, get_w2c_mats, get_camera_params
+
+
+def write_colmap_model(colmap_dir: Path, cameras, images, points):
+    # binary
+    with open(colmap_dir / "cameras.bin", "wb") as f:
+        f.write(struct.pack("<Q", len(cameras)))
+        for camera_id, model_id, width, height, params in cameras:
+            f.write(struct.pack("<iiQQ", camera_id, model_id, width, height))
+            f.write(struct.pack(f"<{len(params)}d", *params))
+    with open(colmap_dir / "images.bin", "wb") as f:
+        f.write(struct.pack("<Q", len(images)))
+        for image_id, qvec, tvec, camera_id, name, nr_points2d in images:
+            f.write(struct.pack("<i7di", image_id, *qvec, *tvec, camera_id))
+            f.write(name.encode("utf-8") + b"\x00")
+            f.write(struct.pack("<Q", nr_points2d))
+            for j in range(nr_points2d):
+                f.write(struct.pack("<ddq", j, j, -1))
+    with open(colmap_dir / "points3D.bin", "wb") as f:
+        f.write(struct.pack("<Q", len(points)))
+        for point_id, xyz, rgb, error, track in points:
+            f.write(struct.pack("<Q3d3BdQ", point_id, *xyz, *rgb, error, len(track)))
+            for image_id, point2d_idx in track:
+                f.write(struct.pack("<ii", image_id, point2d_idx))
+    # text
+    models_names = {0: "SIMPLE_PINHOLE", 1: "PINHOLE", 4: "OPENCV"}
+    text_dir = colmap_dir / "text"
+    text_dir.mkdir()
+    with open(text_dir / "cameras.txt", "w") as f:
+        f.write("# Camera list\n")
+        for camera_id, model_id, width, height, params in cameras:
+            params_str = " ".join(str(p) for p in params)
+            f.write(
+                f"{camera_id} {models_names[model_id]} {width} {height} {params_str}\n"
+            )
+    with open(text_dir / "images.txt", "w") as f:
+        f.write("# Image list\n")
+        for image_id, qvec, tvec, camera_id, name, nr_points2d in images:
+            pose_str = " ".join(str(v) for v in list(qvec) + list(tvec))
+            f.write(f"{image_id} {pose_str} {camera_id} {name}\n")
+            f.write(" ".join(f"{j} {j} -1" for j in range(nr_points2d)) + "\n")
+    with open(text_dir / "points3D.txt", "w") as f:
+        f.write("# 3D point list\n")
+        for point_id, xyz, rgb, error, track in points:
+            values = [point_id, *xyz, *rgb, error] + [v for elem in track for v in elem]
+            f.write(" ".join(str(v) for v in values) + "\n")
+
+
+class TestColmapModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.colmap_dir = Path(self.tmp_dir.name)
+        rng = np.random.default_rng(0)
+        self.cameras = [
+            (1, 1, 64, 48, [50.0, 51.0, 32.0, 24.0]),
+            (2, 4, 64, 48, [50.0, 51.0, 32.0, 24.0, 0.1, 0.2, 0.01, 0.02]),
+        ]
+        self.images = []
+        for i in range(4):
+            qvec = rng.normal(size=4)
+            qvec /= np.linalg.norm(qvec)
+            tvec = rng.normal(size=3)
+            self.images.append((i + 1, qvec, tvec, 1 + i % 2, f"img_{i}.png", i))
+        self.points = []
+        for i in range(5):
+            track = [(j + 1, j) for j in range(i)]
+            self.points.append(
+                (i + 10, rng.normal(size=3), (i, 2 * i, 3 * i), 0.5 * i, track)
+            )
+        write_colmap_model(self.colmap_dir, self.cameras, self.images, self.points)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_model(self):
+        for colmap_dir in [self.colmap_dir, self.colmap_dir / "text"]:
+            cameras, images, points = read_model(colmap_dir, load_tracks=True)
+            self.assertEqual(cameras[2]["model"], "OPENCV")
+            self.assertEqual((cameras[2]["width"], cameras[2]["height"]), (64, 48))
+            self.assertEqual(images["names"], [image[4] for image in self.images])
+            self.assertTrue(np.array_equal(images["camera_ids"], [1, 2, 1, 2]))
+            self.assertTrue(
+                np.allclose(images["qvecs"], [image[1] for image in self.images])
+            )
+            self.assertTrue(
+                np.allclose(images["tvecs"], [image[2] for image in self.images])
+            )
+            self.assertTrue(np.array_equal(points["ids"], np.arange(10, 15)))
+            self.assertTrue(
+                np.allclose(points["xyz"], [point[1] for point in self.points])
+            )
+            self.assertEqual(points["rgb"].dtype, np.uint8)
+            self.assertTrue(np.array_equal(points["rgb"][3], [3, 6, 9]))
+            self.assertTrue(np.allclose(points["errors"], 0.5 * np.arange(5)))
+            self.assertTrue(np.array_equal(points["tracks_lengths"], np.arange(5)))
+            self.assertTrue(
+                np.array_equal(points["tracks"][-4:], [[1, 0], [2, 1], [3, 2], [4, 3]])
+            )
+
+    def test_skip_points(self):
+        _, _, points = read_model(self.colmap_dir, load_points=False)
+        self.assertIsNone(points)
+        _, _, points = read_model(self.colmap_dir)
+        self.assertNotIn("tracks", points)
+
+    def test_get_w2c_mats(self):
+        _, images, _ = read_model(self.colmap_dir, load_points=False)
+        w2c_mats = get_w2c_mats(images)
+        self.assertEqual(w2c_mats.shape, (4, 4, 4))
+        rots = w2c_mats[:, :3, :3]
+        self.assertTrue(np.allclose(rots @ rots.transpose(0, 2, 1), np.eye(3)))
+        self.assertTrue(np.allclose(w2c_mats[:, :3, 3], images["tvecs"]))
+
+    def test_get_camera_params(self):
+        cameras, _, _ = read_model(self.colmap_dir, load_points=False)
+        intrinsics, params, camtype = get_camera_params(cameras[1])
+        self.assertTrue(np.allclose(intrinsics, [[50, 0, 32], [0, 51, 24], [0, 0, 1]]))
+        self.assertEqual(len(params), 0)
+        _, params, camtype = get_camera_params(cameras[2])
+        self.assertTrue(np.allclose(params, [0.1, 0.2, 0.01, 0.02]))
+        self.assertEqual(camtype, "perspective")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import torch
+import numpy as np
+from torch.utils.data import BatchSampler, DataLoader, SequentialSampler
+from torch.utils.data import default_collate
+from mvdatasets import DataSplit
+from tests.utils import get_intrinsics, make_cameras
+
+
+class TestDataSplit(unittest.TestCase):
+
+    def setUp(self):
+        # per camera intrinsics and timestamps
+        self.cameras, self.rgbs, self.masks = make_cameras(
+            intrinsics=get_intrinsics(8, 12) * np.arange(1, 4)[:, None, None],
+            timestamps=np.arange(2) + np.arange(3)[:, None],
+            with_masks=True,
+        )
+
+    def _assert_batch_equal(self, batch, reference):
+        self.assertEqual(batch.keys(), reference.keys())
+        for key, val in reference.items():
+            self.assertEqual(batch[key].shape, val.shape, key)
+            self.assertEqual(batch[key].dtype, val.dtype, key)
+            self.assertTrue(torch.equal(batch[key], val), key)
+
+    def test_getitems(self):
+        for index_pixels in [False, True]:
+            split = DataSplit(
+                self.cameras, modalities=["rgbs", "masks"], index_pixels=index_pixels
+            )
+            idxs = np.random.default_rng(0).integers(0, len(split), size=16)
+            # same as collating __getitem__ samples
+            reference = default_collate([split[int(idx)] for idx in idxs])
+            self._assert_batch_equal(split.get_batch(idxs.tolist()), reference)
+            self._assert_batch_equal(split[torch.from_numpy(idxs)], reference)
+            # batches can still be collated sample by sample
+            batch = split.__getitems__(idxs.tolist())
+            self.assertEqual(len(batch), 16)
+            self._assert_batch_equal(default_collate(batch), reference)
+            self._assert_batch_equal(DataSplit.collate_fn(batch), reference)
+
+    def test_dataloader(self):
+        split = DataSplit(self.cameras, modalities=["rgbs"], index_pixels=True)
+        reference = default_collate([split[idx] for idx in range(64)])
+        # auto-batching calls __getitems__
+        data_loader = DataLoader(split, batch_size=64, collate_fn=DataSplit.collate_fn)
+        self._assert_batch_equal(next(iter(data_loader)), reference)
+        data_loader = DataLoader(split, batch_size=64)
+        self._assert_batch_equal(next(iter(data_loader)), reference)
+        # batch sampler as sampler, no auto-batching
+        data_loader = DataLoader(
+            split,
+            sampler=BatchSampler(SequentialSampler(split), 64, drop_last=False),
+            batch_size=None,
+        )
+        self._assert_batch_equal(next(iter(data_loader)), reference)
+
+    def test_static_tensors(self):
+        split = DataSplit(self.cameras, modalities=["rgbs"])
+        sample_a, sample_b = split[0], split[3]
+        for key in ["intrinsics", "intrinsics_inv", "c2w", "w2c", "timestamps"]:
+            self.assertEqual(sample_a[key].dtype, torch.float32, key)
+            # views of the per-camera tensors
+            self.assertEqual(
+                sample_a[key].untyped_storage().data_ptr(),
+                sample_b[key].untyped_storage().data_ptr(),
+                key,
+            )
+        self.assertTrue(
+            torch.equal(
+                sample_a["intrinsics"],
+                torch.from_numpy(self.cameras[0].get_intrinsics()).float(),
+            )
+        )
+        self.assertEqual(sample_b["timestamps"].item(), 2.0)
+        # pixels grid is built once
+        self.assertIs(sample_a["pixels"], sample_b["pixels"])
+        self.assertEqual(sample_a["pixels"].dtype, torch.long)
+        split.set_mip_level(0)
+        self.assertTrue(torch.equal(split[0]["pixels"], sample_a["pixels"]))
+
+        split = DataSplit(self.cameras, modalities=["rgbs"], return_pixels=False)
+        self.assertNotIn("pixels", split[0])
+        self.assertNotIn("pixels", split.get_batch([0, 1]))
+
+    def test_set_active_frames(self):
+        split = DataSplit(self.cameras, modalities=["rgbs"], nr_sequence_frames=1)
+        self.assertEqual(len(split), 3)
+        self.assertEqual(split[1]["frames_idxs"].item(), 0)
+        split.set_active_frames(1, start=1)
+        self.assertEqual(len(split), 3)
+        self.assertEqual(split[1]["frames_idxs"].item(), 1)
+        self.assertTrue(
+            torch.equal(split[1]["rgbs"], torch.from_numpy(self.rgbs[1, 1]))
+        )
+        split.set_active_frames(2)
+        self.assertEqual(len(split), 6)
+        self.assertEqual(split[3]["cameras_idxs"].item(), 1)
+        self.assertEqual(split[3]["frames_idxs"].item(), 1)
+        for nr_frames, start in [(0, 0), (3, 0), (2, 1), (1, -1)]:
+            with self.assertRaises(ValueError):
+                split.set_active_frames(nr_frames, start=start)
+
+    def test_set_active_frames_persistent_workers(self):
+        split = DataSplit(self.cameras, modalities=["rgbs"], nr_sequence_frames=1)
+        data_loader = DataLoader(
+            split,
+            batch_size=8,
+            num_workers=1,
+            persistent_workers=True,
+            collate_fn=DataSplit.collate_fn,
+        )
+        batches = list(data_loader)
+        self.assertEqual(batches[0]["frames_idxs"].tolist(), [0, 0, 0])
+        # workers are not restarted, but index the new window
+        split.set_active_frames(2)
+        batches = list(data_loader)
+        self.assertEqual(batches[0]["frames_idxs"].tolist(), [0, 1, 0, 1, 0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
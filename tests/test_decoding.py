@@ -0,0 +1,153 @@
+import unittest
+import tempfile
+import threading
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from functools import partial
+from mvdatasets import Camera
+from mvdatasets.io.decoding import (
+    decode_images,
+    decode_rgba_images,
+    load_image,
+    get_decode_pool,
+)
+from mvdatasets.utils.images import load_rgb_from_rgba, load_mask_from_rgba
+from mvdatasets.utils.loader_utils import subsample_intrinsics
+
+
+class TestDecodingFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        rng = np.random.default_rng(0)
+        self.imgs = rng.integers(0, 256, size=(8, 6, 5, 4), dtype=np.uint8)
+        self.paths = []
+        for i, img in enumerate(self.imgs):
+            path = self.tmp_path / f"{i:03d}.png"
+            Image.fromarray(img, mode="RGBA").save(path)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_image(self):
+        img = load_image(self.paths[0])
+        self.assertEqual(img.dtype, np.uint8)
+        self.assertTrue(np.array_equal(img, self.imgs[0]))
+
+        # conversion drops alpha
+        img = load_image(self.paths[0], channels="RGB")
+        self.assertTrue(np.array_equal(img, self.imgs[0, ..., :3]))
+
+        # grayscale images get a channel dimension
+        img = load_image(self.paths[0], channels="L")
+        self.assertEqual(img.shape, (6, 5, 1))
+
+    def test_load_image_subsampled(self):
+        # same result as decoding at full resolution and resizing the camera
+        path = self.tmp_path / "img.png"
+        Image.fromarray(self.imgs[:4].reshape(12, 10, 4)[..., :3]).save(path)
+        intrinsics = np.array([[10.0, 0, 5.0], [0, 10.0, 6.0], [0, 0, 1]])
+        camera = Camera(
+            intrinsics=intrinsics,
+            pose=np.eye(4),
+            rgbs=load_image(path)[None],
+            subsample_factor=2,
+        )
+        img = load_image(path, subsample_factor=2)
+        self.assertTrue(np.array_equal(img, camera.get_rgbs()[0]))
+        intrinsics, width, height = subsample_intrinsics(intrinsics, 10, 12, 2)
+        self.assertEqual((width, height), (camera.width, camera.height))
+        self.assertTrue(np.allclose(intrinsics, camera.get_intrinsics()))
+
+        # JPEG images are downscaled while decoding
+        path = self.tmp_path / "img.jpg"
+        Image.fromarray(np.zeros((64, 48, 3), dtype=np.uint8)).save(path)
+        img = load_image(path, subsample_factor=4)
+        self.assertEqual(img.shape, (16, 12, 3))
+
+    def test_decode_images_order(self):
+        for nr_workers in [1, 3]:
+            imgs = decode_images(self.paths, nr_workers=nr_workers)
+            self.assertEqual(imgs.shape, (8, 6, 5, 4))
+            self.assertEqual(imgs.dtype, np.uint8)
+            self.assertTrue(np.array_equal(imgs, self.imgs))
+
+    def test_decode_images_decode_fn(self):
+        imgs = decode_images(self.paths, decode_fn=partial(load_image, channels="RGB"))
+        self.assertTrue(np.array_equal(imgs, self.imgs[..., :3]))
+
+    def test_decode_images_out_path(self):
+        out_path = self.tmp_path / "rgbs.npy"
+        imgs = decode_images(self.paths, nr_workers=3, out_path=out_path)
+        self.assertIsInstance(imgs, np.memmap)
+        self.assertTrue(np.array_equal(imgs, self.imgs))
+
+    def test_decode_images_shape_mismatch(self):
+        path = self.tmp_path / "small.png"
+        Image.fromarray(self.imgs[0, :3]).save(path)
+        with self.assertRaises(ValueError):
+            decode_images(self.paths + [path])
+
+    def test_decode_rgba_images(self):
+        for subsample_factor in [1, 2]:
+            rgbs, masks = decode_rgba_images(
+                self.paths,
+                white_bg=True,
+                use_binary_mask=True,
+                subsample_factor=subsample_factor,
+                nr_workers=3,
+                rgbs_out_path=self.tmp_path / "rgbs.npy",
+            )
+            self.assertIsInstance(rgbs, np.memmap)
+            # separate contiguous buffers
+            self.assertTrue(rgbs.flags.c_contiguous and masks.flags.c_contiguous)
+            self.assertEqual(rgbs.shape[-1], 3)
+            self.assertEqual(masks.shape[-1], 1)
+            # same frames as decoded one at a time (e.g. lazily)
+            for i, path in enumerate(self.paths):
+                rgb = load_rgb_from_rgba(path, True, subsample_factor)
+                mask = load_mask_from_rgba(path, True, subsample_factor)
+                self.assertTrue(np.array_equal(rgbs[i], rgb))
+                self.assertTrue(np.array_equal(masks[i], mask))
+        rgbs, masks = decode_rgba_images(self.paths, white_bg=False, load_masks=False)
+        self.assertIsNone(masks)
+        self.assertTrue(np.array_equal(rgbs, self.imgs[..., :3]))
+
+    def test_decode_pool(self):
+        # one pool per number of workers
+        pool = get_decode_pool(2)
+        self.assertIs(get_decode_pool(2), pool)
+        self.assertIsNot(get_decode_pool(1), pool)
+        # decoding with another number of workers does not stop running decodes
+        started, release = threading.Event(), threading.Event()
+
+        def _decode_fn(path):
+            started.set()
+            release.wait(timeout=10)
+            return load_image(path)
+
+        results = {}
+        thread = threading.Thread(
+            target=lambda: results.update(
+                imgs=decode_images(self.paths, decode_fn=_decode_fn, nr_workers=2)
+            )
+        )
+        thread.start()
+        started.wait(timeout=10)
+        imgs = decode_images(self.paths, nr_workers=3)
+        release.set()
+        thread.join()
+        self.assertTrue(np.array_equal(imgs, self.imgs))
+        self.assertTrue(np.array_equal(results["imgs"], self.imgs))
+        self.assertIs(get_decode_pool(2), pool)
+
+    def test_decode_images_empty(self):
+        with self.assertRaises(ValueError):
+            decode_images([])
+
+
+if __name__ == "__main__":
+    unittest.main()
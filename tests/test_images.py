@@ -0,0 +1,74 @@
+import unittest
+import tempfile
+import numpy as np
+from PIL import Image
+from pathlib import Path
+from mvdatasets.utils.images import (
+    alpha_composite_uint8,
+    alpha_to_mask,
+    image_uint8_to_float32,
+    image_float32_to_uint8,
+    load_rgb_mask_from_rgba,
+    load_rgb_from_rgba,
+    load_mask_from_rgba,
+)
+
+
+class TestImages(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.rgba = rng.integers(0, 256, size=(10, 8, 12, 4), dtype=np.uint8)
+        # fully transparent and fully opaque pixels
+        self.rgba[:, 0, :, 3] = 0
+        self.rgba[:, 1, :, 3] = 255
+
+    def test_alpha_composite_uint8(self):
+        rgbs = alpha_composite_uint8(self.rgba, white_bg=True)
+        self.assertEqual(rgbs.shape, (10, 8, 12, 3))
+        self.assertEqual(rgbs.dtype, np.uint8)
+        self.assertTrue(np.all(rgbs[:, 0] == 255))
+        self.assertTrue(np.array_equal(rgbs[:, 1], self.rgba[:, 1, :, :3]))
+        # exact rational result (floored)
+        rgb = self.rgba[..., :3].astype(np.int64)
+        alpha = self.rgba[..., 3:].astype(np.int64)
+        expected = (rgb * alpha + 255 * (255 - alpha)) // 255
+        self.assertTrue(np.array_equal(rgbs, expected))
+        # float compositing differs by float32 rounding errors only
+        img = image_uint8_to_float32(self.rgba)
+        img = img[..., :3] * img[..., -1:] + (1 - img[..., -1:])
+        img = image_float32_to_uint8(img)
+        self.assertLessEqual(np.abs(rgbs.astype(np.int64) - img).max(), 1)
+        # single image, black background
+        rgb = alpha_composite_uint8(self.rgba[0], white_bg=False)
+        self.assertTrue(np.array_equal(rgb, self.rgba[0, ..., :3]))
+
+    def test_alpha_to_mask(self):
+        out = np.empty((10, 8, 12, 1), dtype=np.uint8)
+        masks = alpha_to_mask(self.rgba, binary=True, out=out)
+        self.assertIs(masks, out)
+        self.assertTrue(np.array_equal(masks, (self.rgba[..., 3:] > 0) * 255))
+        masks = alpha_to_mask(self.rgba)
+        self.assertTrue(np.array_equal(masks, self.rgba[..., 3:]))
+
+    def test_load_from_rgba(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            img_path = Path(tmp_dir) / "img.png"
+            Image.fromarray(self.rgba[0], mode="RGBA").save(img_path)
+            for binary in [False, True]:
+                for subsample_factor in [1, 2]:
+                    rgb_mask = load_rgb_mask_from_rgba(
+                        img_path, True, binary, subsample_factor
+                    )
+                    rgb = load_rgb_from_rgba(img_path, True, subsample_factor)
+                    mask = load_mask_from_rgba(img_path, binary, subsample_factor)
+                    self.assertEqual(
+                        rgb_mask.shape,
+                        (8 // subsample_factor, 12 // subsample_factor, 4),
+                    )
+                    self.assertTrue(np.array_equal(rgb, rgb_mask[..., :3]))
+                    self.assertTrue(np.array_equal(mask, rgb_mask[..., 3:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
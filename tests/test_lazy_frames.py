@@ -0,0 +1,93 @@
+import unittest
+import tempfile
+import numpy as np
+from PIL import Image
+from pathlib import Path
+from mvdatasets import DataSplit
+from mvdatasets.io.decoding import load_image, load_frames
+from mvdatasets.io.modality_storage import FramesCache, LazyFrames, is_lazy
+from tests.utils import make_camera
+
+
+class TestLazyFrames(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        rng = np.random.default_rng(0)
+        self.rgbs = rng.integers(0, 256, size=(2, 3, 8, 12, 3), dtype=np.uint8)
+        self.paths = []
+        for cam_idx, cam_rgbs in enumerate(self.rgbs):
+            cam_paths = []
+            for frame_idx, rgb in enumerate(cam_rgbs):
+                path = self.tmp_path / f"{cam_idx}_{frame_idx}.png"
+                Image.fromarray(rgb).save(path)
+                cam_paths.append(path)
+            self.paths.append(cam_paths)
+        self.cache = FramesCache(max_bytes=10**6)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_frames_cache(self):
+        frame = np.zeros((4, 4, 1), dtype=np.uint8)
+        cache = FramesCache(max_bytes=2 * frame.nbytes)
+        cache.put("a", frame)
+        cache.put("b", frame)
+        self.assertIsNotNone(cache.get("a"))
+        # "b" is the least recently used
+        cache.put("c", frame)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.nbytes, 2 * frame.nbytes)
+        cache.set_max_bytes(frame.nbytes)
+        self.assertEqual(len(cache), 1)
+
+    def test_lazy_frames(self):
+        frames = LazyFrames(self.paths[0], decode_fn=load_image, cache=self.cache)
+        self.assertEqual(frames.shape, self.rgbs[0].shape)
+        self.assertEqual(frames.dtype, np.uint8)
+        self.assertTrue(np.array_equal(frames[1], self.rgbs[0, 1]))
+        self.assertTrue(np.array_equal(frames[1:2][0], self.rgbs[0, 1]))
+        self.assertTrue(np.array_equal(np.asarray(frames), self.rgbs[0]))
+        frames_idx = np.array([2, 0, 2])
+        i = np.array([1, 2, 3])
+        j = np.array([4, 5, 6])
+        self.assertTrue(
+            np.array_equal(frames[frames_idx, i, j], self.rgbs[0][frames_idx, i, j])
+        )
+        self.assertTrue(np.array_equal(frames[frames_idx], self.rgbs[0][frames_idx]))
+
+    def test_load_frames(self):
+        config = {"lazy_loading": True, "nr_workers": 2, "shared_memory": False}
+        frames = load_frames(self.paths[0], config)
+        self.assertTrue(is_lazy(frames))
+        config["lazy_loading"] = False
+        frames = load_frames(self.paths[0], config)
+        self.assertFalse(is_lazy(frames))
+        self.assertTrue(np.array_equal(frames, self.rgbs[0]))
+
+    def test_camera_resize(self):
+        frames = LazyFrames(self.paths[0], decode_fn=load_image, cache=self.cache)
+        camera = make_camera(frames, subsample_factor=2)
+        reference = make_camera(self.rgbs[0], subsample_factor=2)
+        self.assertTrue(is_lazy(camera.get_rgbs()))
+        self.assertEqual(camera.get_rgbs().shape, reference.get_rgbs().shape)
+        self.assertTrue(
+            np.array_equal(np.asarray(camera.get_rgbs()), reference.get_rgbs())
+        )
+
+    def test_datasplit(self):
+        cameras = [
+            make_camera(LazyFrames(paths, decode_fn=load_image, cache=self.cache))
+            for paths in self.paths
+        ]
+        split = DataSplit(cameras, modalities=["rgbs"])
+        self.assertTrue(is_lazy(split.data["rgbs"]))
+        self.assertGreater(split.get_memory_footprint(), self.rgbs.nbytes)
+        sample = split[4]
+        self.assertTrue(np.array_equal(sample["rgbs"].numpy(), self.rgbs[1, 1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
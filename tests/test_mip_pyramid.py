@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from mvdatasets import Camera, DataSplit, TensorReel
+
+
+class TestMipPyramid(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.rgbs = rng.integers(0, 256, size=(3, 2, 16, 24, 3), dtype=np.uint8)
+        self.masks = rng.integers(0, 256, size=(3, 2, 16, 24, 1), dtype=np.uint8)
+        self.intrinsics = np.array([[20.0, 0, 12.0], [0, 20.0, 8.0], [0, 0, 1]])
+
+    def _make_camera(self, idx, subsample_factor=1, nr_mip_levels=1):
+        return Camera(
+            intrinsics=self.intrinsics,
+            pose=np.eye(4),
+            rgbs=self.rgbs[idx],
+            masks=self.masks[idx],
+            timestamps=np.arange(2, dtype=np.float32),
+            subsample_factor=subsample_factor,
+            nr_mip_levels=nr_mip_levels,
+        )
+
+    def test_camera_mip_levels(self):
+        camera = self._make_camera(0, nr_mip_levels=3)
+        self.assertEqual(camera.get_nr_mip_levels(), 3)
+        self.assertIs(camera.get_mip_level(0)["data"], camera.data)
+        for level in [1, 2]:
+            # same as loading the camera at a lower resolution
+            reference = self._make_camera(0, subsample_factor=2**level)
+            mip_level = camera.get_mip_level(level)
+            self.assertEqual(mip_level["width"], reference.width)
+            self.assertEqual(mip_level["height"], reference.height)
+            self.assertTrue(
+                np.allclose(mip_level["intrinsics"], reference.get_intrinsics())
+            )
+            self.assertTrue(
+                np.allclose(mip_level["intrinsics_inv"], reference.get_intrinsics_inv())
+            )
+            # levels are halved one after the other (rounding errors only)
+            for key in ["rgbs", "masks"]:
+                diff = mip_level["data"][key].astype(np.int64) - reference.data[key]
+                self.assertLessEqual(np.abs(diff).max(), 1)
+        with self.assertRaises(ValueError):
+            camera.get_mip_level(3)
+
+    def test_camera_resize_rebuilds_pyramid(self):
+        camera = self._make_camera(0, nr_mip_levels=2)
+        camera.resize(2)
+        self.assertEqual(camera.get_nr_mip_levels(), 2)
+        self.assertEqual(camera.get_mip_level(1)["width"], 6)
+        self.assertEqual(camera.get_mip_level(1)["height"], 4)
+
+    def test_datasplit_set_mip_level(self):
+        cameras = [self._make_camera(i, nr_mip_levels=2) for i in range(3)]
+        split = DataSplit(cameras, modalities=["rgbs", "masks"])
+        self.assertEqual(split.nr_mip_levels, 2)
+        self.assertEqual(split[0]["rgbs"].shape, (16, 24, 3))
+        split.set_mip_level(1)
+        sample = split[3]
+        self.assertEqual(sample["rgbs"].shape, (8, 12, 3))
+        self.assertEqual(sample["pixels"].shape, (12, 8, 2))
+        mip_level = cameras[1].get_mip_level(1)
+        self.assertTrue(
+            np.array_equal(sample["rgbs"].numpy(), mip_level["data"]["rgbs"][1])
+        )
+        self.assertTrue(
+            np.allclose(sample["intrinsics"].numpy(), mip_level["intrinsics"])
+        )
+        with self.assertRaises(ValueError):
+            split.set_mip_level(2)
+
+    def test_tensorreel_mip_level(self):
+        cameras = [self._make_camera(i, nr_mip_levels=3) for i in range(3)]
+        reel = TensorReel(cameras, device="cpu")
+        self.assertEqual(len(reel.mip_levels), 3)
+        self.assertIs(reel.data, reel.mip_levels[0]["data"])
+        batch = reel.get_next_rays_batch(batch_size=64, mip_level=2)
+        self.assertEqual(batch["vals"]["rgbs"].shape, (64, 3))
+        self.assertEqual(reel.mip_levels[2]["data"]["rgbs"].shape, (3, 2, 4, 6, 3))
+        with self.assertRaises(ValueError):
+            reel.get_next_rays_batch(batch_size=64, mip_level=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
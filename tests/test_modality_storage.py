@@ -0,0 +1,217 @@
+import unittest
+import tempfile
+import numpy as np
+from pathlib import Path
+from mvdatasets import DataSplit, TensorReel, MVDataset
+from mvdatasets.configs.datasets_configs import BlenderConfig
+from mvdatasets.io.modality_storage import (
+    get_memmap_file_path,
+    open_memmap,
+    load_memmap,
+    is_memmap,
+    empty_like_storage,
+    stack_like_storage,
+    get_stacked_view,
+    ModalityBuffer,
+)
+from tests.test_scene_cache import make_blender_scene
+from tests.utils import make_camera
+
+
+class TestModalityStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp_dir.name)
+        rng = np.random.default_rng(0)
+        self.rgbs = rng.integers(0, 256, size=(3, 2, 8, 12, 3), dtype=np.uint8)
+        file_path = self.tmp_path / "rgbs.npy"
+        out = open_memmap(file_path, self.rgbs.shape, self.rgbs.dtype)
+        out[:] = self.rgbs
+        out.flush()
+        del out
+        self.rgbs_memmap = load_memmap(file_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_memmap_file_path(self):
+        config = {"memmap_path": None, "dataset_name": "dtu", "subsample_factor": 1}
+        self.assertIsNone(get_memmap_file_path(config, "scan83", "train", "rgbs"))
+        config["memmap_path"] = self.tmp_path
+        file_path = get_memmap_file_path(config, "scan83", "train", "rgbs")
+        self.assertEqual(file_path.name, "train_rgbs.npy")
+        self.assertEqual(file_path.parent.parent, self.tmp_path / "dtu" / "scan83")
+        # files of scenes loaded with different configs do not collide
+        config["subsample_factor"] = 2
+        other_file_path = get_memmap_file_path(config, "scan83", "train", "rgbs")
+        self.assertNotEqual(file_path, other_file_path)
+
+    def test_load_memmap(self):
+        self.assertTrue(is_memmap(self.rgbs_memmap))
+        self.assertTrue(is_memmap(self.rgbs_memmap[1]))
+        self.assertTrue(np.array_equal(self.rgbs_memmap, self.rgbs))
+        self.assertFalse(is_memmap(self.rgbs))
+
+    def test_empty_like_storage(self):
+        out = empty_like_storage(self.rgbs_memmap, (2, 3))
+        self.assertTrue(is_memmap(out))
+        self.assertEqual(out.dtype, np.uint8)
+        out = empty_like_storage(self.rgbs, (2, 3), np.float32)
+        self.assertFalse(is_memmap(out))
+        self.assertEqual(out.dtype, np.float32)
+
+    def test_stack_like_storage(self):
+        stacked = stack_like_storage([self.rgbs_memmap[0], self.rgbs_memmap[1]])
+        self.assertTrue(is_memmap(stacked))
+        self.assertTrue(np.array_equal(stacked, self.rgbs[:2]))
+
+    def test_get_stacked_view(self):
+        # consecutive and equally spaced views
+        for arrays in [list(self.rgbs), [self.rgbs[0], self.rgbs[2]], [self.rgbs[1]]]:
+            stacked = get_stacked_view(arrays)
+            self.assertTrue(np.shares_memory(stacked, self.rgbs))
+            self.assertTrue(np.array_equal(stacked, np.stack(arrays)))
+        # truncated frames
+        stacked = get_stacked_view([rgbs[:1] for rgbs in self.rgbs])
+        self.assertTrue(np.array_equal(stacked, self.rgbs[:, :1]))
+        stacked = get_stacked_view(list(self.rgbs_memmap))
+        self.assertTrue(is_memmap(stacked))
+        # not equally spaced, reversed, overlapping or from different buffers
+        self.assertIsNone(get_stacked_view([self.rgbs[0], self.rgbs[1], self.rgbs[0]]))
+        self.assertIsNone(get_stacked_view([self.rgbs[1], self.rgbs[0]]))
+        self.assertIsNone(get_stacked_view([self.rgbs[0], self.rgbs[0]]))
+        self.assertIsNone(get_stacked_view([self.rgbs[0], self.rgbs[1].copy()]))
+        self.assertIsNone(get_stacked_view([self.rgbs[0, :, :, :6]] * 2))
+
+    def test_zero_copy_split(self):
+        cameras = [make_camera(rgbs) for rgbs in self.rgbs]
+        split = DataSplit(cameras, modalities=["rgbs"], contiguous=True)
+        self.assertTrue(np.shares_memory(split.data["rgbs"], self.rgbs))
+        reel = TensorReel(cameras, modalities=["rgbs"], device="cpu")
+        self.assertTrue(np.shares_memory(reel.data["rgbs"].numpy(), self.rgbs))
+        # cameras in a different order are copied
+        split = DataSplit(cameras[::-1], modalities=["rgbs"])
+        self.assertFalse(np.shares_memory(split.data["rgbs"], self.rgbs))
+        self.assertTrue(np.array_equal(split.data["rgbs"], self.rgbs[::-1]))
+
+    def test_modality_buffer(self):
+        # allocated on first write
+        buffer = ModalityBuffer(3)
+        self.assertIsNone(buffer.shape)
+        buffer[1] = self.rgbs[1]
+        self.assertEqual(buffer.shape, self.rgbs.shape)
+        with self.assertRaises(ValueError):
+            buffer[0] = self.rgbs[0, :1]
+        with self.assertRaises(ValueError):
+            buffer.finalize()
+        buffer[0] = self.rgbs[0]
+        buffer.frame_view(2)[:] = self.rgbs[2]
+        out = buffer.finalize()
+        self.assertFalse(is_memmap(out))
+        self.assertTrue(np.array_equal(out, self.rgbs))
+        with self.assertRaises(ValueError):
+            buffer[0] = self.rgbs[0]
+
+        # memory-mapped, missing frames filled
+        out_path = self.tmp_path / "buffer.npy"
+        buffer = ModalityBuffer(
+            3, out_path=out_path, frame_shape=(2, 8, 12, 3), dtype=np.uint8
+        )
+        self.assertEqual(buffer.shape, self.rgbs.shape)
+        buffer[2] = self.rgbs[2]
+        self.assertEqual(buffer.nr_written, 1)
+        out = buffer.finalize(fill_value=0)
+        self.assertTrue(is_memmap(out))
+        self.assertFalse(np.any(out[:2]))
+        self.assertTrue(np.array_equal(out[2], self.rgbs[2]))
+
+        with self.assertRaises(ValueError):
+            ModalityBuffer(3).finalize()
+
+        # overwriting a file does not change arrays mapping it
+        buffer = ModalityBuffer(3, out_path=out_path)
+        for i in range(3):
+            buffer[i] = self.rgbs[i]
+        new_out = buffer.finalize()
+        self.assertTrue(np.array_equal(new_out, self.rgbs))
+        self.assertFalse(np.any(out[:2]))
+        self.assertEqual(
+            sorted(self.tmp_path.iterdir()), [out_path, self.tmp_path / "rgbs.npy"]
+        )
+
+    def test_camera_resize_keeps_storage(self):
+        camera = make_camera(self.rgbs_memmap[0], subsample_factor=2)
+        reference = make_camera(self.rgbs[0], subsample_factor=2)
+        self.assertTrue(is_memmap(camera.get_rgbs()))
+        self.assertTrue(np.array_equal(camera.get_rgbs(), reference.get_rgbs()))
+
+    def test_datasplit_keeps_storage(self):
+        cameras = [make_camera(rgbs) for rgbs in self.rgbs_memmap]
+        split = DataSplit(cameras, modalities=["rgbs"])
+        self.assertTrue(is_memmap(split.data["rgbs"]))
+        self.assertTrue(np.array_equal(split.data["rgbs"], self.rgbs))
+        sample = split[4]
+        self.assertTrue(np.array_equal(sample["rgbs"].numpy(), self.rgbs[2, 0]))
+
+
+class TestMemmapDatasets(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp_dir.name)
+        self.datasets_path = tmp_path / "data"
+        self.memmap_path = tmp_path / "memmap"
+        make_blender_scene(self.datasets_path / "nerf_synthetic" / "lego")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _load(self, subsample_factor, memmap=True):
+        config = BlenderConfig(
+            dataset_name="nerf_synthetic",
+            splits=["train"],
+            memmap_path=self.memmap_path if memmap else None,
+            subsample_factor=subsample_factor,
+        )
+        config.__post__init__()
+        return MVDataset(
+            "nerf_synthetic", "lego", self.datasets_path, config=config.asdict()
+        )
+
+    def test_same_memmap_path(self):
+        mv_data = self._load(subsample_factor=1)
+        rgbs = mv_data.get_split("train")[0].get_rgbs()
+        self.assertTrue(is_memmap(rgbs))
+        reference = np.array(rgbs)
+        # different configs of the same scene
+        other_mv_data = self._load(subsample_factor=2)
+        other_rgbs = other_mv_data.get_split("train")[0].get_rgbs()
+        self.assertTrue(is_memmap(other_rgbs))
+        self.assertEqual(other_rgbs.shape[1:3], (6, 8))
+        self.assertNotEqual(rgbs.filename, other_rgbs.filename)
+        self.assertTrue(np.array_equal(rgbs, reference))
+        # same config, files are replaced while still mapped
+        same_mv_data = self._load(subsample_factor=1)
+        same_rgbs = same_mv_data.get_split("train")[0].get_rgbs()
+        self.assertEqual(rgbs.filename, same_rgbs.filename)
+        self.assertTrue(np.array_equal(rgbs, reference))
+        self.assertTrue(np.array_equal(same_rgbs, reference))
+
+    def test_masked_split_shares_memory(self):
+        # RGB images and masks are decoded to separate split buffers,
+        # so they are stacked without copying
+        for memmap in [False, True]:
+            mv_data = self._load(subsample_factor=1, memmap=memmap)
+            cameras = mv_data.get_split("train")
+            self.assertTrue(cameras[0].has_masks())
+            split = DataSplit(cameras, modalities=["rgbs", "masks"])
+            for camera in cameras:
+                self.assertTrue(np.shares_memory(split.data["rgbs"], camera.get_rgbs()))
+                self.assertTrue(
+                    np.shares_memory(split.data["masks"], camera.get_masks())
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
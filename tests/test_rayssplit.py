@@ -0,0 +1,67 @@
+import unittest
+import torch
+import numpy as np
+from mvdatasets import DataSplit, RaysSplit
+from tests.utils import make_cameras
+
+
+class TestRaysSplit(unittest.TestCase):
+
+    def setUp(self):
+        cameras, self.rgbs, _ = make_cameras(
+            temporal_dim=4, timestamps=np.arange(4, dtype=np.float32) / 4
+        )
+        self.intrinsics = cameras[0].get_intrinsics()
+        self.data_split = DataSplit(cameras, modalities=["rgbs"], index_pixels=True)
+
+    def _assert_valid_batch(self, batch, batch_size):
+        cameras_idx = batch["cameras_idx"].long()
+        frames_idx = batch["frames_idx"].long()
+        self.assertEqual(batch["rays_o"].shape, (batch_size, 3))
+        self.assertEqual(batch["rays_d"].dtype, torch.float32)
+        # rays start at cameras centers
+        self.assertTrue(torch.equal(batch["rays_o"][:, 0], cameras_idx.float()))
+        self.assertTrue(torch.allclose(batch["timestamps"], frames_idx / 4))
+        # cameras are not rotated, project rays directions back to pixels
+        points = batch["rays_d"] @ torch.from_numpy(self.intrinsics).float().T
+        pixels = (points[:, :2] / points[:, 2:]).floor().long()
+        rgbs = self.rgbs[
+            cameras_idx.numpy(),
+            frames_idx.numpy(),
+            pixels[:, 1].numpy(),
+            pixels[:, 0].numpy(),
+        ]
+        self.assertTrue(np.array_equal(batch["vals"]["rgbs"].numpy(), rgbs))
+
+    def test_get_next_rays_batch(self):
+        rays_split = RaysSplit(self.data_split, batch_size=64)
+        # each pixel sampled once on average
+        self.assertEqual(len(rays_split), 3 * 4 * 8 * 12 // 64)
+        self._assert_valid_batch(rays_split.get_next_rays_batch(), 64)
+        # jittered rays stay in their pixel
+        rays_split = RaysSplit(
+            self.data_split, batch_size=64, jitter_pixels=True, nr_rays_per_pixel=4
+        )
+        batch = rays_split.get_next_rays_batch()
+        self._assert_valid_batch(batch, 64)
+        self.assertTrue(torch.equal(batch["vals"]["rgbs"][0], batch["vals"]["rgbs"][3]))
+
+    def test_active_frames(self):
+        self.data_split.set_active_frames(2, start=1)
+        batch = RaysSplit(self.data_split, batch_size=256).get_next_rays_batch()
+        self.assertTrue(set(batch["frames_idx"].tolist()) <= {1, 2})
+
+    def test_data_loader(self):
+        rays_split = RaysSplit(self.data_split, batch_size=32, nr_batches=5)
+        data_loader = rays_split.get_data_loader(num_workers=2)
+        for _ in range(2):
+            batches = list(data_loader)
+            self.assertEqual(len(batches), 5)
+            for batch in batches:
+                self._assert_valid_batch(batch, 32)
+        # workers sample different rays
+        self.assertFalse(torch.equal(batches[0]["rays_d"], batches[1]["rays_d"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
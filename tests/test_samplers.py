@@ -0,0 +1,150 @@
+import unittest
+import torch
+import numpy as np
+from mvdatasets import TensorReel
+from mvdatasets.utils.samplers import ErrorMapSampler, MaskSampler, EpochSampler
+from tests.utils import make_cameras
+
+
+class TestErrorMapSampler(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        # tiles on the borders are cropped
+        self.sampler = ErrorMapSampler(
+            nr_cameras=3, temporal_dim=2, height=10, width=13, tile_size=4
+        )
+
+    def test_sample(self):
+        self.assertEqual(self.sampler.errors.shape, (3, 2, 3, 4))
+        self.assertAlmostEqual(self.sampler.tree[1].item(), 3 * 2 * 3 * 4)
+        cameras_idx, frames_idx, pixels = self.sampler.sample(10000)
+        self.assertEqual(cameras_idx.dtype, torch.int32)
+        self.assertEqual(pixels.shape, (10000, 2))
+        self.assertTrue(((cameras_idx >= 0) & (cameras_idx < 3)).all())
+        self.assertTrue(((frames_idx >= 0) & (frames_idx < 2)).all())
+        self.assertTrue(((pixels[:, 0] >= 0) & (pixels[:, 0] < 13)).all())
+        self.assertTrue(((pixels[:, 1] >= 0) & (pixels[:, 1] < 10)).all())
+        # all pixels of cropped tiles can be sampled
+        self.assertEqual(pixels[:, 0].max().item(), 12)
+        self.assertEqual(pixels[:, 1].max().item(), 9)
+
+    def test_update(self):
+        sampler = self.sampler
+        cameras_idx = torch.tensor([1, 1, 2])
+        frames_idx = torch.tensor([0, 0, 1])
+        pixels = torch.tensor([[0, 0], [3, 3], [12, 9]])
+        sampler.update(cameras_idx, frames_idx, pixels, torch.tensor([4.0, 6.0, 0.0]))
+        errors = sampler.errors
+        # moving average of the mean error of the cell
+        self.assertAlmostEqual(errors[1, 0, 0, 0].item(), 0.9 + 0.1 * 5.0)
+        # errors are bounded by min_error
+        sampler.momentum = 0.0
+        sampler.update(cameras_idx[2:], frames_idx[2:], pixels[2:], torch.zeros(1))
+        self.assertAlmostEqual(errors[2, 1, 2, 3].item(), sampler.min_error)
+        self.assertAlmostEqual(sampler.tree[1].item(), errors.sum().item())
+
+        # sampling is proportional to errors
+        sampler.update(cameras_idx[:1], frames_idx[:1], pixels[:1], torch.tensor([1e4]))
+        cameras_idx, frames_idx, pixels = sampler.sample(1000)
+        in_cell = (cameras_idx == 1) & (frames_idx == 0) & (pixels < 4).all(dim=-1)
+        self.assertGreater(in_cell.float().mean().item(), 0.95)
+
+    def test_tensor_reel(self):
+        cameras, rgbs, _ = make_cameras(height=10, width=13)
+        tensor_reel = TensorReel(cameras, device="cpu", modalities=["rgbs"])
+        batch = tensor_reel.get_next_rays_batch(batch_size=64, sampler=self.sampler)
+        rgbs = rgbs[
+            batch["cameras_idx"].numpy(),
+            batch["frames_idx"].numpy(),
+            batch["pixels"][:, 1].numpy(),
+            batch["pixels"][:, 0].numpy(),
+        ]
+        self.assertTrue(np.array_equal(batch["vals"]["rgbs"].numpy(), rgbs))
+        self.sampler.update(
+            batch["cameras_idx"],
+            batch["frames_idx"],
+            batch["pixels"],
+            batch["vals"]["rgbs"].float().mean(dim=-1),
+        )
+        with self.assertRaises(ValueError):
+            tensor_reel.get_next_rays_batch(
+                batch_size=64, sampler=self.sampler, cameras_idx=np.array([0])
+            )
+
+
+class TestMaskSampler(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.masks = torch.zeros(3, 2, 10, 13, 1, dtype=torch.uint8)
+        self.masks[0, 1, 2:5, 3:7] = 255
+        self.masks[2, 0, 6:, 10:] = 255
+
+    def test_sample(self):
+        sampler = MaskSampler(self.masks, foreground_fraction=0.75)
+        self.assertEqual(len(sampler.foreground["frames"]), 2)
+        self.assertEqual(len(sampler.background["frames"]), 6)
+        cameras_idx, frames_idx, pixels = sampler.sample(1000)
+        self.assertEqual(cameras_idx.dtype, torch.int32)
+        self.assertEqual(pixels.shape, (1000, 2))
+        vals = self.masks[
+            cameras_idx.long(),
+            frames_idx.long(),
+            pixels[:, 1].long(),
+            pixels[:, 0].long(),
+        ]
+        self.assertTrue((vals[:750] == 255).all())
+        self.assertTrue((vals[750:] == 0).all())
+        # frames with foreground are sampled uniformly
+        self.assertTrue(0.4 < (cameras_idx[:750] == 0).float().mean().item() < 0.6)
+        # all foreground pixels can be sampled
+        fg = pixels[:750][cameras_idx[:750] == 2]
+        self.assertEqual(fg[:, 0].max().item(), 12)
+        self.assertEqual(fg[:, 1].max().item(), 9)
+
+    def test_no_foreground(self):
+        sampler = MaskSampler(torch.zeros(2, 1, 4, 4, 1), foreground_fraction=0.5)
+        cameras_idx, frames_idx, pixels = sampler.sample(16)
+        self.assertEqual(len(cameras_idx), 16)
+        sampler = MaskSampler(torch.ones(2, 1, 4, 4, 1), foreground_fraction=0.0)
+        cameras_idx, frames_idx, pixels = sampler.sample(16)
+        self.assertEqual(len(cameras_idx), 16)
+
+
+class TestEpochSampler(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.sampler = EpochSampler(nr_cameras=3, temporal_dim=2, height=5, width=7)
+
+    def _get_rays(self, batch_size):
+        cameras_idx, frames_idx, pixels = self.sampler.sample(batch_size)
+        rays = cameras_idx.long() * 2 + frames_idx.long()
+        rays = rays * 5 + pixels[:, 1].long()
+        return rays * 7 + pixels[:, 0].long()
+
+    def test_permute(self):
+        self.assertEqual(len(self.sampler), 210)
+        # bijection of the whole range
+        domain = 2 ** (2 * self.sampler.half_bits)
+        permuted = self.sampler._feistel(torch.arange(domain))
+        self.assertEqual(len(torch.unique(permuted)), domain)
+        permuted = self.sampler.permute(torch.arange(210))
+        self.assertTrue(torch.equal(torch.sort(permuted)[0], torch.arange(210)))
+        self.assertFalse(torch.equal(permuted, torch.arange(210)))
+
+    def test_sample(self):
+        # each ray once per epoch, batches can span epochs
+        rays = torch.cat([self._get_rays(32) for _ in range(14)])
+        self.assertEqual(self.sampler.epoch, 2)
+        self.assertEqual(self.sampler.position, 14 * 32 - 2 * 210)
+        for epoch in range(2):
+            epoch_rays = rays[epoch * 210 : (epoch + 1) * 210]
+            self.assertTrue(torch.equal(torch.sort(epoch_rays)[0], torch.arange(210)))
+        # new permutation each epoch
+        self.assertFalse(torch.equal(rays[:210], rays[210:420]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import os
+import json
+import unittest
+import tempfile
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from mvdatasets import MVDataset
+from mvdatasets.configs.datasets_configs import BlenderConfig
+from mvdatasets.io.scene_cache import (
+    get_scene_cache_dir,
+    get_scene_source_paths,
+    get_scene_fingerprint,
+    load_scene_cache,
+    warm_scene_cache,
+    purge_scene_cache,
+)
+
+
+def make_blender_scene(scene_path: Path, nr_frames: int = 4, height=12, width=16):
+    rng = np.random.default_rng(0)
+    for split in ["train", "test"]:
+        (scene_path / split).mkdir(parents=True, exist_ok=True)
+        frames = []
+        for i in range(nr_frames):
+            img = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+            Image.fromarray(img, mode="RGBA").save(scene_path / split / f"r_{i}.png")
+            theta = 2 * np.pi * i / nr_frames
+            c2w = np.eye(4)
+            c2w[:3, 3] = [4 * np.cos(theta), 4 * np.sin(theta), 1.0]
+            frames.append(
+                {"file_path": f"./{split}/r_{i}", "transform_matrix": c2w.tolist()}
+            )
+        with open(scene_path / f"transforms_{split}.json", "w") as fp:
+            json.dump({"camera_angle_x": 0.7, "frames": frames}, fp)
+
+
+class TestSceneCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_path = Path(self.tmp_dir.name)
+        self.datasets_path = tmp_path / "data"
+        self.cache_path = tmp_path / "cache"
+        self.dataset_name = "nerf_synthetic"
+        self.scene_name = "lego"
+        self.dataset_path = self.datasets_path / self.dataset_name
+        make_blender_scene(self.dataset_path / self.scene_name)
+        config = BlenderConfig(
+            dataset_name=self.dataset_name, splits=["train", "test"], test_skip=1
+        )
+        config.__post__init__()
+        self.config = config.asdict()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _load(self, cache_path=None, config=None):
+        return MVDataset(
+            self.dataset_name,
+            self.scene_name,
+            self.datasets_path,
+            config=config if config is not None else self.config,
+            cache_path=cache_path,
+        )
+
+    def test_cache_roundtrip(self):
+        reference = self._load()
+        # first run fills the cache, second run maps it
+        self._load(cache_path=self.cache_path)
+        cached = self._load(cache_path=self.cache_path)
+
+        self.assertEqual(cached.scene_radius, reference.scene_radius)
+        self.assertTrue(
+            np.array_equal(cached.global_transform, reference.global_transform)
+        )
+        for split in ["train", "test"]:
+            cameras = cached.get_split(split)
+            reference_cameras = reference.get_split(split)
+            self.assertEqual(len(cameras), len(reference_cameras))
+            for camera, reference_camera in zip(cameras, reference_cameras):
+                self.assertEqual(camera.camera_label, reference_camera.camera_label)
+                self.assertTrue(np.array_equal(camera.pose, reference_camera.pose))
+                self.assertTrue(
+                    np.array_equal(camera.intrinsics, reference_camera.intrinsics)
+                )
+                for key, val in reference_camera.data.items():
+                    if val is None:
+                        self.assertIsNone(camera.data[key])
+                    else:
+                        self.assertTrue(np.array_equal(camera.data[key], val))
+
+    def test_cache_key(self):
+        dir_a = get_scene_cache_dir(
+            self.cache_path, self.dataset_name, self.scene_name, self.config, "blender"
+        )
+        # worker count does not change the cached scene
+        config = dict(self.config, nr_workers=3)
+        dir_b = get_scene_cache_dir(
+            self.cache_path, self.dataset_name, self.scene_name, config, "blender"
+        )
+        self.assertEqual(dir_a, dir_b)
+        # other options do
+        config = dict(self.config, white_bg=False)
+        dir_c = get_scene_cache_dir(
+            self.cache_path, self.dataset_name, self.scene_name, config, "blender"
+        )
+        self.assertNotEqual(dir_a, dir_c)
+
+    def test_cache_invalidation(self):
+        warm_scene_cache(
+            self.dataset_name,
+            self.scene_name,
+            self.datasets_path,
+            self.config,
+            self.cache_path,
+        )
+        args = (
+            self.cache_path,
+            self.dataset_path,
+            self.dataset_name,
+            self.scene_name,
+            self.config,
+            "blender",
+        )
+        self.assertIsNotNone(load_scene_cache(*args))
+
+        # touch a source file
+        img_path = self.dataset_path / self.scene_name / "train" / "r_0.png"
+        stat = os.stat(img_path)
+        os.utime(img_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(load_scene_cache(*args))
+
+    def test_source_paths(self):
+        fingerprint = get_scene_fingerprint(
+            self.dataset_path,
+            get_scene_source_paths(self.dataset_path, self.scene_name, "blender"),
+        )
+        # files outside of the scene folder are not fingerprinted
+        (self.dataset_path / "notes.txt").write_text("unrelated")
+        self.assertEqual(
+            get_scene_fingerprint(
+                self.dataset_path,
+                get_scene_source_paths(self.dataset_path, self.scene_name, "blender"),
+            ),
+            fingerprint,
+        )
+        with self.assertRaises(ValueError):
+            get_scene_source_paths(self.dataset_path, "missing", "blender")
+
+    def test_visor_source_paths(self):
+        # VISOR scenes are read from files shared by the dataset folder
+        dataset_path = self.datasets_path / "VISOR"
+        annotations_path = dataset_path / "GroundTruth-SparseAnnotations"
+        frames_path = annotations_path / "rgb_frames" / "train" / "P01"
+        for path in [
+            dataset_path / "frame_mapping.json",
+            dataset_path / "JSON_DATA" / "P01_01.json",
+            dataset_path / "JSON_DATA" / "P01_02.json",
+            annotations_path / "annotations" / "train" / "P01_01.json",
+            frames_path / "P01_01_frame_0000000001.jpg",
+            frames_path / "P01_02_frame_0000000001.jpg",
+        ]:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("{}")
+
+        def _fingerprint():
+            paths = get_scene_source_paths(dataset_path, "P01_01", "visor")
+            return get_scene_fingerprint(dataset_path, paths)
+
+        fingerprint = _fingerprint()
+        # other scenes do not invalidate the cache
+        (dataset_path / "JSON_DATA" / "P01_02.json").write_text("{1}")
+        (frames_path / "P01_02_frame_0000000001.jpg").write_text("{1}")
+        self.assertEqual(_fingerprint(), fingerprint)
+        # scene annotations and frames do
+        (frames_path / "P01_01_frame_0000000001.jpg").write_text("{1}")
+        self.assertNotEqual(_fingerprint(), fingerprint)
+
+    def test_lazy_not_cached(self):
+        config = dict(self.config, lazy_loading=True)
+        self._load(cache_path=self.cache_path, config=config)
+        cache_dir = get_scene_cache_dir(
+            self.cache_path, self.dataset_name, self.scene_name, config, "blender"
+        )
+        # lazy modalities are not decoded to be cached
+        self.assertFalse(cache_dir.exists())
+        # a cache written without lazy loading is still used
+        self._load(cache_path=self.cache_path)
+        self.assertTrue(cache_dir.exists())
+        cached = self._load(cache_path=self.cache_path, config=config)
+        self.assertEqual(len(cached.get_split("train")), 4)
+
+    def test_purge(self):
+        warm_scene_cache(
+            self.dataset_name,
+            self.scene_name,
+            self.datasets_path,
+            self.config,
+            self.cache_path,
+        )
+        nr_removed = purge_scene_cache(self.cache_path, self.dataset_name)
+        self.assertEqual(nr_removed, 1)
+        self.assertEqual(len(list(self.cache_path.iterdir())), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import pickle
+import tempfile
+import torch
+import numpy as np
+from pathlib import Path
+from multiprocessing.reduction import ForkingPickler
+from mvdatasets import Camera, DataSplit
+from mvdatasets.io.modality_storage import open_memmap, load_memmap
+from mvdatasets.io.shared_memory import (
+    empty_shared,
+    is_shared,
+    to_shared_memory,
+    pack_array,
+    unpack_array,
+    SharedArrayRef,
+    MemmapRef,
+)
+
+
+class TestSharedMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.rgbs = rng.integers(0, 256, size=(4, 1, 64, 96, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _make_split(self, rgbs):
+        intrinsics = np.array([[50.0, 0, 48.0], [0, 50.0, 32.0], [0, 0, 1]])
+        cameras = [
+            Camera(intrinsics=intrinsics, pose=np.eye(4), rgbs=rgbs[i])
+            for i in range(rgbs.shape[0])
+        ]
+        return DataSplit(cameras, modalities=["rgbs"])
+
+    def test_to_shared_memory(self):
+        out = empty_shared((2, 3), np.float32)
+        self.assertTrue(is_shared(out))
+        self.assertTrue(is_shared(out[1]))
+        self.assertEqual(out.dtype, np.float32)
+        self.assertFalse(is_shared(self.rgbs))
+        shared = to_shared_memory(self.rgbs)
+        self.assertTrue(is_shared(shared))
+        self.assertTrue(np.array_equal(shared, self.rgbs))
+        self.assertIs(to_shared_memory(shared), shared)
+
+    def test_pack_array(self):
+        shared = to_shared_memory(self.rgbs)
+        view = shared[::2, 0, 10:20]
+        packed = pack_array(view)
+        self.assertIsInstance(packed, SharedArrayRef)
+        self.assertTrue(np.array_equal(unpack_array(packed), view))
+
+        file_path = Path(self.tmp_dir.name) / "rgbs.npy"
+        out = open_memmap(file_path, self.rgbs.shape, self.rgbs.dtype)
+        out[:] = self.rgbs
+        out.flush()
+        del out
+        view = load_memmap(file_path)[1:3, 0, :, 5]
+        packed = pickle.loads(pickle.dumps(pack_array(view)))
+        self.assertIsInstance(packed, MemmapRef)
+        self.assertTrue(np.array_equal(unpack_array(packed), view))
+
+        # arrays in RAM are not packed
+        self.assertIs(pack_array(self.rgbs), self.rgbs)
+
+    def test_datasplit_share_memory(self):
+        split = self._make_split(self.rgbs)
+        nbytes = split.data["rgbs"].nbytes
+        # in RAM, pickled with the data
+        self.assertGreater(len(ForkingPickler.dumps(split)), nbytes)
+        split.share_memory()
+        self.assertTrue(is_shared(split.data["rgbs"]))
+        self.assertTrue(np.array_equal(split.data["rgbs"], self.rgbs))
+        # in shared memory, pickled by handle
+        self.assertLess(len(ForkingPickler.dumps(split)), nbytes)
+
+    def test_datasplit_pickle_memmap(self):
+        file_path = Path(self.tmp_dir.name) / "rgbs.npy"
+        out = open_memmap(file_path, self.rgbs.shape, self.rgbs.dtype)
+        out[:] = self.rgbs
+        out.flush()
+        del out
+        split = self._make_split(load_memmap(file_path))
+        data = pickle.dumps(split)
+        self.assertLess(len(data), split.data["rgbs"].nbytes)
+        split = pickle.loads(data)
+        self.assertTrue(np.array_equal(split.data["rgbs"], self.rgbs))
+        self.assertTrue(np.array_equal(split[1]["rgbs"].numpy(), self.rgbs[1, 0]))
+
+    def test_dataloader_spawn(self):
+        rgbs = to_shared_memory(self.rgbs)
+        split = self._make_split(rgbs).share_memory()
+        # views of a buffer loaded in shared memory are not copied
+        self.assertTrue(np.shares_memory(split.data["rgbs"], rgbs))
+        data_loader = torch.utils.data.DataLoader(
+            split,
+            batch_size=2,
+            num_workers=1,
+            multiprocessing_context="spawn",
+        )
+        batches = list(data_loader)
+        rgbs = torch.cat([batch["rgbs"] for batch in batches]).numpy()
+        self.assertTrue(np.array_equal(rgbs, self.rgbs[:, 0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+import torch
+import numpy as np
+from mvdatasets import Camera, TensorReel
+from mvdatasets.tensorreel import TensorReelPrefetcher
+from mvdatasets.utils.raycasting import (
+    get_points_2d_screen_from_pixels,
+    get_rays_per_points_2d_screen,
+)
+from tests.utils import make_cameras
+
+
+class TestTensorReelPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        cameras, _, _ = make_cameras()
+        self.tensor_reel = TensorReel(cameras, device="cpu", modalities=["rgbs"])
+
+    def _seed(self):
+        np.random.seed(0)
+        torch.manual_seed(0)
+
+    def test_same_batches(self):
+        kwargs = {"batch_size": 32, "jitter_pixels": True}
+        self._seed()
+        reference = [self.tensor_reel.get_next_rays_batch(**kwargs) for _ in range(6)]
+        self._seed()
+        with TensorReelPrefetcher(
+            self.tensor_reel, nr_prefetched=2, **kwargs
+        ) as prefetcher:
+            buffers = set()
+            for batch, reference_batch in zip(prefetcher, reference):
+                self.assertEqual(batch.keys(), reference_batch.keys())
+                for key in ["cameras_idx", "frames_idx", "rays_o", "rays_d"]:
+                    self.assertTrue(torch.equal(batch[key], reference_batch[key]))
+                self.assertTrue(
+                    torch.equal(batch["vals"]["rgbs"], reference_batch["vals"]["rgbs"])
+                )
+                buffers.add(batch["rays_o"].data_ptr())
+            # batches are written in a ring of buffers
+            self.assertEqual(len(buffers), 3)
+        self.assertFalse(prefetcher.thread.is_alive())
+        with self.assertRaises(RuntimeError):
+            prefetcher.get_next_rays_batch()
+
+    def test_exception(self):
+        prefetcher = TensorReelPrefetcher(self.tensor_reel, mip_level=1)
+        with self.assertRaises(ValueError):
+            prefetcher.get_next_rays_batch()
+        self.assertFalse(prefetcher.thread.is_alive())
+
+
+class TestTensorReelRaysLut(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.rgbs = rng.integers(0, 256, size=(3, 1, 8, 12, 3), dtype=np.uint8)
+        self.cameras = []
+        for i in range(3):
+            rot, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+            pose = np.eye(4)
+            pose[:3, :3] = rot * np.linalg.det(rot)
+            pose[:3, 3] = rng.normal(size=3)
+            intrinsics = np.array([[10.0 + i, 0, 6.2], [0, 11.0, 3.9], [0, 0, 1]])
+            self.cameras.append(
+                Camera(intrinsics=intrinsics, pose=pose, rgbs=self.rgbs[i])
+            )
+
+    def _get_batch(self, tensor_reel, **kwargs):
+        np.random.seed(0)
+        torch.manual_seed(0)
+        return tensor_reel.get_next_rays_batch(batch_size=64, **kwargs)
+
+    def test_rays_d_lut(self):
+        tensor_reel = TensorReel(self.cameras, device="cpu", modalities=["rgbs"])
+        for dtype, atol in [(torch.float32, 1e-6), (torch.float16, 1e-3)]:
+            tensor_reel_lut = TensorReel(
+                self.cameras,
+                device="cpu",
+                modalities=["rgbs"],
+                rays_d_lut=True,
+                rays_d_lut_dtype=dtype,
+            )
+            self.assertEqual(
+                tensor_reel_lut.mip_levels[0]["rays_d_lut"].shape, (3, 8, 12, 3)
+            )
+            for kwargs in [
+                {},
+                {"jitter_pixels": True},
+                {"jitter_pixels": True, "nr_rays_per_pixel": 4},
+            ]:
+                reference = self._get_batch(tensor_reel, **kwargs)
+                batch = self._get_batch(tensor_reel_lut, **kwargs)
+                self.assertTrue(torch.equal(batch["rays_o"], reference["rays_o"]))
+                self.assertEqual(batch["rays_d"].dtype, torch.float32)
+                self.assertTrue(
+                    torch.allclose(batch["rays_d"], reference["rays_d"], atol=atol),
+                    (dtype, kwargs),
+                )
+
+
+class TestTensorReelPatches(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        np.random.seed(0)
+        self.cameras, self.rgbs, _ = make_cameras()
+
+    def test_get_next_patches_batch(self):
+        tensor_reel = TensorReel(self.cameras, device="cpu", modalities=["rgbs"])
+        batch = tensor_reel.get_next_patches_batch(nr_patches=16, patch_size=4)
+        self.assertEqual(batch["cameras_idx"].shape, (16,))
+        self.assertEqual(batch["timestamps"].shape, (16,))
+        self.assertEqual(batch["rays_o"].shape, (16, 4, 4, 3))
+        self.assertEqual(batch["rays_d"].shape, (16, 4, 4, 3))
+        self.assertEqual(batch["vals"]["rgbs"].shape, (16, 4, 4, 3))
+        pixels = batch["pixels"]
+        # patches of contiguous pixels, in image
+        self.assertTrue(
+            torch.equal(
+                pixels[:, 0, 1] - pixels[:, 0, 0],
+                torch.tensor([[1, 0]] * 16, dtype=torch.int32),
+            )
+        )
+        self.assertTrue(
+            torch.equal(
+                pixels[:, 1, 0] - pixels[:, 0, 0],
+                torch.tensor([[0, 1]] * 16, dtype=torch.int32),
+            )
+        )
+        self.assertTrue((pixels[..., 0] < 12).all() and (pixels[..., 1] < 8).all())
+        cameras_idx = batch["cameras_idx"].numpy()[:, None, None]
+        frames_idx = batch["frames_idx"].numpy()[:, None, None]
+        rgbs = self.rgbs[
+            cameras_idx, frames_idx, pixels[..., 1].numpy(), pixels[..., 0].numpy()
+        ]
+        self.assertTrue(np.array_equal(batch["vals"]["rgbs"].numpy(), rgbs))
+        # same rays of independent pixels
+        rays_o, rays_d = get_rays_per_points_2d_screen(
+            c2w=tensor_reel.c2w_all[batch["cameras_idx"].repeat_interleave(16)],
+            intrinsics_inv=tensor_reel.intrinsics_inv[
+                batch["cameras_idx"].repeat_interleave(16)
+            ],
+            points_2d_screen=get_points_2d_screen_from_pixels(pixels.reshape(-1, 2)),
+        )
+        self.assertTrue(torch.equal(batch["rays_o"].reshape(-1, 3), rays_o))
+        self.assertTrue(torch.equal(batch["rays_d"].reshape(-1, 3), rays_d))
+
+        # whole frames
+        batch = tensor_reel.get_next_patches_batch(nr_patches=2, patch_size=8)
+        self.assertTrue((batch["pixels"][:, 0, 0, 1] == 0).all())
+        with self.assertRaises(ValueError):
+            tensor_reel.get_next_patches_batch(patch_size=9)
+
+    def test_rays_d_lut(self):
+        tensor_reel = TensorReel(
+            self.cameras, device="cpu", modalities=["rgbs"], rays_d_lut=True
+        )
+        batch = tensor_reel.get_next_patches_batch(nr_patches=4, patch_size=3)
+        pixels = batch["pixels"].reshape(-1, 2)
+        _, rays_d = get_rays_per_points_2d_screen(
+            c2w=tensor_reel.c2w_all[batch["cameras_idx"].repeat_interleave(9)],
+            intrinsics_inv=tensor_reel.intrinsics_inv[
+                batch["cameras_idx"].repeat_interleave(9)
+            ],
+            points_2d_screen=get_points_2d_screen_from_pixels(pixels),
+        )
+        self.assertTrue(
+            torch.allclose(batch["rays_d"].reshape(-1, 3), rays_d, atol=1e-6)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import unittest
+import tempfile
+import numpy as np
+from pathlib import Path
+from mvdatasets.io.tracks_2d import (
+    get_raw_tracks_2d_path,
+    get_packed_tracks_2d_path,
+    pack_tracks_2d,
+    load_tracks_2d,
+    load_raw_tracks_2d,
+)
+
+
+class TestTracks2D(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tracks_dir = Path(self.tmp_dir.name) / "2d_tracks"
+        self.packed_dir = Path(self.tmp_dir.name) / "2d_tracks_packed"
+        self.tracks_dir.mkdir()
+        rng = np.random.default_rng(0)
+        self.frames_names = [f"0_{i:05d}" for i in range(6)]
+        # (query, target, N, C) tracks
+        self.tracks = rng.normal(size=(6, 6, 20, 4)).astype(np.float32)
+        for i, query in enumerate(self.frames_names):
+            for j, target in enumerate(self.frames_names):
+                np.save(
+                    get_raw_tracks_2d_path(self.tracks_dir, query, target),
+                    self.tracks[i, j],
+                )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_pack_tracks_2d(self):
+        pack_tracks_2d(self.tracks_dir, self.packed_dir, self.frames_names)
+        for i, frame_name in enumerate(self.frames_names):
+            packed = np.load(get_packed_tracks_2d_path(self.packed_dir, frame_name))
+            self.assertEqual(packed.shape, (20, 6, 4))
+            self.assertEqual(packed.dtype, np.float32)
+            self.assertTrue(np.array_equal(packed, self.tracks[i].transpose(1, 0, 2)))
+
+    def test_pack_tracks_2d_invalidation(self):
+        pack_tracks_2d(self.tracks_dir, self.packed_dir, self.frames_names)
+        # source file rewritten, its query frame is packed again
+        new_tracks = np.zeros((20, 4), dtype=np.float32)
+        raw_path = get_raw_tracks_2d_path(
+            self.tracks_dir, self.frames_names[1], self.frames_names[3]
+        )
+        np.save(raw_path, new_tracks)
+        stat = os.stat(raw_path)
+        os.utime(raw_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        pack_tracks_2d(self.tracks_dir, self.packed_dir, self.frames_names)
+        packed_path = get_packed_tracks_2d_path(self.packed_dir, self.frames_names[1])
+        self.assertTrue(np.array_equal(np.load(packed_path)[:, 3], new_tracks))
+        # frames reordered (same number of frames), all query frames are packed again
+        frames_names = self.frames_names[::-1]
+        pack_tracks_2d(self.tracks_dir, self.packed_dir, frames_names)
+        packed_path = get_packed_tracks_2d_path(self.packed_dir, frames_names[0])
+        packed = np.load(packed_path)
+        self.assertTrue(np.array_equal(packed[:, 0], self.tracks[-1, -1]))
+
+    def test_load_raw_tracks_2d(self):
+        pack_tracks_2d(self.tracks_dir, self.packed_dir, self.frames_names)
+        for nr_samples in [32, 500]:
+            np.random.seed(0)
+            tracks, query_frames = load_tracks_2d(
+                self.packed_dir, self.frames_names, nr_samples=nr_samples
+            )
+            np.random.seed(0)
+            raw_tracks, raw_query_frames = load_raw_tracks_2d(
+                self.tracks_dir, self.frames_names, nr_samples=nr_samples
+            )
+            self.assertTrue(np.array_equal(raw_tracks, tracks))
+            self.assertTrue(np.array_equal(raw_query_frames, query_frames))
+
+    def test_load_tracks_2d(self):
+        pack_tracks_2d(self.tracks_dir, self.packed_dir, self.frames_names)
+        tracks, query_frames = load_tracks_2d(
+            self.packed_dir, self.frames_names, nr_samples=32
+        )
+        self.assertEqual(tracks.shape, (32, 6, 4))
+        # evenly sampled, last query frame takes the remainder
+        self.assertTrue(np.array_equal(np.bincount(query_frames), [5] * 5 + [7]))
+        # sampled tracks are rows of their query frame tracks
+        for track, query_frame in zip(tracks, query_frames):
+            packed = self.tracks[query_frame].transpose(1, 0, 2)
+            self.assertTrue(np.any(np.all(packed == track, axis=(1, 2))))
+
+        # more samples than tracks
+        tracks, query_frames = load_tracks_2d(
+            self.packed_dir, self.frames_names, nr_samples=500, query_frames_idxs=[2]
+        )
+        self.assertEqual(tracks.shape, (20, 6, 4))
+        self.assertTrue(np.all(query_frames == 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
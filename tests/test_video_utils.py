@@ -0,0 +1,121 @@
+import unittest
+import tempfile
+import cv2 as cv
+import numpy as np
+from pathlib import Path
+from mvdatasets.utils.video_utils import (
+    VideoReader,
+    get_video_reader,
+    read_video_frame,
+    read_videos_frames,
+    release_video_readers,
+)
+from mvdatasets.utils import video_utils
+from mvdatasets.io.decoding import get_decode_pool, shutdown_decode_pool
+
+
+class TestVideoUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.video_path = Path(self.tmp_dir.name) / "cam00.mp4"
+        self.nr_frames = 60
+        writer = cv.VideoWriter(
+            str(self.video_path), cv.VideoWriter_fourcc(*"mp4v"), 30.0, (32, 24)
+        )
+        for i in range(self.nr_frames):
+            frame = np.zeros((24, 32, 3), dtype=np.uint8)
+            frame[..., 2] = i * 4  # red channel (BGR)
+            writer.write(frame)
+        writer.release()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_video_reader(self):
+        with VideoReader(self.video_path) as video_reader:
+            self.assertEqual(len(video_reader), self.nr_frames)
+            self.assertEqual((video_reader.height, video_reader.width), (24, 32))
+            frames = video_reader.read_frames()
+            self.assertEqual(frames.shape, (self.nr_frames, 24, 32, 3))
+            # frames are RGB
+            self.assertGreater(frames[-1, ..., 0].mean(), frames[-1, ..., 2].mean())
+            # random access (backwards, forward and far forward) matches streaming
+            for frame_idx in [50, 3, 5, 58, 0]:
+                self.assertTrue(
+                    np.array_equal(
+                        video_reader.read_frame(frame_idx), frames[frame_idx]
+                    )
+                )
+            with self.assertRaises(IndexError):
+                video_reader.read_frame(self.nr_frames)
+            self.assertTrue(
+                np.array_equal(read_video_frame((self.video_path, 7)), frames[7])
+            )
+
+    def test_random_access(self):
+        # textured moving frames, encoded with keyframes every few frames
+        video_path = Path(self.tmp_dir.name) / "cam01.mp4"
+        rng = np.random.default_rng(0)
+        texture = rng.integers(0, 256, (24, 32, 3), dtype=np.uint8)
+        writer = cv.VideoWriter(
+            str(video_path), cv.VideoWriter_fourcc(*"mp4v"), 30.0, (32, 24)
+        )
+        for i in range(90):
+            writer.write(np.roll(texture, i, axis=1))
+        writer.release()
+
+        with VideoReader(video_path) as video_reader:
+            frames = video_reader.read_frames()
+        with VideoReader(video_path) as video_reader:
+            frames_idxs = rng.permutation(90).tolist() + [89, 89, 0, 45, 46, 80]
+            for frame_idx in frames_idxs:
+                self.assertTrue(
+                    np.array_equal(
+                        video_reader.read_frame(frame_idx), frames[frame_idx]
+                    )
+                )
+            # seeks start from keyframes
+            self.assertEqual(video_reader._keyframes[0], 0)
+            self.assertGreater(len(video_reader._keyframes), 1)
+
+    def test_video_readers_release(self):
+        max_readers = video_utils.MAX_OPEN_VIDEO_READERS
+        videos_paths = [
+            Path(self.tmp_dir.name) / f"copy{i:02d}.mp4" for i in range(max_readers + 1)
+        ]
+        for video_path in videos_paths:
+            video_path.write_bytes(self.video_path.read_bytes())
+        readers = [get_video_reader(video_path) for video_path in videos_paths]
+        # least recently used reader is closed
+        self.assertFalse(readers[0]._capture.isOpened())
+        self.assertTrue(all(reader._capture.isOpened() for reader in readers[1:]))
+        self.assertIs(get_video_reader(videos_paths[-1]), readers[-1])
+        release_video_readers()
+        self.assertFalse(any(reader._capture.isOpened() for reader in readers))
+
+        # readers of the decode pool workers are closed on shutdown
+        pool = get_decode_pool(2)
+        reader = pool.submit(get_video_reader, self.video_path).result()
+        self.assertTrue(reader._capture.isOpened())
+        shutdown_decode_pool()
+        self.assertFalse(reader._capture.isOpened())
+
+    def test_read_videos_frames(self):
+        with VideoReader(self.video_path) as video_reader:
+            frames = video_reader.read_frames(range(20), subsample_factor=2)
+        for out_path in [None, Path(self.tmp_dir.name) / "rgbs.npy"]:
+            videos_frames = read_videos_frames(
+                [self.video_path] * 3,
+                20,
+                subsample_factor=2,
+                nr_workers=3,
+                out_path=out_path,
+            )
+            self.assertEqual(videos_frames.shape, (3, 20, 12, 16, 3))
+            for video_frames in videos_frames:
+                self.assertTrue(np.array_equal(video_frames, frames))
+
+
+if __name__ == "__main__":
+    unittest.main()
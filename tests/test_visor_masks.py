@@ -0,0 +1,146 @@
+import unittest
+import tempfile
+import cv2
+import numpy as np
+from pathlib import Path
+from mvdatasets.loaders.dynamic.visor import (
+    _rasterize_masks,
+    _rasterize_frames_masks,
+    _save_masks_cache,
+    _load_masks_cache,
+)
+
+
+class TestVisorMasks(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.width, self.height = 64, 48
+        self.annotations = []
+        for i in range(5):
+            segments = [
+                rng.integers(0, [self.width, self.height], size=(5, 2)).tolist()
+                for _ in range(2)
+            ]
+            self.annotations.append({"segments": segments, "class_id": 10 * i + 1})
+        self.annotations[-1]["segments"].append([])
+        self.annotations[-1]["class_id"] = 300
+
+    def test_rasterize_masks(self):
+        # reference: each annotation filled separately in each mask
+        mask = np.zeros((self.height, self.width, 1), dtype=np.uint8)
+        semantic_mask = np.zeros((self.height, self.width, 1), dtype=np.uint8)
+        for annotation in self.annotations:
+            ps = [
+                np.array(poly if poly != [] else [[0.0, 0.0]], dtype=np.int32)
+                for poly in annotation["segments"]
+            ]
+            cv2.fillPoly(mask, ps, 255)
+            cv2.fillPoly(semantic_mask, ps, min(annotation["class_id"], 255))
+
+        masks = _rasterize_masks(self.annotations, self.width, self.height)
+        self.assertEqual(masks.shape, (self.height, self.width, 2))
+        self.assertEqual(masks.dtype, np.uint8)
+        self.assertTrue(np.array_equal(masks[..., :1], mask))
+        self.assertTrue(np.array_equal(masks[..., 1:], semantic_mask))
+
+        # subsampled masks only contain the input class ids
+        for subsample_factor in [2, 3, 4]:
+            out_width = self.width // subsample_factor
+            out_height = self.height // subsample_factor
+            masks_sub = _rasterize_masks(
+                self.annotations,
+                self.width,
+                self.height,
+                out_width=out_width,
+                out_height=out_height,
+            )
+            self.assertEqual(masks_sub.shape, (out_height, out_width, 2))
+            class_ids = {0} | {min(a["class_id"], 255) for a in self.annotations}
+            self.assertTrue(set(np.unique(masks_sub[..., 1])) <= class_ids)
+            self.assertTrue(set(np.unique(masks_sub[..., 0])) <= {0, 255})
+            self.assertTrue(
+                np.array_equal(masks_sub[..., 0] > 0, masks_sub[..., 1] > 0)
+            )
+
+        # rectangles aligned to the subsampled pixels are rasterised exactly
+        rects = [(12, 12, 35, 23), (24, 0, 47, 35)]
+        annotations = [
+            {"segments": [[[x0, y0], [x1, y0], [x1, y1], [x0, y1]]], "class_id": i + 1}
+            for i, (x0, y0, x1, y1) in enumerate(rects)
+        ]
+        width, height = 72, 48
+        masks = _rasterize_masks(annotations, width, height)
+        for subsample_factor in [2, 3, 4]:
+            masks_sub = _rasterize_masks(
+                annotations,
+                width,
+                height,
+                out_width=width // subsample_factor,
+                out_height=height // subsample_factor,
+            )
+            blocks = masks[::subsample_factor, ::subsample_factor]
+            self.assertTrue(np.array_equal(masks_sub, blocks))
+
+        masks = _rasterize_masks([], self.width, self.height)
+        self.assertFalse(np.any(masks))
+
+    def test_rasterize_frames_masks(self):
+        masks, semantic_masks = _rasterize_frames_masks(
+            [self.annotations, self.annotations[:2]],
+            self.width,
+            self.height,
+            out_width=32,
+            out_height=24,
+            nr_workers=2,
+        )
+        # separate contiguous buffers
+        for array in [masks, semantic_masks]:
+            self.assertEqual(array.shape, (2, 24, 32, 1))
+            self.assertTrue(array.flags.c_contiguous)
+        for i, annotations in enumerate([self.annotations, self.annotations[:2]]):
+            frame_masks = _rasterize_masks(
+                annotations, self.width, self.height, out_width=32, out_height=24
+            )
+            self.assertTrue(np.array_equal(masks[i], frame_masks[..., :1]))
+            self.assertTrue(np.array_equal(semantic_masks[i], frame_masks[..., 1:]))
+
+    def test_masks_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dataset_path = Path(tmp_dir)
+            file_path = dataset_path / "cache" / "P01_01_train_64x48.npz"
+            masks, semantic_masks = _rasterize_frames_masks(
+                [self.annotations] * 2,
+                self.width,
+                self.height,
+                out_width=self.width,
+                out_height=self.height,
+            )
+            images_paths = [
+                str(dataset_path / "rgb_frames" / f"{i}.jpg") for i in [0, 1]
+            ]
+            _save_masks_cache(
+                file_path,
+                "fingerprint",
+                dataset_path,
+                np.stack([np.eye(4)] * 2),
+                np.array([5, 15]),
+                images_paths,
+                ["frame_5.jpg", "frame_15.jpg"],
+                masks,
+                semantic_masks,
+            )
+            self.assertIsNone(_load_masks_cache(file_path, "stale", dataset_path))
+            res = _load_masks_cache(file_path, "fingerprint", dataset_path)
+            c2w_mats, frames_idxs, cached_paths, mapped_names = res[:4]
+            cached_masks, cached_semantic_masks = res[4:]
+            self.assertEqual(c2w_mats.shape, (2, 4, 4))
+            self.assertTrue(np.array_equal(frames_idxs, [5, 15]))
+            self.assertEqual(cached_paths, images_paths)
+            self.assertEqual(mapped_names, ["frame_5.jpg", "frame_15.jpg"])
+            self.assertTrue(np.array_equal(cached_masks, masks))
+            self.assertTrue(np.array_equal(cached_semantic_masks, semantic_masks))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import numpy as np
+from typing import List, Optional, Tuple
+from mvdatasets import Camera
+
+
+def get_intrinsics(height: int, width: int, focal: float = 10.0) -> np.ndarray:
+    """returns (3, 3) intrinsics with the principal point at the image center"""
+    return np.array([[focal, 0, width / 2], [0, focal, height / 2], [0, 0, 1]])
+
+
+def make_camera(
+    rgbs,
+    masks=None,
+    intrinsics: Optional[np.ndarray] = None,
+    pose: Optional[np.ndarray] = None,
+    timestamps: Optional[np.ndarray] = None,
+    subsample_factor: int = 1,
+) -> Camera:
+    """returns a camera with the given frames
+
+    Args:
+        rgbs: (T, H, W, 3) frames (np.ndarray, memory-mapped or LazyFrames)
+        masks (optional): (T, H, W, 1) masks. Defaults to None.
+        intrinsics (np.ndarray, optional): (3, 3). Defaults to get_intrinsics.
+        pose (np.ndarray, optional): (4, 4) c2w. Defaults to identity.
+        timestamps (np.ndarray, optional): (T,). Defaults to frames indices.
+        subsample_factor (int, optional): Defaults to 1.
+
+    Returns:
+        Camera: camera
+    """
+    temporal_dim, height, width = rgbs.shape[:3]
+    if intrinsics is None:
+        intrinsics = get_intrinsics(height, width)
+    if pose is None:
+        pose = np.eye(4)
+    if timestamps is None:
+        timestamps = np.arange(temporal_dim, dtype=np.float32)
+    return Camera(
+        intrinsics=intrinsics,
+        pose=pose,
+        rgbs=rgbs,
+        masks=masks,
+        timestamps=timestamps,
+        subsample_factor=subsample_factor,
+    )
+
+
+def make_cameras(
+    nr_cameras: int = 3,
+    temporal_dim: int = 2,
+    height: int = 8,
+    width: int = 12,
+    intrinsics: Optional[np.ndarray] = None,
+    timestamps: Optional[np.ndarray] = None,
+    with_masks: bool = False,
+    seed: int = 0,
+) -> Tuple[List[Camera], np.ndarray, Optional[np.ndarray]]:
+    """returns cameras with random frames, not rotated, camera i is centered
+    at (i, i, i)
+
+    Args:
+        nr_cameras (int, optional): number of cameras (N). Defaults to 3.
+        temporal_dim (int, optional): number of frames (T). Defaults to 2.
+        height (int, optional): Defaults to 8.
+        width (int, optional): Defaults to 12.
+        intrinsics (np.ndarray, optional): (3, 3) or per camera (N, 3, 3).
+            Defaults to get_intrinsics.
+        timestamps (np.ndarray, optional): (T,) or per camera (N, T).
+            Defaults to frames indices.
+        with_masks (bool, optional): also generate random masks. Defaults to False.
+        seed (int, optional): frames random seed. Defaults to 0.
+
+    Returns:
+        list: N cameras
+        np.ndarray: (N, T, H, W, 3) uint8 frames
+        np.ndarray: (N, T, H, W, 1) uint8 masks, None if not with_masks
+    """
+    rng = np.random.default_rng(seed)
+    shape = (nr_cameras, temporal_dim, height, width)
+    rgbs = rng.integers(0, 256, size=shape + (3,), dtype=np.uint8)
+    masks = None
+    if with_masks:
+        masks = rng.integers(0, 256, size=shape + (1,), dtype=np.uint8)
+    if intrinsics is None:
+        intrinsics = get_intrinsics(height, width)
+    intrinsics = np.broadcast_to(intrinsics, (nr_cameras, 3, 3))
+    if timestamps is None:
+        timestamps = np.arange(temporal_dim, dtype=np.float32)
+    timestamps = np.broadcast_to(timestamps, (nr_cameras, temporal_dim))
+    cameras = []
+    for i in range(nr_cameras):
+        pose = np.eye(4)
+        pose[:3, 3] = i
+        cameras.append(
+            make_camera(
+                rgbs[i],
+                masks=None if masks is None else masks[i],
+                intrinsics=np.array(intrinsics[i]),
+                pose=pose,
+                timestamps=np.array(timestamps[i], dtype=np.float32),
+            )
+        )
+    return cameras, rgbs, masks